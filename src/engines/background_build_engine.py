@@ -0,0 +1,158 @@
+import multiprocessing
+import random
+import threading
+import time
+from multiprocessing.connection import Connection
+from typing import Generator, List, Optional
+
+from shapely.geometry import Point
+
+from engines.bsp_engine import BSPEngine
+from engines.depth_sort_engine import DepthSortEngine
+from engines.hidden_surface_engine import HiddenSurfaceEngine
+from graphics3D.camera.abstractcamera import AbstractCamera
+from sptree.extents import Extent
+from sptree.partitionable import Partitionable
+from sptree.sp_tree import SPTree
+from sptree.visibility import Coord2D
+
+_progress_interval = 0.25  # Seconds between progress reports sent by the build process
+_finished_status_time = 5.0  # Seconds the build time stays on screen once the tree is in use
+
+
+class BackgroundBuildEngine(HiddenSurfaceEngine):
+    """
+    Depth sorts the walls while their SPTree is built in a separate process, then switches to the tree.
+    The build runs in its own process, so it never competes with drawing for the interpreter, and the scene can be
+    drawn as soon as it's loaded. Every query goes to whichever engine is current when it starts, so the switch
+    happens between frames and never mixes the two engines' orders within one.
+    """
+
+    def __init__(self, walls: List[Partitionable], bounding_box, rng: Optional[random.Random] = None) -> None:
+        """
+        Starts building the tree.
+
+        :param walls: walls of the scene
+        :param bounding_box: bounding box of the walls
+        :param rng: source of randomness for building the tree
+        """
+        super().__init__(bounding_box)
+        self._engine: HiddenSurfaceEngine = DepthSortEngine(walls, bounding_box)
+        self._progress = 0.0  # Estimated fraction of the tree built so far
+        self._error: Optional[str] = None  # Why the build failed, if it did
+        self._build_time: Optional[float] = None  # Seconds the build took, once it's finished
+        self._switched = False  # Whether the tree replaced depth sorting since the last check for new walls
+        self._start = time.perf_counter()
+
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        self._process = multiprocessing.Process(target=_build_tree, args=(walls, bounding_box, rng, sender),
+                                                daemon=True)
+        self._process.start()
+        sender.close()  # Only the build process sends, so the pipe closes if it dies
+        self._receiver = threading.Thread(target=self._receive, args=(receiver,), daemon=True)
+        self._receiver.start()
+
+    def get_name(self) -> str:
+        return "background"
+
+    def painters_alg(self, point: Point, rect: Optional[Extent] = None) -> Generator[List[Partitionable], None, None]:
+        return self._engine.painters_alg(point, rect)
+
+    def draw_order(self, camera: AbstractCamera) -> Generator[List[Partitionable], None, None]:
+        return self._engine.draw_order(camera)
+
+    def visible_set(self, point: Point) -> List[Partitionable]:
+        return self._engine.visible_set(point)
+
+    def lines_in_rect(self, minx: float, miny: float, maxx: float, maxy: float) -> List[Partitionable]:
+        return self._engine.lines_in_rect(minx, miny, maxx, maxy)
+
+    def segment_blocked(self, start: Point, end: Point) -> bool:
+        return self._engine.segment_blocked(start, end)
+
+    def visibility_polygon(self, point: Point) -> Optional[List[Coord2D]]:
+        return self._engine.visibility_polygon(point)
+
+    def has_new_walls(self) -> bool:
+        # Walls drawn in a new order once the tree takes over
+        switched = self._switched
+        self._switched = False
+        return switched or self._engine.has_new_walls()
+
+    def get_status(self) -> Optional[str]:
+        if self._error is not None:
+            return "Tree build failed: {}, depth sorting".format(self._error)
+        if self._build_time is None:
+            return "Building tree: {:.0%} after {:.1f}s, depth sorting meanwhile".format(
+                self._progress, time.perf_counter() - self._start)
+        if time.perf_counter() - self._start - self._build_time < _finished_status_time:
+            return "Built tree in {:.1f}s".format(self._build_time)
+        return None
+
+    def is_building(self) -> bool:
+        """
+        :return: whether the tree is still being built
+        """
+        return self._build_time is None and self._error is None
+
+    def close(self) -> None:
+        # Stops the build if it's still running
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process.join()
+
+    def _receive(self, connection: Connection) -> None:
+        """
+        Follows the build's progress until the tree arrives, then makes it the current engine.
+
+        :param connection: end of the pipe the build process sends to
+        :return: None
+        """
+        try:
+            while True:
+                kind, value = connection.recv()
+                if kind == "progress":
+                    self._progress = value
+                elif kind == "error":
+                    self._error = value
+                    return
+                else:
+                    # Assigning the engine is atomic, so queries use either the old engine or the new one
+                    self._engine = BSPEngine(value)
+                    self._build_time = time.perf_counter() - self._start
+                    self._switched = True
+                    return
+        except EOFError:
+            self._error = "build process exited"
+        finally:
+            connection.close()
+
+
+def _build_tree(walls: List[Partitionable], bounding_box, rng: Optional[random.Random], connection: Connection) -> None:
+    """
+    Builds the tree in the build process, reporting progress as it goes and sending the tree once it's done.
+    The tree is built lazily and then completed, which builds nodes one at a time so progress can be measured.
+
+    :param walls: walls of the scene
+    :param bounding_box: bounding box of the walls
+    :param rng: source of randomness for building the tree
+    :param connection: end of the pipe the progress and tree are sent through
+    :return: None
+    """
+    last_report = time.perf_counter()
+
+    def report(num_placed: int, num_waiting: int) -> None:
+        nonlocal last_report
+        now = time.perf_counter()
+        if now - last_report >= _progress_interval:
+            connection.send(("progress", num_placed / max(num_placed + num_waiting, 1)))
+            last_report = now
+
+    try:
+        sptree = SPTree(walls, bounding_box, lazy=True, rng=rng)
+        sptree.build_remaining(report)
+        connection.send(("tree", sptree))
+    except Exception as error:
+        connection.send(("error", str(error)))
+    finally:
+        connection.close()
@@ -0,0 +1,46 @@
+from typing import Generator, List, Optional, Union
+
+from shapely.geometry import Point
+
+from engines.hidden_surface_engine import HiddenSurfaceEngine
+from sptree.extents import Extent
+from sptree.partitionable import Partitionable
+from sptree.sp_tree import SPTree
+from sptree.visibility import Coord2D
+from tiling.tiled_scene import TiledScene
+
+
+class BSPEngine(HiddenSurfaceEngine):
+    """
+    Painter's algorithm on an SPTree, or on the tiles of a tiled scene.
+    The tree costs time to build, but then orders the walls correctly from any camera location.
+    """
+
+    def __init__(self, sptree: Union[SPTree, TiledScene]) -> None:
+        """
+        :param sptree: SPTree or tiled scene of the walls
+        """
+        super().__init__(sptree.bounding_box)
+        self.sptree = sptree
+
+    def get_name(self) -> str:
+        return "bsp"
+
+    def painters_alg(self, point: Point, rect: Optional[Extent] = None) -> Generator[List[Partitionable], None, None]:
+        return self.sptree.painters_alg(point, rect=rect)
+
+    def lines_in_rect(self, minx: float, miny: float, maxx: float, maxy: float) -> List[Partitionable]:
+        return self.sptree.lines_in_rect(minx, miny, maxx, maxy)
+
+    def segment_blocked(self, start: Point, end: Point) -> bool:
+        return self.sptree.segment_blocked(start, end)
+
+    def visibility_polygon(self, point: Point) -> Optional[List[Coord2D]]:
+        # Visibility polygons are computed on a single tree, and not across tiles
+        if isinstance(self.sptree, SPTree):
+            return self.sptree.visibility_polygon(point)
+        return None
+
+    def has_new_walls(self) -> bool:
+        # Tiles of a tiled scene are loaded in the background
+        return isinstance(self.sptree, TiledScene) and self.sptree.has_new_tiles()
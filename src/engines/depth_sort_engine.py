@@ -0,0 +1,64 @@
+from typing import Generator, List, Optional
+
+import numpy as np
+from shapely.geometry import Point
+
+from engines.hidden_surface_engine import HiddenSurfaceEngine
+from sptree.extents import Extent
+from sptree.partitionable import Partitionable
+
+
+class DepthSortEngine(HiddenSurfaceEngine):
+    """
+    Sorts the walls by the distance from the camera to their centroids every frame, furthest first.
+    Nothing is built ahead of time, so it's the cheapest engine for tiny scenes, but walls of very different lengths
+    that are close together may be drawn in the wrong order.
+    """
+
+    def __init__(self, walls: List[Partitionable], bounding_box) -> None:
+        """
+        :param walls: walls of the scene
+        :param bounding_box: bounding box of the walls
+        """
+        super().__init__(bounding_box)
+        self.walls = list(walls)
+        # Start and end coordinates of every wall, one row per wall
+        self._coords = np.array([wall.get_base().coords[:] for wall in self.walls], dtype=np.float64).reshape(-1, 4)
+        self._centroids = (self._coords[:, :2] + self._coords[:, 2:]) / 2
+        self._one_sided = np.array([not wall.is_double_sided() for wall in self.walls], dtype=bool)
+
+    def get_name(self) -> str:
+        return "depth-sort"
+
+    def painters_alg(self, point: Point, rect: Optional[Extent] = None) -> Generator[List[Partitionable], None, None]:
+        x, y = point.x, point.y
+        sx, sy, ex, ey = self._coords.T
+        # One-sided walls can only be seen from in front of them, where the camera is to the right of the wall
+        facing_away = self._one_sided & ((ex - sx) * (y - sy) - (ey - sy) * (x - sx) >= 0)
+        if rect is not None:
+            minx, miny, maxx, maxy = rect
+            facing_away |= (np.minimum(sx, ex) > maxx) | (np.maximum(sx, ex) < minx) | \
+                (np.minimum(sy, ey) > maxy) | (np.maximum(sy, ey) < miny)
+        distances = np.hypot(self._centroids[:, 0] - x, self._centroids[:, 1] - y)
+        for i in np.argsort(-distances, kind="stable").tolist():
+            if not facing_away[i]:
+                yield [self.walls[i]]
+
+    def lines_in_rect(self, minx: float, miny: float, maxx: float, maxy: float) -> List[Partitionable]:
+        sx, sy, ex, ey = self._coords.T
+        overlaps = (np.minimum(sx, ex) <= maxx) & (np.maximum(sx, ex) >= minx) & \
+            (np.minimum(sy, ey) <= maxy) & (np.maximum(sy, ey) >= miny)
+        return [self.walls[i] for i in np.flatnonzero(overlaps).tolist()]
+
+    def segment_blocked(self, start: Point, end: Point) -> bool:
+        ax, ay, bx, by = start.x, start.y, end.x, end.y
+        sx, sy, ex, ey = self._coords.T
+        dx, dy = bx - ax, by - ay
+        wx, wy = ex - sx, ey - sy
+        denominator = dx * wy - dy * wx
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Distance along the segment, and along the wall, of where they cross
+            t = ((sx - ax) * wy - (sy - ay) * wx) / denominator
+            u = ((sx - ax) * dy - (sy - ay) * dx) / denominator
+        crossing = (denominator != 0) & (t > 0) & (t <= 1) & (u >= 0) & (u <= 1)
+        return bool(crossing.any())
@@ -0,0 +1,124 @@
+import math
+import random
+import time
+from typing import List, NamedTuple, Optional
+
+from shapely.geometry import Point
+
+from engines.background_build_engine import BackgroundBuildEngine
+from engines.bsp_engine import BSPEngine
+from engines.depth_sort_engine import DepthSortEngine
+from engines.hidden_surface_engine import HiddenSurfaceEngine
+from engines.level_engine import LevelEngine
+from levels.level_stack import LevelStack
+from sptree.partitionable import Partitionable
+from sptree.sp_tree import SPTree
+
+ENGINE_NAMES = ("bsp", "depth-sort", "background", "levels")
+# Depth sorting gets walls wrong more often the more of them there are, so only scenes with at most this many walls
+# are depth sorted, without building or measuring anything
+DEPTH_SORT_MAX_WALLS = 64
+MAX_EAGER_BUILD_TIME = 0.5  # Seconds a tree may be expected to take to build before it's built in the background
+# Seconds depth sorting the whole scene may take per frame for it to stand in while the tree is built. Any slower and
+# the tree is built lazily instead, so frames only wait on the nodes they need.
+MAX_STAND_IN_QUERY_TIME = 1 / 60
+_SAMPLE_WALLS = 256  # Number of walls the tree's costs are measured on
+_SAMPLE_QUERIES = 20  # Number of camera locations each engine's query cost is measured at
+
+
+class EngineCosts(NamedTuple):
+    """
+    Measured or estimated costs of the engines on a scene, in seconds.
+    """
+    bsp_build: float  # Time to build the scene's SPTree
+    depth_sort_query: float  # Time to order the walls by depth from one camera location
+
+
+def create_engine(engine_name: str, walls: List[Partitionable], bounding_box, lazy: bool = False,
+                  rng: Optional[random.Random] = None) -> HiddenSurfaceEngine:
+    """
+    :param engine_name: one of ENGINE_NAMES
+    :param walls: walls of the scene
+    :param bounding_box: bounding box of the walls
+    :param lazy: whether an SPTree only has its nodes built once they're first needed
+    :param rng: source of randomness for building an SPTree
+    :return: engine of the given name for the scene
+    """
+    if engine_name == "bsp":
+        return BSPEngine(SPTree(walls, bounding_box, lazy, rng))
+    if engine_name == "depth-sort":
+        return DepthSortEngine(walls, bounding_box)
+    if engine_name == "background":
+        return BackgroundBuildEngine(walls, bounding_box, rng)
+    if engine_name == "levels":
+        return LevelEngine(LevelStack.from_walls(walls, bounding_box, lazy, rng))
+    raise ValueError("Unknown engine {}, expected one of {}".format(engine_name, ENGINE_NAMES))
+
+
+def measure_costs(walls: List[Partitionable], bounding_box,
+                  rng: Optional[random.Random] = None) -> EngineCosts:
+    """
+    Measures the costs that decide how a scene is drawn while its tree is built.
+    Depth sorting is timed on the whole scene, since it builds nothing. The tree is built from a random sample of the
+    walls, and its build time is scaled up to the whole scene, as building takes time proportional to n log n.
+    Querying the tree isn't timed: scenes too large to depth sort need a tree however long its queries take.
+
+    :param walls: walls of the scene
+    :param bounding_box: bounding box of the walls
+    :param rng: source of randomness for sampling walls, camera locations and building the tree
+    :return: costs of the engines
+    """
+    rng = rng or random.Random()
+    minx, miny, maxx, maxy = bounding_box.bounds
+    camera_locations = [Point(rng.uniform(minx, maxx), rng.uniform(miny, maxy)) for _ in range(_SAMPLE_QUERIES)]
+
+    sample = rng.sample(walls, _SAMPLE_WALLS) if len(walls) > _SAMPLE_WALLS else walls
+    start = time.perf_counter()
+    SPTree(sample, bounding_box, rng=rng)
+    sample_build = time.perf_counter() - start
+    depth_sort_query = _time_queries(DepthSortEngine(walls, bounding_box), camera_locations)
+
+    n, m = len(walls), len(sample)
+    build_scale = n * math.log2(max(n, 2)) / (m * math.log2(max(m, 2))) if m > 0 else 0
+    return EngineCosts(sample_build * build_scale, depth_sort_query)
+
+
+def select_engine(walls: List[Partitionable], bounding_box, lazy: bool = False,
+                  rng: Optional[random.Random] = None) -> HiddenSurfaceEngine:
+    """
+    Picks the engine for a scene from its size and the measured costs of building its tree and depth sorting it.
+    Tiny scenes are depth sorted right away. Larger scenes need an SPTree to be drawn correctly, and a tree that's
+    expected to take too long to build is built in a separate process while the walls are depth sorted, so drawing
+    can start right away. When depth sorting the scene would itself miss frames, or lazy building is asked for, the
+    tree is built on demand instead, with the rest built by a background thread.
+
+    :param walls: walls of the scene
+    :param bounding_box: bounding box of the walls
+    :param lazy: whether an SPTree is always built lazily, rather than in a separate process
+    :param rng: source of randomness for measuring costs and building an SPTree
+    :return: engine for the scene
+    """
+    if len(walls) <= DEPTH_SORT_MAX_WALLS:
+        return DepthSortEngine(walls, bounding_box)
+    costs = measure_costs(walls, bounding_box, rng)
+    if costs.bsp_build > MAX_EAGER_BUILD_TIME:
+        if not lazy and costs.depth_sort_query <= MAX_STAND_IN_QUERY_TIME:
+            return BackgroundBuildEngine(walls, bounding_box, rng)
+        lazy = True
+    engine = BSPEngine(SPTree(walls, bounding_box, lazy, rng))
+    if lazy:
+        engine.sptree.build_remaining_in_background()
+    return engine
+
+
+def _time_queries(engine: HiddenSurfaceEngine, camera_locations: List[Point]) -> float:
+    """
+    :param engine: engine being timed
+    :param camera_locations: camera locations the walls are ordered from
+    :return: average time to order every wall from one of the camera locations
+    """
+    start = time.perf_counter()
+    for camera_location in camera_locations:
+        for _ in engine.painters_alg(camera_location):
+            pass
+    return (time.perf_counter() - start) / max(len(camera_locations), 1)
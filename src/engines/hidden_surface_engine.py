@@ -0,0 +1,117 @@
+from typing import Generator, List, Optional
+
+import pygame
+from shapely.geometry import Point
+
+from graphics3D.camera.abstractcamera import AbstractCamera
+from graphics3D.renderer import draw_walls, get_camera_location
+from sptree.extents import Extent
+from sptree.partitionable import Partitionable
+from sptree.visibility import Coord2D
+
+
+class HiddenSurfaceEngine:
+    """
+    Determines which walls of a scene hide which from a camera, so the visualizers don't depend on how it's done.
+    Every engine answers with a draw order, and the visible set and frames are derived from it unless an engine has
+    a faster way to compute them.
+    """
+
+    def __init__(self, bounding_box) -> None:
+        """
+        :param bounding_box: bounding box of the scene
+        """
+        self.bounding_box = bounding_box
+
+    def get_name(self) -> str:
+        """
+        :return: short name of the engine, for reports
+        """
+        raise NotImplementedError
+
+    def painters_alg(self, point: Point, rect: Optional[Extent] = None) -> Generator[List[Partitionable], None, None]:
+        """
+        :param point: camera location
+        :param rect: minimum x, minimum y, maximum x and maximum y of the area being drawn, outside of which walls may
+            be left out, None for every wall
+        :return: generator of coincident walls in the order they are drawn, from back to front
+        """
+        raise NotImplementedError
+
+    def draw_order(self, camera: AbstractCamera) -> Generator[List[Partitionable], None, None]:
+        """
+        :param camera: camera in the scene
+        :return: generator of coincident walls in the order they are drawn for the camera's location
+        """
+        return self.painters_alg(get_camera_location(camera))
+
+    def visible_set(self, point: Point) -> List[Partitionable]:
+        """
+        :param point: camera location
+        :return: every wall that may be visible from point, in no particular order
+        """
+        return [wall for coincident_walls in self.painters_alg(point) for wall in coincident_walls]
+
+    def draw_frame(self, surface: pygame.Surface, camera: AbstractCamera) -> None:
+        """
+        :param surface: surface the frame is drawn on
+        :param camera: camera in the scene
+        :return: None
+        """
+        draw_walls(surface, camera, self.draw_order(camera))
+
+    def lines_in_rect(self, minx: float, miny: float, maxx: float, maxy: float) -> List[Partitionable]:
+        """
+        :param minx: minimum x of the rectangle
+        :param miny: minimum y of the rectangle
+        :param maxx: maximum x of the rectangle
+        :param maxy: maximum y of the rectangle
+        :return: walls whose bounding boxes overlap the rectangle, in no particular order
+        """
+        raise NotImplementedError
+
+    def segment_blocked(self, start: Point, end: Point) -> bool:
+        """
+        :param start: start of the segment
+        :param end: end of the segment
+        :return: whether any wall crosses or touches the segment, other than at start
+        """
+        raise NotImplementedError
+
+    def segment_blocked_at(self, start: Point, end: Point, height: float) -> bool:
+        """
+        Walls reach every height unless an engine knows which heights they span.
+
+        :param start: start of the segment
+        :param end: end of the segment
+        :param height: height of the segment above the ground
+        :return: whether any wall at that height crosses or touches the segment, other than at start
+        """
+        return self.segment_blocked(start, end)
+
+    def visibility_polygon(self, point: Point) -> Optional[List[Coord2D]]:
+        """
+        :param point: camera location
+        :return: vertices of the region visible from point, or None if the engine can't compute it
+        """
+        return None
+
+    def has_new_walls(self) -> bool:
+        """
+        :return: whether walls were added or removed since the last check, so the frame has to be redrawn
+        """
+        return False
+
+    def get_status(self) -> Optional[str]:
+        """
+        :return: line of text about work the engine is doing in the background, shown over the frame, None if there
+            is nothing to show
+        """
+        return None
+
+    def close(self) -> None:
+        """
+        Stops any work the engine is doing in the background.
+
+        :return: None
+        """
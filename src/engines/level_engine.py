@@ -0,0 +1,59 @@
+import math
+from typing import Generator, List, Optional
+
+import numpy as np
+from shapely.geometry import Point
+
+from engines.hidden_surface_engine import HiddenSurfaceEngine
+from graphics3D.camera.abstractcamera import AbstractCamera
+from graphics3D.renderer import get_camera_height, get_camera_location
+from levels.level_stack import LevelStack, VerticalView
+from sptree.extents import Extent
+from sptree.partitionable import Partitionable
+
+
+class LevelEngine(HiddenSurfaceEngine):
+    """
+    Painter's algorithm on a stack of levels, each with its own SPTree.
+    Frames only traverse the levels within the camera's vertical view, and walls only block the camera on its own level.
+    """
+
+    def __init__(self, levels: LevelStack) -> None:
+        """
+        :param levels: levels of the scene
+        """
+        super().__init__(levels.bounding_box)
+        self.levels = levels
+
+    def get_name(self) -> str:
+        return "levels"
+
+    def painters_alg(self, point: Point, rect: Optional[Extent] = None) -> Generator[List[Partitionable], None, None]:
+        return self.levels.painters_alg(point, rect=rect)
+
+    def draw_order(self, camera: AbstractCamera) -> Generator[List[Partitionable], None, None]:
+        return self.levels.painters_alg(get_camera_location(camera), get_vertical_view(camera))
+
+    def lines_in_rect(self, minx: float, miny: float, maxx: float, maxy: float) -> List[Partitionable]:
+        return self.levels.lines_in_rect(minx, miny, maxx, maxy)
+
+    def segment_blocked(self, start: Point, end: Point) -> bool:
+        return self.levels.segment_blocked(start, end)
+
+    def segment_blocked_at(self, start: Point, end: Point, height: float) -> bool:
+        return self.levels.segment_blocked(start, end, height)
+
+
+def get_vertical_view(camera: AbstractCamera) -> VerticalView:
+    """
+    The camera sees within a cone around the direction it faces, wide enough to hold the corners of its canvas.
+    Ground cameras never roll, so the cone's elevation is that direction's elevation give or take the cone's angle.
+
+    :param camera: camera in the scene
+    :return: heights the camera sees
+    """
+    # Cameras face towards their local -z axis
+    facing = camera.coords.change_to_global_basis(np.array([0, 0, -1, 0]))
+    pitch = math.atan2(facing[1], math.hypot(facing[0], facing[2]))
+    spread = math.atan2(math.hypot(camera.canvas_width, camera.canvas_height) / 2, camera.focal_length)
+    return VerticalView(get_camera_height(camera), max(-math.pi / 2, pitch - spread), min(math.pi / 2, pitch + spread))
@@ -0,0 +1,54 @@
+from typing import Optional
+
+import pygame
+
+from engines.hidden_surface_engine import HiddenSurfaceEngine
+
+
+class StatusOverlay:
+    """
+    Shows an engine's status in the top left corner of the screen.
+    The status is drawn just before the screen is shown and erased right after, so what's underneath never has to be
+    redrawn when the status changes, and the text is only rendered again when it does.
+    """
+
+    def __init__(self, engine: HiddenSurfaceEngine, font_size: int = 28) -> None:
+        """
+        :param engine: engine whose status is shown
+        :param font_size: height of the text in pixels
+        """
+        self.engine = engine
+        self._font = pygame.font.Font(None, font_size)
+        self._status: Optional[str] = None  # Status the text was rendered for
+        self._text: Optional[pygame.Surface] = None
+        self._backing: Optional[pygame.Surface] = None  # Pixels under the status while it's drawn
+        self._rect: Optional[pygame.Rect] = None  # Area of the screen the status covers while it's drawn
+
+    def draw(self, surface: pygame.Surface) -> None:
+        """
+        Draws the engine's current status, keeping the pixels underneath until erase is called.
+
+        :param surface: surface the status is drawn over
+        :return: None
+        """
+        status = self.engine.get_status()
+        if status != self._status:
+            self._status = status
+            self._text = None if status is None else self._font.render(status, True, (255, 255, 255))
+        if self._text is None:
+            return
+        self._rect = self._text.get_rect(topleft=(10, 10)).inflate(12, 8).clip(surface.get_rect())
+        self._backing = surface.subsurface(self._rect).copy()
+        pygame.draw.rect(surface, (0, 0, 0), self._rect)
+        surface.blit(self._text, (10, 10))
+
+    def erase(self, surface: pygame.Surface) -> None:
+        """
+        Puts back the pixels the last drawn status covered.
+
+        :param surface: surface the status was drawn over
+        :return: None
+        """
+        if self._backing is not None:
+            surface.blit(self._backing, self._rect.topleft)
+            self._backing = None
@@ -1,47 +1,468 @@
-import sys
+import argparse
+import time
 
-from shapely.geometry import box
+# Modules are imported by the subcommands that use them, so headless subcommands never pay for pygame or the
+# graphics modules, and every subcommand starts quickly.
 
-from graphics2D.graphics_2d import Graphics2D
-from graphics3D.graphics_3d import Graphics3D
-from sptree.sp_tree import SPTree
-from wall.wall_creator import create_walls
 
-if __name__ == "__main__":
+def _add_scene_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Adds the arguments describing where a scene comes from: a compiled tree, a scene file, or random generation.
+
+    :param parser: parser of a subcommand
+    :return: None
+    """
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--tree", help="compiled tree written by the build subcommand")
+    source.add_argument("--scene", help="JSON scene file of walls")
+    parser.add_argument("--width", type=int, default=1000, help="width of bounding box for all generated walls")
+    parser.add_argument("--height", type=int, default=1000, help="height of bounding box for all generated walls")
+    parser.add_argument("--num-walls", type=int, default=100, help="number of walls to generate")
+    parser.add_argument("--min-wall-height", type=int, default=10, help="minimum height of a generated wall")
+    parser.add_argument("--max-wall-height", type=int, default=100, help="maximum height of a generated wall")
+    parser.add_argument("--seed", type=int, help="seed for generating walls and building the tree")
+    parser.add_argument("--levels", type=int, default=1,
+                        help="number of stacked levels of generated walls, each --max-wall-height above the last")
+
+
+def _get_scene_description(args: argparse.Namespace) -> dict:
     """
-    Arguments:
-        bb_width - width of bounding box for all walls
-        bb_height - height of bounding box for all walls
-        num_walls - number of walls to add to the scene
-        min_wall_height - minimum height of a wall
-        max_wall_height - maximum height of a wall
-        graphics_type - '3D' for 3D graphics and '2D' for top down view (no quotes)
+    :param args: parsed arguments of a subcommand
+    :return: JSON serializable description of the scene described by args
     """
-    arg_list = sys.argv
-    if len(arg_list) != 7:
-        print("Usage: \"python3 front_end.py bb_width bb_height num_walls min_wall_height max_wall_height graphics_type")
-        exit(1)
+    return {"tree": args.tree, "scene": args.scene, "width": args.width, "height": args.height,
+            "num_walls": args.num_walls, "min_wall_height": args.min_wall_height,
+            "max_wall_height": args.max_wall_height, "seed": args.seed, "levels": args.levels}
 
-    width = int(arg_list[1])
-    height = int(arg_list[2])
-    num_walls = int(arg_list[3])
-    min_wall_height = int(arg_list[4])
-    max_wall_height = int(arg_list[5])
 
-    b_box = box(0, 0, width, height)  # Bounding box in the first quadrant with above width and height
+def _load_walls(args: argparse.Namespace):
+    """
+    :param args: parsed arguments of a subcommand
+    :return: walls of the scene described by args, and their bounding box
+    """
+    from wall.scene_io import create_scene
 
-    lines = create_walls(b_box, num_walls, min_wall_height, max_wall_height)
+    return create_scene(_get_scene_description(args))
 
-    sptree = SPTree(lines, b_box)
 
-    graphics_type = arg_list[6]
+def _load_sptree(args: argparse.Namespace, lazy: bool = False):
+    """
+    :param args: parsed arguments of a subcommand
+    :param lazy: whether a tree built from walls only has its nodes built once they're first needed
+    :return: SPTree of the scene described by args
+    """
+    import random
+
+    from sptree.sp_tree import SPTree
+
+    if args.tree is not None:
+        return SPTree.load(args.tree)
+    lines, b_box = _load_walls(args)
+    return SPTree(lines, b_box, lazy, random.Random(args.seed))
+
+
+def build(args: argparse.Namespace) -> None:
+    """
+    Generates or loads a scene and writes its compiled tree, or its tiles when a tile size is given.
 
-    if graphics_type == '2D':
-        display = Graphics2D(sptree)
-        display.run()
-    elif graphics_type == '3D':
-        game = Graphics3D(sptree)
-        game.run()
+    :param args: parsed arguments of the subcommand
+    :return: None
+    """
+    lines, b_box = _load_walls(args)
+    if args.save_scene is not None:
+        from wall.scene_io import save_scene
+        save_scene(lines, b_box, args.save_scene)
+
+    start = time.perf_counter()
+    if args.tile_size is not None:
+        from tiling.tile_builder import build_tiles
+        build_tiles(lines, b_box, args.tile_size, args.output)
+    elif args.camera_samples is not None:
+        import random
+
+        from sptree.sp_tree import SPTree
+        camera_samples = _load_camera_samples(args.camera_samples)
+        sptree = SPTree(lines, b_box, rng=random.Random(args.seed))
+        print("Default tree: {}".format(sptree.traversal_cost(camera_samples)))
+        sptree = sptree.optimized_for(camera_samples)
+        print("Optimized for {} camera locations: {}".format(len(camera_samples),
+                                                             sptree.traversal_cost(camera_samples)))
+        sptree.save(args.output)
     else:
-        print("Unrecognized graphics type. Use '2D' or '3D' for parameter graphics_type.")
-        exit(1)
+        import random
+
+        from sptree.sp_tree import SPTree
+        SPTree(lines, b_box, rng=random.Random(args.seed)).save(args.output)
+    print("Built {} walls in {:.3f}s to {}".format(len(lines), time.perf_counter() - start, args.output))
+
+
+def _load_camera_samples(path: str):
+    """
+    :param path: trace file written by view3d --record, or NumPy .npy file of an n x 2 array of camera locations
+    :return: n x 2 array of camera locations
+    """
+    import numpy as np
+
+    if path.endswith(".npy"):
+        return np.load(path).reshape(-1, 2)
+    from replay.camera_trace import TraceReader
+    return TraceReader(path).camera_locations()
+
+
+def bench(args: argparse.Namespace) -> None:
+    """
+    Times building a scene's tree and running painter's algorithm from random camera locations, without a display.
+
+    :param args: parsed arguments of the subcommand
+    :return: None
+    """
+    import random
+
+    from shapely.geometry import Point
+
+    start = time.perf_counter()
+    sptree = _load_sptree(args)
+    build_time = time.perf_counter() - start
+
+    minx, miny, maxx, maxy = sptree.bounding_box.bounds
+    rng = random.Random(args.seed)
+    camera_locations = [Point(rng.uniform(minx, maxx), rng.uniform(miny, maxy)) for _ in range(args.frames)]
+    layer, movers = _create_movers(sptree, args.movers, rng) if args.movers > 0 else (None, [])
+    start = time.perf_counter()
+    num_drawn = 0
+    for camera_location in camera_locations:
+        for handle, wall in movers:
+            layer.move(handle, _move_wall(wall, rng))
+        for coincident_walls in sptree.painters_alg(camera_location, layer):
+            num_drawn += len(coincident_walls)
+    traversal_time = time.perf_counter() - start
+
+    print("{} {:.3f}s".format("Loaded" if args.tree is not None else "Built", build_time))
+    if len(movers) > 0:
+        print("Moved {} walls every frame".format(len(movers)))
+    print("Painter's algorithm: {} frames in {:.3f}s ({:.3f}ms per frame, {:.1f} walls per frame)".format(
+        args.frames, traversal_time, 1000 * traversal_time / args.frames, num_drawn / args.frames))
+    print(sptree.stats())
+
+
+def _create_movers(sptree, num_movers: int, rng):
+    """
+    :param sptree: SPTree the walls move through
+    :param num_movers: number of moving walls
+    :param rng: source of randomness for the walls
+    :return: layer holding the moving walls, and the handle and wall of each of them
+    """
+    import math
+
+    from shapely.geometry import LineString
+
+    from sptree.dynamic_layer import DynamicLayer
+    from wall.wall import Wall
+    from wall.wall_creator import WHITE
+
+    layer = DynamicLayer(sptree)
+    minx, miny, maxx, maxy = sptree.bounding_box.bounds
+    length = max(maxx - minx, maxy - miny) / 50  # Roughly the size of a door
+    movers = []
+    for _ in range(num_movers):
+        x, y, angle = rng.uniform(minx, maxx), rng.uniform(miny, maxy), rng.uniform(0, 2 * math.pi)
+        wall = Wall(LineString([(x, y), (x + length * math.cos(angle), y + length * math.sin(angle))]),
+                    rng.randint(10, 100), WHITE, WHITE, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        movers.append((layer.add(wall), wall))
+    return layer, movers
+
+
+def _move_wall(wall, rng):
+    """
+    :param wall: moving wall
+    :param rng: source of randomness for the movement
+    :return: wall shifted by a small random amount
+    """
+    from shapely.geometry import LineString
+
+    from wall.wall import Wall
+
+    dx, dy = rng.uniform(-1, 1), rng.uniform(-1, 1)
+    (sx, sy), (ex, ey) = wall.get_base().coords
+    return Wall(LineString([(sx + dx, sy + dy), (ex + dx, ey + dy)]), wall.get_height(),
+                wall.node_color, wall.edge_color, wall.wall_color, wall.is_double_sided(), wall.get_base_height())
+
+
+def view2d(args: argparse.Namespace) -> None:
+    """
+    Opens the top down painter's algorithm visualizer.
+
+    :param args: parsed arguments of the subcommand
+    :return: None
+    """
+    from graphics2D.graphics_2d import Graphics2D
+
+    display = Graphics2D(_load_view_scene(args), args.seed)
+    display.run()
+
+
+def view3d(args: argparse.Namespace) -> None:
+    """
+    Opens the 3D camera.
+
+    :param args: parsed arguments of the subcommand
+    :return: None
+    """
+    from graphics3D.graphics_3d import Graphics3D
+
+    # Recorded traces have to be replayable, so their scene is always generated from a known seed
+    if args.record is not None and args.seed is None:
+        import random
+        args.seed = random.randrange(2 ** 31)
+
+    game = Graphics3D(_load_view_scene(args), (args.screen_width, args.screen_height), args.frame_budget / 1000,
+                      args.min_resolution_scale)
+    if args.record is not None:
+        game.start_recording(args.record, _get_scene_description(args))
+    game.run()
+
+
+def replay(args: argparse.Namespace) -> None:
+    """
+    Replays a recorded camera trace without a display, reporting the time and draw order checksum of every frame.
+
+    :param args: parsed arguments of the subcommand
+    :return: None
+    """
+    from replay.replayer import replay_trace
+
+    results = replay_trace(args.trace)
+    print("frame,draw_ms,walls,checksum")
+    for i, result in enumerate(results):
+        print("{},{:.3f},{},{:08x}".format(i, 1000 * result.draw_time, result.num_walls, result.checksum))
+    if len(results) > 0:
+        total_time = sum(result.draw_time for result in results)
+        print("# {} frames, {:.3f}ms mean, {:.3f}ms max".format(
+            len(results), 1000 * total_time / len(results), 1000 * max(result.draw_time for result in results)))
+
+
+def render(args: argparse.Namespace) -> None:
+    """
+    Renders a camera path to an image sequence across a pool of worker processes, without a display.
+    Poses come either from a recorded trace, which also describes the scene, or from a NumPy file of 4x4 matrices.
+
+    :param args: parsed arguments of the subcommand
+    :return: None
+    """
+    import numpy as np
+
+    from graphics3D.offline_renderer import render_frames
+    from sptree.compiled_tree import CompiledTree
+
+    if args.trace is not None:
+        from replay.camera_trace import TraceReader
+        from replay.replayer import create_sptree
+
+        reader = TraceReader(args.trace)
+        sptree = create_sptree(reader.header["scene"])
+        poses = [frame.basis for frame in reader.frames()]
+        screen_size = tuple(reader.header["screen"])
+        camera_args = reader.header["camera"]
+    else:
+        sptree = _load_sptree(args)
+        poses = list(np.load(args.poses))
+        screen_size = (args.screen_width, args.screen_height)
+        camera_args = None
+    compiled_tree = CompiledTree.compile(sptree)
+
+    start = time.perf_counter()
+    for num_done, _ in enumerate(render_frames(compiled_tree, poses, args.output, screen_size, camera_args,
+                                               args.workers), 1):
+        print("\rRendered {}/{} frames".format(num_done, len(poses)), end="", flush=True)
+    total_time = time.perf_counter() - start
+    print("\nRendered {} frames in {:.3f}s ({:.1f} frames per second) to {}".format(
+        len(poses), total_time, len(poses) / total_time if total_time > 0 else 0, args.output))
+
+
+def serve(args: argparse.Namespace) -> None:
+    """
+    Serves a scene's draw orders, visibility polygons and ray casts to local clients over HTTP until interrupted.
+
+    :param args: parsed arguments of the subcommand
+    :return: None
+    """
+    from service.scene_server import SceneServer, SceneSnapshot
+
+    start = time.perf_counter()
+    snapshot = SceneSnapshot.from_sptree(_load_sptree(args))
+    server = SceneServer(args.host, args.port, args.log_requests)
+    server.set_scene(args.name, snapshot)
+    host, port = server.get_address()
+    print("Serving {} walls as '{}' on http://{}:{}/scenes after {:.3f}s".format(
+        len(snapshot.walls), args.name, host, port, time.perf_counter() - start))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+def heatmap(args: argparse.Namespace) -> None:
+    """
+    Measures the cost of painter's algorithm from a grid of camera locations across a scene, writing the raw maps to
+    heatmap.npz and an image of each map that varies across the scene to the output directory.
+
+    :param args: parsed arguments of the subcommand
+    :return: None
+    """
+    import os
+
+    import numpy as np
+
+    from graphics2D.heatmap_image import save_heatmap_image
+
+    sptree = _load_sptree(args)
+    start = time.perf_counter()
+    result = sptree.traversal_heatmap((args.columns, args.rows), args.overdraw, args.workers)
+    elapsed = time.perf_counter() - start
+    os.makedirs(args.output, exist_ok=True)
+    result.save(os.path.join(args.output, "heatmap.npz"))
+
+    print("Measured {} camera locations in {:.3f}s, visiting {} nodes from each".format(
+        args.columns * args.rows, elapsed, result.node_count))
+    for name in ("nodes_drawn", "fragments", "depths", "overdraw"):
+        values = getattr(result, name)
+        if values is None:
+            continue
+        # Without one-sided walls every location draws the same nodes and walls, other than the odd location on a
+        # line, so there's nothing to map
+        common = np.bincount(values.ravel()).argmax() if values.dtype.kind in "iu" else None
+        if common is not None and np.count_nonzero(values != common) <= values.size // 100:
+            print("{:<12} {:8d} at {} of {} locations".format(
+                name, int(common), np.count_nonzero(values == common), values.size))
+            continue
+        save_heatmap_image(values, os.path.join(args.output, name + ".png"))
+        row, column = np.unravel_index(np.argmax(values), values.shape)
+        print("{:<12} mean {:8.2f}, max {:8.2f} at ({:.1f}, {:.1f})".format(
+            name, float(values.mean()), float(values.max()), result.xs[column], result.ys[row]))
+
+
+def _load_view_scene(args: argparse.Namespace):
+    """
+    Scenes given as a tree or tiles are drawn with their tree, and scenes whose walls stand at several heights with a
+    tree per level. Otherwise the engine is the one asked for, or one picked from the scene's size and measured build
+    cost, so tiny scenes skip building a tree entirely.
+
+    :param args: parsed arguments of a view subcommand
+    :return: hidden surface engine of the scene described by args
+    """
+    import random
+
+    from engines.bsp_engine import BSPEngine
+    from engines.engine_selection import create_engine, select_engine
+
+    if args.tiles is not None:
+        from tiling.tiled_scene import TiledScene
+        return BSPEngine(TiledScene(args.tiles))
+    if args.tree is not None:
+        return BSPEngine(_load_sptree(args))
+    lines, b_box = _load_walls(args)
+    if args.engine != "depth-sort" and len({wall.get_base_height() for wall in lines}) > 1:
+        engine = create_engine("levels", lines, b_box, args.lazy, random.Random(args.seed))
+        if args.lazy:
+            engine.levels.build_remaining_in_background()
+        print("Drawing {} walls on {} levels".format(len(lines), len(engine.levels.levels)))
+        return engine
+    if args.engine == "auto":
+        engine = select_engine(lines, b_box, args.lazy, random.Random(args.seed))
+    else:
+        engine = create_engine(args.engine, lines, b_box, args.lazy, random.Random(args.seed))
+        if isinstance(engine, BSPEngine) and args.lazy:
+            engine.sptree.build_remaining_in_background()
+    print("Drawing {} walls with the {} engine".format(len(lines), engine.get_name()))
+    return engine
+
+
+def _create_parser() -> argparse.ArgumentParser:
+    """
+    :return: parser for all subcommands
+    """
+    parser = argparse.ArgumentParser(description="Hidden surface determination using an SPTree.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="generate or load a scene and write its compiled tree")
+    _add_scene_arguments(build_parser)
+    build_parser.add_argument("-o", "--output", required=True,
+                              help="file the tree is written to, or directory of tiles when --tile-size is given")
+    build_parser.add_argument("--tile-size", type=float, help="cut the scene into square tiles of this size")
+    build_parser.add_argument("--save-scene", help="also write the scene's walls to this JSON file")
+    build_parser.add_argument("--camera-samples",
+                              help="trace file or .npy file of camera locations the tree is optimized to traverse "
+                                   "quickly from")
+    build_parser.set_defaults(func=build)
+
+    bench_parser = subparsers.add_parser("bench", help="time building and traversing a tree without a display")
+    _add_scene_arguments(bench_parser)
+    bench_parser.add_argument("--frames", type=int, default=100, help="number of camera locations to time")
+    bench_parser.add_argument("--movers", type=int, default=0,
+                              help="number of walls moved through the scene every frame")
+    bench_parser.set_defaults(func=bench)
+
+    for name, func, help_text in (("view2d", view2d, "open the top down visualizer"),
+                                  ("view3d", view3d, "open the 3D camera")):
+        view_parser = subparsers.add_parser(name, help=help_text)
+        _add_scene_arguments(view_parser)
+        # Tiles load in the background as the camera moves, so which walls a frame draws can't be replayed
+        scene_group = view_parser.add_mutually_exclusive_group()
+        scene_group.add_argument("--tiles", help="directory of tiles written by build --tile-size")
+        view_parser.add_argument("--lazy", action="store_true",
+                                 help="open the window after partitioning only the root, building the rest as needed")
+        view_parser.add_argument("--engine", choices=("auto", "bsp", "depth-sort", "background"), default="auto",
+                                 help="engine drawing generated or JSON scenes, auto picks one from the scene's size")
+        view_parser.set_defaults(func=func)
+        if name == "view3d":
+            scene_group.add_argument("--record", help="record camera poses and input events to this trace file")
+            view_parser.add_argument("--screen-width", type=int, default=1920, help="width of the display in pixels")
+            view_parser.add_argument("--screen-height", type=int, default=1080, help="height of the display in pixels")
+            view_parser.add_argument("--frame-budget", type=float, default=33,
+                                     help="milliseconds a frame may take while moving before its resolution is lowered")
+            view_parser.add_argument("--min-resolution-scale", type=float, default=0.25,
+                                     help="smallest fraction of the display's resolution frames are drawn at")
+
+    replay_parser = subparsers.add_parser("replay", help="replay a recorded camera trace without a display")
+    replay_parser.add_argument("trace", help="trace file written by view3d --record")
+    replay_parser.set_defaults(func=replay)
+
+    render_parser = subparsers.add_parser("render", help="render a camera path to an image sequence offline")
+    _add_scene_arguments(render_parser)
+    poses = render_parser.add_mutually_exclusive_group(required=True)
+    poses.add_argument("--trace", help="trace file written by view3d --record, whose scene is rendered")
+    poses.add_argument("--poses", help="NumPy .npy file of n x 4 x 4 camera change of basis matrices")
+    render_parser.add_argument("-o", "--output", required=True, help="directory the frames are written to")
+    render_parser.add_argument("--workers", type=int, help="number of worker processes, defaults to the CPU count")
+    render_parser.add_argument("--screen-width", type=int, default=1920, help="width of a frame in pixels for --poses")
+    render_parser.add_argument("--screen-height", type=int, default=1080,
+                               help="height of a frame in pixels for --poses")
+    render_parser.set_defaults(func=render)
+
+    heatmap_parser = subparsers.add_parser("heatmap", help="map the cost of painter's algorithm across a scene")
+    _add_scene_arguments(heatmap_parser)
+    heatmap_parser.add_argument("-o", "--output", required=True,
+                                help="directory the maps and their images are written to")
+    heatmap_parser.add_argument("--columns", type=int, default=500, help="number of camera locations across the scene")
+    heatmap_parser.add_argument("--rows", type=int, default=500, help="number of camera locations down the scene")
+    heatmap_parser.add_argument("--overdraw", action="store_true",
+                                help="also map how many walls cover every direction seen from each camera location")
+    heatmap_parser.add_argument("--workers", type=int, help="number of worker processes, defaults to the CPU count")
+    heatmap_parser.set_defaults(func=heatmap)
+
+    serve_parser = subparsers.add_parser("serve", help="serve a scene's queries to local clients over HTTP")
+    _add_scene_arguments(serve_parser)
+    serve_parser.add_argument("--name", default="default", help="name the scene is served under")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="address the server listens on")
+    serve_parser.add_argument("--port", type=int, default=8000, help="port the server listens on")
+    serve_parser.add_argument("--log-requests", action="store_true", help="log every request to stderr")
+    serve_parser.set_defaults(func=serve)
+
+    return parser
+
+
+if __name__ == "__main__":
+    arguments = _create_parser().parse_args()
+    arguments.func(arguments)
@@ -1,11 +1,15 @@
-from random import randint
-from typing import Tuple
+import random
+from typing import List, Optional, Tuple
 
 import pygame
 from pygame.locals import *
 from shapely.geometry import Point
 
-from sptree.sp_tree import SPTree
+from engines.hidden_surface_engine import HiddenSurfaceEngine
+from engines.status_overlay import StatusOverlay
+from graphics2D.tile_cache import MapTileCache
+from graphics2D.viewport import Viewport
+from sptree.partitionable import Partitionable
 
 Color = Tuple[int, int, int]
 
@@ -15,11 +19,17 @@ class Graphics2D:
     Visualizes hidden surface determination from a top-down perspective for a dynamic scene.
     The red dot represents the user's camera which can be moved by the keyboard.
     Clicking Mouse1 will draw the walls using painter's algorithm.
+    Every wall is also shown in grey as a map, which is cached in tiles for each zoom level, and only walls on screen
+    are drawn. Work the engine does in the background, such as building its tree, is reported in the top left corner.
 
     W - moves camera forward
     A - moves camera backward
     S - moves camera left
     D - moves camera right
+    V - toggles the region visible from the camera, for engines that compute it
+    Arrow keys - pan the view
+    Mouse wheel, + and - - zoom the view in and out
+    Home - zooms out to the whole scene
     Mouse1 - draws a single wall
     Mouse2 - clears the screen of all drawn walls
     Mouse3 - draw all remaining walls
@@ -30,16 +40,45 @@ class Graphics2D:
         pygame.K_a: (lambda x: x.update_camera_location(-1, 0)),
         pygame.K_d: (lambda x: x.update_camera_location(1, 0))
     }
+    key_to_view_change = {
+        pygame.K_UP: (lambda x: x.viewport.pan(0, -x.pan_step)),
+        pygame.K_DOWN: (lambda x: x.viewport.pan(0, x.pan_step)),
+        pygame.K_LEFT: (lambda x: x.viewport.pan(-x.pan_step, 0)),
+        pygame.K_RIGHT: (lambda x: x.viewport.pan(x.pan_step, 0)),
+        pygame.K_EQUALS: (lambda x: x.zoom(1, *x.screen.get_rect().center)),
+        pygame.K_KP_PLUS: (lambda x: x.zoom(1, *x.screen.get_rect().center)),
+        pygame.K_MINUS: (lambda x: x.zoom(-1, *x.screen.get_rect().center)),
+        pygame.K_KP_MINUS: (lambda x: x.zoom(-1, *x.screen.get_rect().center)),
+        pygame.K_HOME: (lambda x: x.viewport.reset())
+    }
+    max_window_size = (1280, 960)  # Largest window opened for a scene, which is zoomed out to fit
 
-    def __init__(self, sptree: SPTree) -> None:
+    def __init__(self, engine: HiddenSurfaceEngine, seed: Optional[int] = None,
+                 window_size: Optional[Tuple[int, int]] = None) -> None:
+        """
+        :param engine: hidden surface engine of the scene
+        :param seed: seed for the colors walls are drawn with, so runs can be repeated
+        :param window_size: width and height of the window, the size of the scene's bounding box up to
+            max_window_size when None
+        """
         pygame.init()
+        self._rng = random.Random(seed)
         self.fps = 120
         self.fpsClock = pygame.time.Clock()
-        minx, miny, maxx, maxy = sptree.bounding_box.bounds  # sptree bounding box will be the screen's dimension
-        self.border = Rect(0, 0, maxx, maxy)
-        self.screen = pygame.display.set_mode((int(maxx), int(maxy)))
-        self.sptree = sptree
-        self.camera_location = Point((maxx // 2, maxy // 2))  # Camera starts centered
+        minx, miny, maxx, maxy = engine.bounding_box.bounds
+        if window_size is None:
+            max_width, max_height = Graphics2D.max_window_size
+            window_size = (min(max(int(maxx - minx), 1), max_width), min(max(int(maxy - miny), 1), max_height))
+        self.screen = pygame.display.set_mode(window_size)
+        self.engine = engine
+        self.viewport = Viewport(engine.bounding_box, window_size)
+        self.pan_step = 20  # Pixels the view moves by for each repeat of an arrow key
+        self._map_tiles = MapTileCache(engine)
+        self._status = StatusOverlay(engine)
+        self.camera_location = Point(((minx + maxx) // 2, (miny + maxy) // 2))  # Camera starts centered
+        self.show_visibility = False
+        # Translucent overlay of the visible region, redrawn only when the camera or the view moves
+        self._visibility_overlay = pygame.Surface(self.screen.get_size(), pygame.SRCALPHA)
 
     def run(self) -> None:
         """
@@ -51,6 +90,7 @@ class Graphics2D:
         pygame.key.set_repeat(10, 10)  # Required for continuous motion when key is held down
 
         camera_moved = True  # Flag for when the camera has moved
+        view_changed = False  # Flag for when the view was zoomed or panned
         clear_screen = True  # Flag for when the screen should be wiped
         draw_order = None  # Generator for the next wall to be drawn given the camera's current position
         draw_all_walls = False  # Flag for when all remaining walls should be drawn
@@ -63,6 +103,7 @@ class Graphics2D:
             for event in pygame.event.get():
 
                 if event.type == QUIT:
+                    self.engine.close()
                     pygame.quit()
                     return
 
@@ -77,14 +118,36 @@ class Graphics2D:
                     elif event.button == 3:
                         clear_screen = True
 
+                if event.type == pygame.MOUSEWHEEL:
+                    view_changed |= self.zoom(event.y, *pygame.mouse.get_pos())
+
                 if event.type == pygame.KEYDOWN:
-                    if event.key in Graphics2D.key_to_motion:
+                    if event.key in Graphics2D.key_to_view_change:
+                        Graphics2D.key_to_view_change[event.key](self)
+                        view_changed = True
+                    elif event.key in Graphics2D.key_to_motion:
                         Graphics2D.key_to_motion[event.key](self)
                         camera_moved = True
+                    elif event.key == pygame.K_v:
+                        self.show_visibility = not self.show_visibility
+                        camera_moved = True
+
+            # Walls may arrive in the background, such as tiles of a tiled scene, and have to be drawn once they do
+            if self.engine.has_new_walls():
+                self._map_tiles.clear()
+                camera_moved = True
+
+            # Everything on screen moves with the view, but the draw order stays the same
+            if view_changed:
+                if self.show_visibility:
+                    self._update_visibility_overlay()
+                view_changed = False
+                clear_screen = True
 
             # Draw order needs to be updated when the the camera moved
             if camera_moved:
-                draw_order = self.sptree.painters_alg(self.camera_location)
+                if self.show_visibility:
+                    self._update_visibility_overlay()
                 camera_moved = False
                 clear_screen = True
 
@@ -92,47 +155,108 @@ class Graphics2D:
 
             if clear_screen:
                 self.screen.fill((255, 255, 255))  # Whiteout screen
-                pygame.draw.rect(self.screen, (0, 0, 0), self.border, 5)  # Draw bounding box
+                if self.show_visibility:
+                    self.screen.blit(self._visibility_overlay, (0, 0))  # Draw visible region
+                self._map_tiles.draw(self.screen, self.viewport)  # Draw map of every wall on screen
+                self._draw_border()  # Draw bounding box
                 pygame.draw.circle(self.screen, (255, 0, 0),
-                                   tuple(map(int, self.camera_location.coords[0])), 5)  # Draw camera dot
-                draw_order = self.sptree.painters_alg(self.camera_location)  # Reset generator
+                                   self.viewport.to_screen(self.camera_location.x, self.camera_location.y),
+                                   5)  # Draw camera dot
+                # Reset generator, which skips walls that are off screen
+                draw_order = self.engine.painters_alg(self.camera_location, self.viewport.get_visible_rect())
                 clear_screen = False
 
             if draw_next_wall:
-                # Only draw when there are more walls to be drawn
-                coincident_walls = next(draw_order, [])
-                for wall in coincident_walls:
-                    wall_base = wall.get_base()
-                    pygame.draw.line(self.screen, Graphics2D._get_random_color(),
-                                     wall_base.coords[0], wall_base.coords[1], 5)
+                # Only draw when there are more walls to be drawn, skipping walls that aren't on screen
+                for coincident_walls in draw_order:
+                    if self._draw_walls(coincident_walls):
+                        break
                 draw_next_wall = False
 
             if draw_all_walls:
                 # Draw remaining walls (if any)
                 for coincident_walls in draw_order:
-                    for wall in coincident_walls:
-                        wall_base = wall.get_base()
-                        pygame.draw.line(self.screen, Graphics2D._get_random_color(),
-                                         wall_base.coords[0], wall_base.coords[1], 5)
+                    self._draw_walls(coincident_walls)
                 draw_all_walls = False
 
+            # Walls are drawn onto the screen one at a time, so the status is erased again before any more are
+            self._status.draw(self.screen)
             pygame.display.flip()
+            self._status.erase(self.screen)
             self.fpsClock.tick(self.fps)
 
     def update_camera_location(self, dx: int, dy: int) -> None:
         """
-        Moves the camera's position by (dx, dy).
+        Moves the camera's position by (dx, dy) pixels on screen.
 
         :param dx: distance to move along the x-axis
         :param dy: distance to move along the y-axis
         :return: None
         """
         cx, cy = self.camera_location.coords[0]
-        self.camera_location = Point((cx + dx, cy + dy))
+        scale = self.viewport.get_scale()
+        self.camera_location = Point((cx + dx / scale, cy + dy / scale))
+
+    def zoom(self, levels: int, px: float, py: float) -> bool:
+        """
+        Zooms the view in or out around a pixel.
+
+        :param levels: number of zoom levels to zoom in by, negative to zoom out
+        :param px: x coordinate on screen of the pixel that stays in place
+        :param py: y coordinate on screen of the pixel that stays in place
+        :return: whether the zoom level changed
+        """
+        return self.viewport.zoom_at(levels, px, py)
+
+    def _draw_walls(self, walls: List[Partitionable]) -> bool:
+        """
+        Draws the walls that are on screen, each in a random color.
+
+        :param walls: walls being drawn
+        :return: whether any of the walls were on screen
+        """
+        minx, miny, maxx, maxy = self.viewport.get_visible_rect()
+        drawn = False
+        for wall in walls:
+            (sx, sy), (ex, ey) = wall.get_base().coords
+            if max(sx, ex) < minx or min(sx, ex) > maxx or max(sy, ey) < miny or min(sy, ey) > maxy:
+                continue
+            clipped = self.screen.get_rect().inflate(10, 10).clipline(self.viewport.to_screen(sx, sy),
+                                                                     self.viewport.to_screen(ex, ey))
+            if len(clipped) > 0:
+                pygame.draw.line(self.screen, self._get_random_color(), clipped[0], clipped[1], 5)
+                drawn = True
+        return drawn
+
+    def _draw_border(self) -> None:
+        """
+        Draws the scene's bounding box.
+
+        :return: None
+        """
+        minx, miny, maxx, maxy = self.viewport.bounds
+        left, top = self.viewport.to_screen(minx, miny)
+        right, bottom = self.viewport.to_screen(maxx, maxy)
+        # The box is clipped to just beyond the screen, so zooming far in never draws with huge coordinates
+        screen_rect = self.screen.get_rect().inflate(10, 10)
+        border = Rect(round(left), round(top), round(right - left), round(bottom - top)).clip(screen_rect)
+        if border.width > 0 and border.height > 0:
+            pygame.draw.rect(self.screen, (0, 0, 0), border, 5)
+
+    def _update_visibility_overlay(self) -> None:
+        """
+        Redraws the region visible from the camera onto the overlay.
+
+        :return: None
+        """
+        self._visibility_overlay.fill((0, 0, 0, 0))
+        polygon = self.engine.visibility_polygon(self.camera_location)
+        if polygon is not None and len(polygon) >= 3:
+            pygame.draw.polygon(self._visibility_overlay, (255, 200, 0, 96),
+                                [self.viewport.to_screen(x, y) for x, y in polygon])
 
-    @staticmethod
-    def _get_random_color() -> Color:
+    def _get_random_color(self) -> Color:
         """
         :return: a random rgb color
         """
-        return randint(0, 255), randint(0, 255), randint(0, 255)
+        return self._rng.randint(0, 255), self._rng.randint(0, 255), self._rng.randint(0, 255)
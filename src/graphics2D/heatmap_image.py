@@ -0,0 +1,37 @@
+from typing import Optional, Tuple
+
+import numpy as np
+import pygame
+
+# Colors values are mapped through, from the lowest value to the highest
+_color_stops = np.array([(0, 0, 0), (40, 20, 140), (200, 30, 60), (250, 160, 20), (255, 255, 210)], dtype=np.float64)
+
+
+def colorize(values: np.ndarray, value_range: Optional[Tuple[float, float]] = None) -> np.ndarray:
+    """
+    :param values: rows x columns array being shown
+    :param value_range: values shown with the first and last colors, the lowest and highest of values when None.
+        Sharing a range between heatmaps makes them comparable
+    :return: rows x columns x 3 array of 8 bit colors
+    """
+    low, high = (float(values.min()), float(values.max())) if value_range is None else value_range
+    scaled = np.clip((values - low) / (high - low), 0, 1) if high > low else np.zeros(values.shape)
+    positions = scaled * (len(_color_stops) - 1)
+    lower = np.minimum(positions.astype(np.int64), len(_color_stops) - 2)
+    fraction = (positions - lower)[..., np.newaxis]
+    colors = _color_stops[lower] * (1 - fraction) + _color_stops[lower + 1] * fraction
+    return colors.round().astype(np.uint8)
+
+
+def save_heatmap_image(values: np.ndarray, path: str, value_range: Optional[Tuple[float, float]] = None) -> None:
+    """
+    Writes a heatmap as an image, laid out like the top down visualizer draws the scene: x to the right and y down.
+
+    :param values: rows x columns array being shown, indexed by row along y then column along x
+    :param path: image file being written, whose format is picked by its extension
+    :param value_range: values shown with the first and last colors, the lowest and highest of values when None
+    :return: None
+    """
+    # Surfaces are indexed by column then row
+    surface = pygame.surfarray.make_surface(colorize(values, value_range).transpose(1, 0, 2))
+    pygame.image.save(surface, path)
@@ -0,0 +1,106 @@
+import math
+from collections import OrderedDict
+from typing import Tuple
+
+import pygame
+
+from engines.hidden_surface_engine import HiddenSurfaceEngine
+from graphics2D.viewport import Viewport
+
+TileKey = Tuple[int, int, int]  # Zoom level, column and row of a tile
+
+
+class MapTileCache:
+    """
+    Renders every wall of a scene as a map underneath the walls drawn by painter's algorithm.
+    The map is cut into square tiles on a grid for each zoom level, and each tile is rendered from only the walls
+    that overlap it. Rendered tiles are kept for as long as they're among the most recently shown, so the time taken
+    to draw the map depends on how much of it is on screen, and panning over tiles seen before costs only blits.
+    """
+    tile_size = 256  # Width and height of a tile in pixels
+    line_width = 2
+    line_color = (190, 190, 190)
+
+    def __init__(self, engine: HiddenSurfaceEngine, max_tiles: int = 512) -> None:
+        """
+        :param engine: hidden surface engine of the scene, which finds the walls overlapping each tile
+        :param max_tiles: number of rendered tiles kept
+        """
+        self.engine = engine
+        self.max_tiles = max_tiles
+        self._tiles: OrderedDict = OrderedDict()  # Rendered tiles by TileKey, least recently shown first
+
+    def draw(self, surface: pygame.Surface, viewport: Viewport) -> None:
+        """
+        Draws the part of the map shown by viewport, rendering any tiles that aren't cached.
+
+        :param surface: surface the map is drawn on
+        :param viewport: part of the scene being shown
+        :return: None
+        """
+        tile_size = MapTileCache.tile_size
+        scale = viewport.get_scale()
+        minx, miny, _, _ = viewport.bounds
+        # Tiles are laid out from the corner of the scene's bounding box, and the screen is offset from that corner by
+        # a whole number of pixels, so neighbouring tiles always line up
+        offset_x = round((viewport.x - minx) * scale)
+        offset_y = round((viewport.y - miny) * scale)
+        width, height = surface.get_size()
+        for column in range(math.floor(offset_x / tile_size), math.floor((offset_x + width) / tile_size) + 1):
+            for row in range(math.floor(offset_y / tile_size), math.floor((offset_y + height) / tile_size) + 1):
+                tile = self._get_tile((viewport.zoom, column, row), viewport)
+                surface.blit(tile, (column * tile_size - offset_x, row * tile_size - offset_y))
+
+    def clear(self) -> None:
+        """
+        Forgets every rendered tile, for when walls were added or removed.
+
+        :return: None
+        """
+        self._tiles.clear()
+
+    def _get_tile(self, key: TileKey, viewport: Viewport) -> pygame.Surface:
+        """
+        :param key: zoom level, column and row of the tile
+        :param viewport: part of the scene being shown, at the tile's zoom level
+        :return: rendered tile
+        """
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            return tile
+        tile = self._render_tile(key, viewport)
+        self._tiles[key] = tile
+        if len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+        return tile
+
+    def _render_tile(self, key: TileKey, viewport: Viewport) -> pygame.Surface:
+        """
+        :param key: zoom level, column and row of the tile
+        :param viewport: part of the scene being shown, at the tile's zoom level
+        :return: transparent tile with the walls overlapping it drawn on
+        """
+        tile_size = MapTileCache.tile_size
+        _, column, row = key
+        scale = viewport.get_scale()
+        minx, miny, _, _ = viewport.bounds
+        tile_x = minx + column * tile_size / scale  # Scene coordinates of the tile's top left corner
+        tile_y = miny + row * tile_size / scale
+        # Walls just outside the tile are included, since their width can reach into it
+        margin = MapTileCache.line_width / scale
+        walls = self.engine.lines_in_rect(tile_x - margin, tile_y - margin,
+                                          tile_x + (tile_size + 1) / scale + margin,
+                                          tile_y + (tile_size + 1) / scale + margin)
+
+        tile = pygame.Surface((tile_size, tile_size), pygame.SRCALPHA)
+        # Lines are clipped to just beyond the tile, so zooming far in never draws with huge coordinates
+        clip_rect = pygame.Rect(-MapTileCache.line_width, -MapTileCache.line_width,
+                                tile_size + 2 * MapTileCache.line_width, tile_size + 2 * MapTileCache.line_width)
+        for wall in walls:
+            (sx, sy), (ex, ey) = wall.get_base().coords
+            clipped = clip_rect.clipline((sx - tile_x) * scale, (sy - tile_y) * scale,
+                                         (ex - tile_x) * scale, (ey - tile_y) * scale)
+            if len(clipped) > 0:
+                pygame.draw.line(tile, MapTileCache.line_color, clipped[0], clipped[1], MapTileCache.line_width)
+        return tile
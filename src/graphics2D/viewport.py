@@ -0,0 +1,102 @@
+import math
+from typing import Tuple
+
+Rectangle = Tuple[float, float, float, float]  # Minimum x, minimum y, maximum x and maximum y
+
+
+class Viewport:
+    """
+    The part of a top-down scene shown on screen, which can be zoomed and panned.
+    Zoom levels are discrete, so anything rendered at one zoom level can be reused whenever it's shown again.
+    Screen coordinates grow in the same directions as scene coordinates.
+    """
+    zoom_step = math.sqrt(2)  # Factor the scale changes by between neighbouring zoom levels
+    min_zoom = -4
+    max_zoom = 16
+
+    def __init__(self, bounding_box, screen_size: Tuple[int, int]) -> None:
+        """
+        :param bounding_box: bounding box of the scene
+        :param screen_size: width and height of the screen in pixels
+        """
+        self.bounds: Rectangle = bounding_box.bounds
+        self.screen_width, self.screen_height = screen_size
+        minx, miny, maxx, maxy = self.bounds
+        # Scale at zoom level 0, which fits the whole scene on screen
+        self.fit_scale = min(self.screen_width / max(maxx - minx, 1e-9), self.screen_height / max(maxy - miny, 1e-9))
+        self.zoom = 0
+        self.x = minx  # Scene coordinates of the top left corner of the screen
+        self.y = miny
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Zooms out to fit the whole scene, centered on screen.
+
+        :return: None
+        """
+        minx, miny, maxx, maxy = self.bounds
+        self.zoom = 0
+        scale = self.get_scale()
+        self.x = (minx + maxx) / 2 - self.screen_width / scale / 2
+        self.y = (miny + maxy) / 2 - self.screen_height / scale / 2
+
+    def get_scale(self) -> float:
+        """
+        :return: number of pixels per unit of the scene at the current zoom level
+        """
+        return self.fit_scale * Viewport.zoom_step ** self.zoom
+
+    def to_screen(self, x: float, y: float) -> Tuple[float, float]:
+        """
+        :param x: x coordinate in the scene
+        :param y: y coordinate in the scene
+        :return: pixel the point is shown at
+        """
+        scale = self.get_scale()
+        return (x - self.x) * scale, (y - self.y) * scale
+
+    def to_scene(self, px: float, py: float) -> Tuple[float, float]:
+        """
+        :param px: x coordinate on screen
+        :param py: y coordinate on screen
+        :return: point of the scene shown at the pixel
+        """
+        scale = self.get_scale()
+        return self.x + px / scale, self.y + py / scale
+
+    def get_visible_rect(self) -> Rectangle:
+        """
+        :return: part of the scene shown on screen
+        """
+        scale = self.get_scale()
+        return self.x, self.y, self.x + self.screen_width / scale, self.y + self.screen_height / scale
+
+    def pan(self, dx: float, dy: float) -> None:
+        """
+        :param dx: number of pixels to move the view right by
+        :param dy: number of pixels to move the view down by
+        :return: None
+        """
+        scale = self.get_scale()
+        self.x += dx / scale
+        self.y += dy / scale
+
+    def zoom_at(self, levels: int, px: float, py: float) -> bool:
+        """
+        Zooms in or out while keeping the point of the scene under a pixel in place.
+
+        :param levels: number of zoom levels to zoom in by, negative to zoom out
+        :param px: x coordinate on screen of the pixel
+        :param py: y coordinate on screen of the pixel
+        :return: whether the zoom level changed
+        """
+        zoom = min(max(self.zoom + levels, Viewport.min_zoom), Viewport.max_zoom)
+        if zoom == self.zoom:
+            return False
+        x, y = self.to_scene(px, py)
+        self.zoom = zoom
+        scale = self.get_scale()
+        self.x = x - px / scale
+        self.y = y - py / scale
+        return True
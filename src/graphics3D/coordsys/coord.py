@@ -12,6 +12,21 @@ class Coord:
     def __init__(self, basis: np.ndarray) -> None:
         self._basis = basis  # global to coordinate change of basis
 
+    def get_basis(self) -> np.ndarray:
+        """
+        :return: copy of the global to coordinate change of basis matrix
+        """
+        return self._basis.copy()
+
+    def set_basis(self, basis: np.ndarray) -> None:
+        """
+        Replaces the basis, e.g. to restore a previously saved camera pose.
+
+        :param basis: global to coordinate change of basis matrix
+        :return: None
+        """
+        self._basis = np.array(basis, dtype=np.float64)
+
     def rotate_about_arb_axis(self, axis: np.ndarray, angle: float) -> None:
         """
         Applies a rotation matrix from a given axis and angle.
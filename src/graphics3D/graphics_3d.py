@@ -1,15 +1,15 @@
-import math
 import sys
-from typing import Generator, List
+import time
+from typing import Optional, Tuple
 
-import numpy as np
 import pygame
 from pygame.locals import *
-from shapely.geometry import Point
 
+from engines.hidden_surface_engine import HiddenSurfaceEngine
+from engines.status_overlay import StatusOverlay
 from graphics3D.camera.groundcamera import GroundCamera
-from sptree.partitionable import Partitionable
-from sptree.sp_tree import SPTree
+from graphics3D.renderer import get_camera_height, get_camera_location
+from replay.camera_trace import EVENT_KEY, EVENT_MOUSE_MOTION, TraceEvent, TraceWriter
 
 
 class Graphics3D:
@@ -22,6 +22,11 @@ class Graphics3D:
     D - moves camera right
     Q - moves camera down
     E - moves camera up
+    N - toggles walking through walls
+
+    While the camera moves, frames that take longer than the frame budget are drawn at a lower resolution and scaled
+    up to the screen, and the frame is drawn again at full resolution once the camera has come to rest.
+    Work the engine does in the background, such as building its tree, is reported in the top left corner.
     """
     key_to_motion = {
         pygame.K_w: (lambda x: x.camera.dolly_forward()),
@@ -40,16 +45,51 @@ class Graphics3D:
         pygame.K_z: (lambda x: x.camera.roll_right())
     }
 
-    def __init__(self, sptree):
+    settle_time = 0.15  # Seconds the camera has to stay still before a full resolution frame is drawn
+
+    def __init__(self, engine: HiddenSurfaceEngine, screen_size: Tuple[int, int] = (1920, 1080),
+                 frame_budget: float = 1 / 30, min_resolution_scale: float = 0.25):
+        """
+        :param engine: hidden surface engine of the scene
+        :param screen_size: width and height of the fullscreen display in pixels
+        :param frame_budget: seconds a frame may take to draw while the camera moves before the resolution is lowered
+        :param min_resolution_scale: smallest fraction of the screen's width and height frames are drawn at
+        """
+        if not 0 < min_resolution_scale <= 1:
+            raise ValueError("Minimum resolution scale {} isn't in (0, 1]".format(min_resolution_scale))
         pygame.init()
-        self.sptree = sptree
+        self.engine = engine
         self.fps = 144
         self.fpsClock = pygame.time.Clock()
-        self.screen_width = 1920
-        self.screen_height = 1080
+        self.screen_width, self.screen_height = screen_size
         self.screen = pygame.display.set_mode((self.screen_width, self.screen_height), pygame.FULLSCREEN)
+        self.frame_budget = frame_budget
+        self.min_resolution_scale = min_resolution_scale
+        self.resolution_scale = 1.0  # Fraction of the screen's width and height the next moving frame is drawn at
+        self._drawn_scale = 1.0  # Resolution scale of the frame on screen
+        self._low_res_surface: Optional[pygame.Surface] = None  # Reused between frames of the same resolution
+        self._status = StatusOverlay(engine)
         self.camera = GroundCamera()
+        self.collisions = True  # Whether the camera is stopped by walls
         self.wireframes = []
+        self._recorder: Optional[TraceWriter] = None  # Records camera poses when a trace is being recorded
+        self._recording_start = 0.0
+
+    def start_recording(self, path: str, scene_description: dict) -> None:
+        """
+        Records the camera pose of every drawn frame, along with the input events that moved the camera,
+        to a trace file that can be replayed without a display.
+
+        :param path: trace file being written
+        :param scene_description: description of the scene, from which the replay recreates the same scene
+        :return: None
+        """
+        self._recorder = TraceWriter(path, {"scene": scene_description, "engine": self.engine.get_name(),
+                                            "screen": [self.screen_width, self.screen_height],
+                                            "camera": {"focal_length": self.camera.focal_length,
+                                                       "canvas_width": self.camera.canvas_width,
+                                                       "canvas_height": self.camera.canvas_height}})
+        self._recording_start = time.perf_counter()
 
     def run(self):
         """
@@ -65,6 +105,8 @@ class Graphics3D:
         pygame.key.set_repeat(10, 10)  # Required for continuous motion when key is held down
 
         camera_moved = True
+        frame_events = []  # Input events that moved the camera since the last drawn frame
+        last_move_time = time.perf_counter()
 
         # Game loop.
         while True:
@@ -72,6 +114,9 @@ class Graphics3D:
             for event in pygame.event.get():
                 # Update Events
                 if event.type == QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE):
+                    if self._recorder is not None:
+                        self._recorder.close()
+                    self.engine.close()
                     pygame.quit()
                     sys.exit()
 
@@ -82,85 +127,89 @@ class Graphics3D:
                         self.camera.mouse_pan(rx)
                         self.camera.mouse_tilt(ry)
                         camera_moved = True
+                        frame_events.append(TraceEvent(EVENT_MOUSE_MOTION, 0, rx, ry))
 
                 # User presses a keyboard button
                 if event.type == pygame.KEYDOWN:
                     if event.key in Graphics3D.key_to_motion:
-                        Graphics3D.key_to_motion[event.key](self)
-                        camera_moved = True
+                        if self._move_camera(event.key):
+                            camera_moved = True
+                            frame_events.append(TraceEvent(EVENT_KEY, event.key, 0, 0))
+                    elif event.key == pygame.K_n:
+                        self.collisions = not self.collisions
+
+            # Walls may arrive in the background, such as tiles of a tiled scene, and have to be drawn once they do
+            if self.engine.has_new_walls():
+                camera_moved = True
 
             # Draw once when the camera is physically moved, and only once
             if camera_moved:
-                self.screen.fill((0, 0, 0))
-                self._draw_walls()
+                self._draw_frame(self.resolution_scale)
+                last_move_time = time.perf_counter()
                 camera_moved = False
-
+                if self._recorder is not None:
+                    self._recorder.write_frame(last_move_time - self._recording_start,
+                                               self.camera.coords.get_basis(), frame_events)
+                frame_events = []
+            # Once the camera comes to rest, a frame drawn at a lower resolution is replaced by a full resolution one
+            elif self._drawn_scale < 1 and time.perf_counter() - last_move_time >= Graphics3D.settle_time:
+                self._draw_frame(1.0)
+
+            # The status is drawn at full resolution, so it stays readable, and erased so the frame stays intact
+            self._status.draw(self.screen)
             pygame.display.flip()
+            self._status.erase(self.screen)
             self.fpsClock.tick(self.fps)
 
-    @staticmethod
-    def _update_draw_order(camera: GroundCamera, sptree: SPTree) -> Generator[List[Partitionable], None, None]:
+    def _draw_frame(self, scale: float) -> None:
         """
-        Returns a generator which encodes the order sptree nodes should be drawn given the camera's current location.
+        Draws the scene at a fraction of the screen's resolution, scaled up to fill the screen.
+        The time a frame takes while the camera moves sets the resolution of the next one, so the resolution drops
+        until frames fit the frame budget, and climbs back up while they take well under it.
 
-        :param camera: camera in the scene
-        :param sptree: precomputed SPTree of the scene
-        :return: generator encoding order of sptree nodes to be drawn
+        :param scale: fraction of the screen's width and height the frame is drawn at
+        :return: None
+        """
+        start = time.perf_counter()
+        if scale >= 1:
+            self.screen.fill((0, 0, 0))
+            self._draw_walls(self.screen)
+        else:
+            size = (max(1, round(self.screen_width * scale)), max(1, round(self.screen_height * scale)))
+            if self._low_res_surface is None or self._low_res_surface.get_size() != size:
+                self._low_res_surface = pygame.Surface(size, 0, self.screen)
+            self._low_res_surface.fill((0, 0, 0))
+            self._draw_walls(self._low_res_surface)
+            pygame.transform.scale(self._low_res_surface, self.screen.get_size(), self.screen)
+        self._drawn_scale = scale
+        elapsed = time.perf_counter() - start
+
+        # Most of a frame's time goes to filling pixels, so it's assumed to grow with the area drawn
+        if elapsed > self.frame_budget or elapsed < self.frame_budget / 2:
+            self.resolution_scale = min(1.0, max(self.min_resolution_scale,
+                                                 scale * (self.frame_budget / max(elapsed, 1e-6)) ** 0.5))
+
+    def _move_camera(self, key: int) -> bool:
         """
-        camera_location_3d = camera.coords.change_to_global_basis(np.array([0, 0, 0, 1]))
-        camera_location_2d = Point(camera_location_3d[0], camera_location_3d[2])
-        return sptree.painters_alg(camera_location_2d)
+        Applies the camera motion of a key, undoing it if it would take the camera through a wall at its height.
 
-    def _draw_walls(self) -> None:
+        :param key: key pressed
+        :return: whether the camera moved
+        """
+        previous_basis = self.camera.coords.get_basis()
+        previous_location = get_camera_location(self.camera)
+        Graphics3D.key_to_motion[key](self)
+        if self.collisions and self.engine.segment_blocked_at(previous_location, get_camera_location(self.camera),
+                                                              get_camera_height(self.camera)):
+            self.camera.coords.set_basis(previous_basis)
+            return False
+        return True
+
+    def _draw_walls(self, surface: pygame.Surface) -> None:
         """
-        Draws the walls of the scene using an SPTree and painter's algorithm.
+        Draws the walls of the scene in the order given by the engine.
 
+        :param surface: surface being drawn on, the screen or a lower resolution surface scaled up to it
         :return: None
         """
-        draw_order = Graphics3D._update_draw_order(self.camera, self.sptree)
-        node_radius = 3
-        line_radius = 5
-        for coincident_walls in draw_order:
-            for wall in coincident_walls:
-
-                for edge in wall.get_edges():
-                    pr_line_start = self._get_camera_visible_projection(edge[0])
-                    pr_line_end = self._get_camera_visible_projection(edge[1])
-                    if pr_line_start is not None and pr_line_end is not None:
-                        pygame.draw.line(self.screen, wall.edge_color, pr_line_start, pr_line_end, line_radius)
-
-                for node in wall.nodes:
-                    pr_pt = self._get_camera_visible_projection(node)
-                    if pr_pt is not None:
-                        pygame.draw.circle(self.screen, wall.wall_color, pr_pt, node_radius)
-
-                mesh_nodes = []
-                for node in wall.get_nodes():
-                    pr_pt = self._get_camera_visible_projection(node)
-                    if pr_pt is not None:
-                        mesh_nodes.append(pr_pt)
-
-                if len(mesh_nodes) >= 3:
-                    pygame.draw.polygon(self.screen, wall.wall_color, mesh_nodes)
-
-    def _get_camera_visible_projection(self, world_point):
-        # Camera space point
-        cs_pt = self.camera.coords.change_to_local_basis(world_point)
-
-        # Check if point is within viewing frustum
-        if cs_pt[2] < 0 and abs(cs_pt[2]) > self.camera.focal_length:
-            # Screen space - Perspective division onto near image plane
-            ss_x = self.camera.focal_length * cs_pt[0] / -cs_pt[2]
-            ss_y = self.camera.focal_length * cs_pt[1] / -cs_pt[2]
-
-            if abs(ss_x) <= self.camera.canvas_width / 2 or abs(ss_y) <= self.camera.canvas_height / 2:
-                # NDC Space - coordinates are in [0, 1]
-                ndc_x = (ss_x + self.camera.canvas_width / 2) / self.camera.canvas_width
-                ndc_y = (ss_y + self.camera.canvas_height / 2) / self.camera.canvas_height
-                # Raster space
-                rs_x = math.floor(ndc_x * self.screen_width)
-                rs_y = math.floor((1 - ndc_y) * self.screen_height)
-
-                return rs_x, rs_y
-
-        return None
+        self.engine.draw_frame(surface, self.camera)
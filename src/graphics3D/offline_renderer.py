@@ -0,0 +1,93 @@
+import os
+from multiprocessing import Pool
+from typing import Generator, List, Optional, Tuple
+
+import numpy as np
+import pygame
+
+from graphics3D.camera.groundcamera import GroundCamera
+from graphics3D.renderer import draw_compiled_walls, get_camera_location
+from sptree.compiled_tree import CompiledTree, SharedTreeHandle
+
+FRAME_FILE_FORMAT = "frame_{:05d}.png"
+
+# State of each worker process, set once by _init_worker so it isn't sent along with every frame
+_worker_tree: Optional[CompiledTree] = None
+_worker_blocks = []
+_worker_camera: Optional[GroundCamera] = None
+_worker_surface: Optional[pygame.Surface] = None
+_worker_directory: Optional[str] = None
+
+
+def render_frames(compiled_tree: CompiledTree, poses: List[np.ndarray], directory: str,
+                  screen_size: Tuple[int, int], camera_args: Optional[dict] = None,
+                  processes: Optional[int] = None) -> Generator[int, None, None]:
+    """
+    Renders a camera path to an image sequence, splitting the frames across a pool of worker processes.
+    The tree is copied into shared memory once, and every worker draws straight from it, so adding workers costs no
+    more memory for the scene. Frames are written to directory as they finish, not necessarily in order.
+
+    :param compiled_tree: flattened SPTree of the scene
+    :param poses: camera's 4x4 change of basis matrix for every frame
+    :param directory: directory the frames are written to, created if it doesn't exist
+    :param screen_size: width and height of every frame in pixels
+    :param camera_args: keyword arguments of the GroundCamera, its defaults when None
+    :param processes: number of worker processes, the number of CPUs when None
+    :return: generator of the index of every frame as soon as it's written
+    """
+    os.makedirs(directory, exist_ok=True)
+    handle, blocks = compiled_tree.to_shared_memory()
+    try:
+        with Pool(processes, initializer=_init_worker,
+                  initargs=(handle, screen_size, camera_args or {}, directory)) as pool:
+            # Poses are small, so sending several at once only amortizes the cost of passing messages
+            chunk_size = max(1, len(poses) // (4 * (processes or os.cpu_count() or 1)))
+            for index in pool.imap_unordered(_render_frame, enumerate(poses), chunk_size):
+                yield index
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def get_frame_path(directory: str, index: int) -> str:
+    """
+    :param directory: directory of an image sequence
+    :param index: index of a frame
+    :return: path of the frame's image
+    """
+    return os.path.join(directory, FRAME_FILE_FORMAT.format(index))
+
+
+def _init_worker(handle: SharedTreeHandle, screen_size: Tuple[int, int], camera_args: dict, directory: str) -> None:
+    """
+    Attaches a worker process to the shared tree and creates the camera and surface it draws with.
+
+    :param handle: handle of the tree in shared memory
+    :param screen_size: width and height of every frame in pixels
+    :param camera_args: keyword arguments of the GroundCamera
+    :param directory: directory the frames are written to
+    :return: None
+    """
+    global _worker_tree, _worker_blocks, _worker_camera, _worker_surface, _worker_directory
+    _worker_tree, _worker_blocks = CompiledTree.from_shared_memory(handle)
+    _worker_camera = GroundCamera(**camera_args)
+    _worker_surface = pygame.Surface(screen_size)
+    _worker_directory = directory
+
+
+def _render_frame(frame: Tuple[int, np.ndarray]) -> int:
+    """
+    Renders a single frame in a worker process and writes it to disk.
+
+    :param frame: index of the frame, and the camera's change of basis matrix
+    :return: index of the frame
+    """
+    index, basis = frame
+    _worker_camera.coords.set_basis(basis)
+    camera_location = get_camera_location(_worker_camera)
+    _worker_surface.fill((0, 0, 0))
+    draw_order = _worker_tree.painters_order(camera_location.x, camera_location.y)
+    draw_compiled_walls(_worker_surface, _worker_camera, _worker_tree, draw_order)
+    pygame.image.save(_worker_surface, get_frame_path(_worker_directory, index))
+    return index
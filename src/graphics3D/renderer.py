@@ -0,0 +1,168 @@
+import math
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pygame
+from shapely.geometry import Point
+
+from graphics3D.camera.abstractcamera import AbstractCamera
+from sptree.compiled_tree import CompiledTree
+from sptree.partitionable import Partitionable
+
+NODE_RADIUS = 3
+LINE_RADIUS = 5
+
+
+def get_camera_location(camera: AbstractCamera) -> Point:
+    """
+    :param camera: camera in the scene
+    :return: location of the camera projected onto the ground, in the coordinates of the SPTree
+    """
+    camera_location_3d = camera.coords.change_to_global_basis(np.array([0, 0, 0, 1]))
+    return Point(camera_location_3d[0], camera_location_3d[2])
+
+
+def get_camera_height(camera: AbstractCamera) -> float:
+    """
+    :param camera: camera in the scene
+    :return: height of the camera above the ground
+    """
+    return float(camera.coords.change_to_global_basis(np.array([0, 0, 0, 1]))[1])
+
+
+def draw_walls(surface: pygame.Surface, camera: AbstractCamera, draw_order: Iterable[List[Partitionable]]) -> None:
+    """
+    Draws walls onto surface in the given order, as seen by camera.
+    The surface doesn't have to belong to a display, so frames can also be rendered off screen.
+
+    :param surface: surface being drawn on
+    :param camera: camera in the scene
+    :param draw_order: coincident walls in the order they are drawn
+    :return: None
+    """
+    screen_width, screen_height = surface.get_size()
+    for coincident_walls in draw_order:
+        for wall in coincident_walls:
+
+            for edge in wall.get_edges():
+                pr_line_start = get_camera_visible_projection(camera, edge[0], screen_width, screen_height)
+                pr_line_end = get_camera_visible_projection(camera, edge[1], screen_width, screen_height)
+                if pr_line_start is not None and pr_line_end is not None:
+                    pygame.draw.line(surface, wall.edge_color, pr_line_start, pr_line_end, LINE_RADIUS)
+
+            for node in wall.nodes:
+                pr_pt = get_camera_visible_projection(camera, node, screen_width, screen_height)
+                if pr_pt is not None:
+                    pygame.draw.circle(surface, wall.wall_color, pr_pt, NODE_RADIUS)
+
+            mesh_nodes = []
+            for node in wall.get_nodes():
+                pr_pt = get_camera_visible_projection(camera, node, screen_width, screen_height)
+                if pr_pt is not None:
+                    mesh_nodes.append(pr_pt)
+
+            if len(mesh_nodes) >= 3:
+                pygame.draw.polygon(surface, wall.wall_color, mesh_nodes)
+
+
+def draw_compiled_walls(surface: pygame.Surface, camera: AbstractCamera, compiled_tree: CompiledTree,
+                        draw_order: np.ndarray) -> None:
+    """
+    Draws walls of a flattened SPTree onto surface in the given order, as seen by camera.
+    Walls are drawn exactly as draw_walls draws them, but their corners are projected all at once from the tree's
+    arrays, so no Wall objects are needed.
+
+    :param surface: surface being drawn on
+    :param camera: camera in the scene
+    :param compiled_tree: flattened SPTree of the scene
+    :param draw_order: indices of the walls in the order they are drawn
+    :return: None
+    """
+    screen_width, screen_height = surface.get_size()
+    bases = compiled_tree.wall_bases[draw_order]
+    heights = compiled_tree.wall_heights[draw_order]
+    base_heights = compiled_tree.wall_base_heights[draw_order]
+    colors = compiled_tree.wall_colors[draw_order].tolist()
+
+    # Corner nodes of every wall, in the same order as Wall.nodes
+    nodes = np.ones((len(draw_order), 4, 4))
+    nodes[:, :, 0] = bases[:, [0, 2, 2, 0]]
+    nodes[:, :, 1] = base_heights[:, np.newaxis]
+    nodes[:, 2:, 1] += heights[:, np.newaxis]
+    nodes[:, :, 2] = bases[:, [1, 3, 3, 1]]
+    projections, visible = _get_camera_visible_projections(camera, nodes, screen_width, screen_height)
+    projections = projections.tolist()
+    visible = visible.tolist()
+
+    for i in range(len(draw_order)):
+        _, edge_color, wall_color = map(tuple, colors[i])
+        wall_projections = projections[i]
+        wall_visible = visible[i]
+
+        for j in range(4):
+            if wall_visible[j] and wall_visible[(j + 1) % 4]:
+                pygame.draw.line(surface, edge_color, wall_projections[j], wall_projections[(j + 1) % 4], LINE_RADIUS)
+
+        mesh_nodes = [wall_projections[j] for j in range(4) if wall_visible[j]]
+        for pr_pt in mesh_nodes:
+            pygame.draw.circle(surface, wall_color, pr_pt, NODE_RADIUS)
+
+        if len(mesh_nodes) >= 3:
+            pygame.draw.polygon(surface, wall_color, mesh_nodes)
+
+
+def _get_camera_visible_projections(camera: AbstractCamera, world_points: np.ndarray,
+                                    screen_width: int, screen_height: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized form of get_camera_visible_projection.
+
+    :param camera: camera in the scene
+    :param world_points: array of points in the global basis, with the coordinates along the last axis
+    :param screen_width: width of the screen in pixels
+    :param screen_height: height of the screen in pixels
+    :return: pixel each point is drawn at, and whether the camera can see each point
+    """
+    cs_pts = camera.coords.change_to_local_basis(world_points)
+    depth = -cs_pts[..., 2]
+    in_frustum = (depth > 0) & (depth > camera.focal_length)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ss_x = camera.focal_length * cs_pts[..., 0] / depth
+        ss_y = camera.focal_length * cs_pts[..., 1] / depth
+    visible = in_frustum & ((np.abs(ss_x) <= camera.canvas_width / 2) | (np.abs(ss_y) <= camera.canvas_height / 2))
+    ndc_x = (ss_x + camera.canvas_width / 2) / camera.canvas_width
+    ndc_y = (ss_y + camera.canvas_height / 2) / camera.canvas_height
+    projections = np.stack((np.floor(ndc_x * screen_width), np.floor((1 - ndc_y) * screen_height)), axis=-1)
+    return np.where(visible[..., np.newaxis], projections, 0).astype(np.int64), visible
+
+
+def get_camera_visible_projection(camera: AbstractCamera, world_point: np.ndarray,
+                                  screen_width: int, screen_height: int) -> Optional[Tuple[int, int]]:
+    """
+    Projects a point onto the screen.
+
+    :param camera: camera in the scene
+    :param world_point: point in the global basis
+    :param screen_width: width of the screen in pixels
+    :param screen_height: height of the screen in pixels
+    :return: pixel the point is drawn at, or None if the camera can't see it
+    """
+    # Camera space point
+    cs_pt = camera.coords.change_to_local_basis(world_point)
+
+    # Check if point is within viewing frustum
+    if cs_pt[2] < 0 and abs(cs_pt[2]) > camera.focal_length:
+        # Screen space - Perspective division onto near image plane
+        ss_x = camera.focal_length * cs_pt[0] / -cs_pt[2]
+        ss_y = camera.focal_length * cs_pt[1] / -cs_pt[2]
+
+        if abs(ss_x) <= camera.canvas_width / 2 or abs(ss_y) <= camera.canvas_height / 2:
+            # NDC Space - coordinates are in [0, 1]
+            ndc_x = (ss_x + camera.canvas_width / 2) / camera.canvas_width
+            ndc_y = (ss_y + camera.canvas_height / 2) / camera.canvas_height
+            # Raster space
+            rs_x = math.floor(ndc_x * screen_width)
+            rs_y = math.floor((1 - ndc_y) * screen_height)
+
+            return rs_x, rs_y
+
+    return None
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import math
+import random
+from typing import Dict, Generator, List, NamedTuple, Optional
+
+from shapely.geometry import Point
+
+from sptree.extents import Extent
+from sptree.partitionable import Partitionable
+from sptree.sp_tree import SPTree
+from wall.wall import Wall
+
+
+class Level(NamedTuple):
+    """
+    A level of a scene, such as a floor of a building, whose walls all stand at the same height.
+    """
+    base_height: float  # Height of the bottom of the level's walls above the ground
+    top_height: float  # Height of the top of the level's tallest wall above the ground
+    sptree: SPTree  # Tree of the level's walls
+
+
+class VerticalView(NamedTuple):
+    """
+    Which heights a camera can see.
+    """
+    height: float  # Height of the camera above the ground
+    min_elevation: float  # Lowest angle above the horizon the camera sees, in radians from -pi / 2 to pi / 2
+    max_elevation: float  # Highest angle above the horizon the camera sees, in radians from -pi / 2 to pi / 2
+
+
+class LevelStack:
+    """
+    A scene made of levels stacked on top of each other, each with its own SPTree.
+    Levels never overlap in height, so a camera sees a level above it through every level in between, and one below
+    it the same way. Painter's algorithm therefore draws the level furthest above or below the camera first, and only
+    traverses the levels the camera can see, so its cost grows with the levels in view rather than the whole scene.
+    """
+
+    def __init__(self, levels: List[Level], bounding_box) -> None:
+        """
+        :param levels: levels of the scene, in any order
+        :param bounding_box: bounding box of every level's walls
+        """
+        self.levels = sorted(levels, key=lambda level: level.base_height)
+        for below, above in zip(self.levels, self.levels[1:]):
+            if below.top_height > above.base_height:
+                raise ValueError("Level from {} to {} overlaps the level starting at {}".format(
+                    below.base_height, below.top_height, above.base_height))
+        self.bounding_box = bounding_box
+
+    @staticmethod
+    def from_walls(walls: List[Wall], bounding_box, lazy: bool = False,
+                   rng: Optional[random.Random] = None) -> LevelStack:
+        """
+        Builds a level for every base height of the walls.
+
+        :param walls: walls of the scene
+        :param bounding_box: bounding box of the walls
+        :param lazy: whether subtrees of each level are only built once a traversal first needs them
+        :param rng: source of randomness for picking splitting lines
+        :return: stack of the walls' levels
+        """
+        rng = random.Random() if rng is None else rng
+        walls_by_height: Dict[float, List[Wall]] = {}
+        for wall in walls:
+            walls_by_height.setdefault(wall.get_base_height(), []).append(wall)
+        return LevelStack([Level(base_height, max(base_height + wall.get_height() for wall in level_walls),
+                                 SPTree(level_walls, bounding_box, lazy, rng))
+                           for base_height, level_walls in walls_by_height.items()], bounding_box)
+
+    def get_level_at(self, height: float) -> Optional[Level]:
+        """
+        :param height: height above the ground
+        :return: level whose walls span height, None if it's between levels or outside of them
+        """
+        for level in self.levels:
+            if level.base_height <= height < level.top_height:
+                return level
+        return None
+
+    def get_visible_levels(self, point: Point, view: Optional[VerticalView] = None) -> List[Level]:
+        """
+        Levels are culled when every height they span is out of view within the scene. Looking from point, the rays
+        the camera sees rise or fall at most as steeply as its elevation range allows, and no further than the
+        furthest corner of the bounding box.
+
+        :param point: camera location
+        :param view: heights the camera sees, every level from the ground when None
+        :return: levels the camera may see, from the furthest above or below the camera to the nearest
+        """
+        if view is None:
+            return sorted(self.levels, key=lambda level: -level.base_height)
+        minx, miny, maxx, maxy = self.bounding_box.bounds
+        distance = math.hypot(max(point.x - minx, maxx - point.x), max(point.y - miny, maxy - point.y))
+        lowest = view.height + distance * math.tan(view.min_elevation) if view.min_elevation > -math.pi / 2 \
+            else -math.inf
+        highest = view.height + distance * math.tan(view.max_elevation) if view.max_elevation < math.pi / 2 \
+            else math.inf
+        visible = [level for level in self.levels
+                   if level.base_height <= max(highest, view.height) and level.top_height >= min(lowest, view.height)]
+        # Vertical distance from the camera to the nearest height of each level, which is 0 for the camera's level
+        visible.sort(key=lambda level: -max(level.base_height - view.height, view.height - level.top_height, 0))
+        return visible
+
+    def painters_alg(self, point: Point, view: Optional[VerticalView] = None,
+                     rect: Optional[Extent] = None) -> Generator[List[Partitionable], None, None]:
+        """
+        Applies painter's algorithm to the levels the camera can see, from back to front, each with its own SPTree.
+
+        :param point: camera location
+        :param view: heights the camera sees, every level from the ground when None
+        :param rect: minimum x, minimum y, maximum x and maximum y of the area being drawn, None to draw every line
+        :return: generator for Painter's Algorithm
+        """
+        for level in self.get_visible_levels(point, view):
+            yield from level.sptree.painters_alg(point, rect=rect)
+
+    def segment_blocked(self, start: Point, end: Point, height: Optional[float] = None) -> bool:
+        """
+        :param start: start of the segment
+        :param end: end of the segment
+        :param height: height of the segment above the ground, None to consider walls of every level
+        :return: whether any line crosses or touches the segment, other than at start
+        """
+        if height is None:
+            return any(level.sptree.segment_blocked(start, end) for level in self.levels)
+        level = self.get_level_at(height)
+        return level is not None and level.sptree.segment_blocked(start, end)
+
+    def lines_in_rect(self, minx: float, miny: float, maxx: float, maxy: float) -> List[Partitionable]:
+        """
+        :param minx: minimum x of the rectangle
+        :param miny: minimum y of the rectangle
+        :param maxx: maximum x of the rectangle
+        :param maxy: maximum y of the rectangle
+        :return: lines of every level whose bounding boxes overlap the rectangle, in no particular order
+        """
+        return [line for level in self.levels for line in level.sptree.lines_in_rect(minx, miny, maxx, maxy)]
+
+    def build_remaining_in_background(self) -> None:
+        """
+        Starts a background thread for every lazily built level, which builds the rest of its SPTree.
+
+        :return: None
+        """
+        for level in self.levels:
+            level.sptree.build_remaining_in_background()
@@ -0,0 +1,122 @@
+import json
+import struct
+from typing import BinaryIO, Generator, List, NamedTuple
+
+import numpy as np
+
+MAGIC = b"HSVTRACE"
+VERSION = 2
+
+# Kinds of recorded input events
+EVENT_KEY = 0
+EVENT_MOUSE_MOTION = 1
+
+_header_format = struct.Struct("<8sHI")  # Magic, version, length of the JSON header
+_frame_format = struct.Struct("<dH12f")  # Seconds since recording started, number of events, camera pose
+# Frame formats of earlier versions that can still be read. Version 1 stored the time in single precision
+_old_frame_formats = {1: struct.Struct("<fH12f")}
+_event_format = struct.Struct("<Bihh")  # Kind, key code, relative mouse motion
+
+
+class TraceEvent(NamedTuple):
+    """
+    An input event that moved the camera.
+    """
+    kind: int  # EVENT_KEY or EVENT_MOUSE_MOTION
+    code: int  # Key pressed, 0 for mouse motion
+    dx: int  # Relative mouse motion along x, 0 for key presses
+    dy: int  # Relative mouse motion along y, 0 for key presses
+
+
+class TraceFrame(NamedTuple):
+    """
+    A drawn frame: the camera's pose once it was drawn, and the input events that led to it.
+    """
+    time: float  # Seconds since recording started
+    basis: np.ndarray  # Camera's 4x4 global to camera change of basis matrix
+    events: List[TraceEvent]
+
+
+class TraceWriter:
+    """
+    Records the camera poses and input events of a session to a compact binary trace file.
+    The header describes the scene, so the trace can later be replayed against the same scene.
+    """
+
+    def __init__(self, path: str, header: dict) -> None:
+        """
+        :param path: trace file being written
+        :param header: JSON serializable description of the scene, screen and camera
+        """
+        self._file: BinaryIO = open(path, "wb")
+        encoded_header = json.dumps(header).encode("utf-8")
+        self._file.write(_header_format.pack(MAGIC, VERSION, len(encoded_header)))
+        self._file.write(encoded_header)
+
+    def write_frame(self, time: float, basis: np.ndarray, events: List[TraceEvent]) -> None:
+        """
+        Appends a frame to the trace.
+
+        :param time: seconds since recording started
+        :param basis: camera's 4x4 change of basis matrix, whose last column is always (0, 0, 0, 1)
+        :param events: input events since the previous frame
+        :return: None
+        """
+        self._file.write(_frame_format.pack(time, len(events), *np.asarray(basis)[:, :3].ravel()))
+        for event in events:
+            self._file.write(_event_format.pack(*event))
+
+    def close(self) -> None:
+        """
+        Finishes writing the trace.
+
+        :return: None
+        """
+        self._file.close()
+
+
+class TraceReader:
+    """
+    Reads a trace file written by TraceWriter.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: trace file being read
+        """
+        self.path = path
+        with open(path, "rb") as file:
+            magic, version, header_length = _header_format.unpack(file.read(_header_format.size))
+            if magic != MAGIC or (version != VERSION and version not in _old_frame_formats):
+                raise ValueError("{} is not a version {} trace file".format(path, VERSION))
+            self._frame_format = _old_frame_formats.get(version, _frame_format)
+            self.header = json.loads(file.read(header_length).decode("utf-8"))
+            self._frames_offset = file.tell()
+
+    def frames(self) -> Generator[TraceFrame, None, None]:
+        """
+        :return: generator of every frame in the trace, in the order they were recorded
+        """
+        with open(self.path, "rb") as file:
+            file.seek(self._frames_offset)
+            while True:
+                data = file.read(self._frame_format.size)
+                if len(data) < self._frame_format.size:
+                    return
+                time, num_events, *pose = self._frame_format.unpack(data)
+                basis = np.zeros((4, 4))
+                basis[:, :3] = np.array(pose).reshape(4, 3)
+                basis[3, 3] = 1
+                events = [TraceEvent(*_event_format.unpack(file.read(_event_format.size))) for _ in range(num_events)]
+                yield TraceFrame(time, basis, events)
+
+    def camera_locations(self) -> np.ndarray:
+        """
+        :return: n x 2 array of where the camera was on the ground at every frame, in the coordinates of the SPTree
+        """
+        bases = [frame.basis for frame in self.frames()]
+        if len(bases) == 0:
+            return np.empty((0, 2))
+        # The camera's origin in global coordinates, just as graphics3D.renderer.get_camera_location finds it
+        locations = np.matmul(np.array([0, 0, 0, 1]), np.linalg.inv(np.array(bases)))
+        return locations[:, [0, 2]]
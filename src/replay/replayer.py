@@ -0,0 +1,97 @@
+import random
+import time
+import zlib
+from typing import Iterable, List, NamedTuple
+
+import numpy as np
+import pygame
+
+from engines.bsp_engine import BSPEngine
+from engines.engine_selection import create_engine
+from engines.hidden_surface_engine import HiddenSurfaceEngine
+from graphics3D.camera.groundcamera import GroundCamera
+from graphics3D.renderer import draw_walls
+from replay.camera_trace import TraceReader
+from sptree.partitionable import Partitionable
+from sptree.sp_tree import SPTree
+from wall.scene_io import create_scene
+
+
+class FrameResult(NamedTuple):
+    """
+    Timing and draw order of a single replayed frame.
+    """
+    draw_time: float  # Seconds taken to traverse the SPTree and draw the frame
+    checksum: int  # CRC32 of the walls in the order they were drawn
+    num_walls: int  # Number of walls drawn
+
+
+def create_sptree(description: dict) -> SPTree:
+    """
+    Creates the SPTree of a scene description, as stored in a trace's header.
+    A description may name a saved tree under "tree", otherwise it's a description accepted by create_scene.
+    Trees built from walls are the same every time when the description includes a "seed".
+
+    :param description: description of the scene
+    :return: SPTree of the scene
+    """
+    if description.get("tree") is not None:
+        return SPTree.load(description["tree"])
+    lines, b_box = create_scene(description)
+    return SPTree(lines, b_box, rng=random.Random(description.get("seed")))
+
+
+def create_scene_engine(description: dict, engine_name: str = "bsp") -> HiddenSurfaceEngine:
+    """
+    Creates the engine a session drew a scene with, as stored in a trace's header.
+    Saved trees are always drawn with their tree, and the engine's trees are built from the description's "seed".
+
+    :param description: description of the scene, as accepted by create_sptree
+    :param engine_name: name of the engine, one of engine_selection.ENGINE_NAMES
+    :return: engine of the scene
+    """
+    if description.get("tree") is not None:
+        return BSPEngine(SPTree.load(description["tree"]))
+    lines, b_box = create_scene(description)
+    return create_engine(engine_name, lines, b_box, rng=random.Random(description.get("seed")))
+
+
+def replay_trace(path: str) -> List[FrameResult]:
+    """
+    Replays the camera poses of a trace against its scene without a display, with the engine the session used.
+    Frames are drawn off screen exactly as they would be on screen, so timings are comparable between runs,
+    and checksums show whether a change altered the draw order. Traces that don't name their engine were drawn with
+    an SPTree. The background engine switches to its tree whenever the build finishes, so which of its frames were
+    depth sorted depends on how fast the replaying machine builds the tree.
+
+    :param path: trace file being replayed
+    :return: timing and draw order of every frame
+    """
+    reader = TraceReader(path)
+    engine = create_scene_engine(reader.header["scene"], reader.header.get("engine", "bsp"))
+    camera = GroundCamera(**reader.header["camera"])
+    surface = pygame.Surface(tuple(reader.header["screen"]))
+
+    results = []
+    try:
+        for frame in reader.frames():
+            camera.coords.set_basis(frame.basis)
+            surface.fill((0, 0, 0))
+            start = time.perf_counter()
+            draw_order = list(engine.draw_order(camera))
+            draw_walls(surface, camera, draw_order)
+            draw_time = time.perf_counter() - start
+            walls = [wall for coincident_walls in draw_order for wall in coincident_walls]
+            results.append(FrameResult(draw_time, get_draw_order_checksum(walls), len(walls)))
+    finally:
+        engine.close()
+    return results
+
+
+def get_draw_order_checksum(walls: Iterable[Partitionable]) -> int:
+    """
+    :param walls: walls in the order they are drawn
+    :return: CRC32 of the coordinates of the walls, which only matches another checksum for the same order
+    """
+    coords = np.array([wall.get_base().coords[:] for wall in walls], dtype=np.float64)
+    return zlib.crc32(coords.tobytes())
@@ -0,0 +1,109 @@
+import struct
+from typing import List, Tuple
+
+import numpy as np
+
+# Queries are sent and answered as raw little-endian arrays, so neither side has to parse text per point.
+# Points are n x 2 float64 arrays and rays are n x 4 float64 arrays of origins followed by directions.
+# Updates and scene listings are small, so they're sent as JSON instead.
+
+CONTENT_TYPE = "application/octet-stream"
+VERSION_HEADER = "X-Snapshot-Version"  # Version of the snapshot that answered a query or resulted from an update
+
+# A drawn piece of a wall: the id of the wall it was split from, and its start and end coordinates
+FRAGMENT_DTYPE = np.dtype([("wall", "<i4"), ("coords", "<f8", (4,))])
+# Vertex of a visibility polygon, decoded as an n x 2 float64 array
+VERTEX_DTYPE = np.dtype(("<f8", (2,)))
+# First wall hit by a ray: its distance in multiples of the ray's direction, inf and -1 for rays that hit nothing
+RAY_HIT_DTYPE = np.dtype([("distance", "<f8"), ("wall", "<i4")])
+
+_count_format = struct.Struct("<I")  # Number of results in a response
+
+
+def encode_points(points: np.ndarray) -> bytes:
+    """
+    :param points: n x 2 array of points
+    :return: request body holding the points
+    """
+    return np.ascontiguousarray(points, dtype="<f8").reshape(-1, 2).tobytes()
+
+
+def decode_points(body: bytes) -> np.ndarray:
+    """
+    :param body: request body written by encode_points
+    :return: n x 2 array of points
+    """
+    return _decode_array(body, 2)
+
+
+def encode_rays(origins: np.ndarray, directions: np.ndarray) -> bytes:
+    """
+    :param origins: n x 2 array of ray origins
+    :param directions: n x 2 array of ray directions
+    :return: request body holding the rays
+    """
+    origins = np.asarray(origins, dtype="<f8").reshape(-1, 2)
+    directions = np.asarray(directions, dtype="<f8").reshape(-1, 2)
+    return np.hstack((origins, directions)).tobytes()
+
+
+def decode_rays(body: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :param body: request body written by encode_rays
+    :return: n x 2 array of ray origins, and n x 2 array of ray directions
+    """
+    rays = _decode_array(body, 4)
+    return rays[:, :2], rays[:, 2:]
+
+
+def encode_groups(groups: List[np.ndarray], dtype: np.dtype) -> bytes:
+    """
+    Packs a variable length result for every query point: the number of results, the length of every group,
+    then every group's items back to back.
+
+    :param groups: items answering each query point, already in the little-endian layout of dtype
+    :param dtype: dtype of the items
+    :return: response body holding the groups
+    """
+    counts = np.array([len(group) for group in groups], dtype="<u4")
+    items = np.concatenate(groups) if len(groups) > 0 else np.empty(0, dtype=dtype)
+    return _count_format.pack(len(groups)) + counts.tobytes() + items.tobytes()
+
+
+def decode_groups(body: bytes, dtype: np.dtype) -> List[np.ndarray]:
+    """
+    :param body: response body written by encode_groups
+    :param dtype: dtype of the items
+    :return: items answering each query point
+    """
+    (num_groups,) = _count_format.unpack_from(body)
+    counts = np.frombuffer(body, dtype="<u4", count=num_groups, offset=_count_format.size)
+    items = np.frombuffer(body, dtype=dtype, offset=_count_format.size + counts.nbytes)
+    return np.split(items, np.cumsum(counts)[:-1]) if num_groups > 0 else []
+
+
+def encode_ray_hits(hits: np.ndarray) -> bytes:
+    """
+    :param hits: array of RAY_HIT_DTYPE
+    :return: response body holding the hits
+    """
+    return hits.astype(RAY_HIT_DTYPE, copy=False).tobytes()
+
+
+def decode_ray_hits(body: bytes) -> np.ndarray:
+    """
+    :param body: response body written by encode_ray_hits
+    :return: array of RAY_HIT_DTYPE
+    """
+    return np.frombuffer(body, dtype=RAY_HIT_DTYPE)
+
+
+def _decode_array(body: bytes, width: int) -> np.ndarray:
+    """
+    :param body: raw float64 array
+    :param width: number of columns of the array
+    :return: n x width array
+    """
+    if len(body) % (8 * width) != 0:
+        raise ValueError("Body of {} bytes isn't an array of {} float64 columns".format(len(body), width))
+    return np.frombuffer(body, dtype="<f8").reshape(-1, width)
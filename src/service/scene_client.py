@@ -0,0 +1,134 @@
+import json
+import math
+from http.client import HTTPConnection
+from typing import List, Optional
+
+import numpy as np
+from shapely.geometry import box
+
+from service import protocol
+from wall.scene_io import wall_to_dict
+from wall.wall import Wall
+
+
+class ServiceError(Exception):
+    """
+    A request that a SceneServer refused.
+    """
+
+    def __init__(self, status: int, message: str) -> None:
+        """
+        :param status: HTTP status of the response
+        :param message: reason given by the server
+        """
+        super().__init__("{} {}".format(status, message))
+        self.status = status
+
+
+class SceneClient:
+    """
+    Queries and updates the scenes of a SceneServer over a single kept-alive connection.
+    A client isn't thread safe, so each thread querying a server should use its own client.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8000, timeout: Optional[float] = None) -> None:
+        """
+        :param host: address of the server
+        :param port: port of the server
+        :param timeout: seconds to wait for the server before giving up, forever when None
+        """
+        self._connection = HTTPConnection(host, port, timeout=timeout)
+        self.version: Optional[int] = None  # Version of the snapshot that answered the last request
+
+    def get_scenes(self) -> dict:
+        """
+        :return: version and number of walls of every served scene, by name
+        """
+        return json.loads(self._request("GET", "/scenes"))
+
+    def set_scene(self, name: str, walls: List[Wall], bounding_box: box, seed: Optional[int] = None) -> List[int]:
+        """
+        Builds a scene on the server, replacing any scene already served under name.
+
+        :param name: name of the scene
+        :param walls: walls of the scene
+        :param bounding_box: bounding box for the walls
+        :param seed: seed for building the SPTree, so the server builds the same tree every time
+        :return: id given to each wall
+        """
+        scene = {"bounding_box": list(bounding_box.bounds), "walls": [wall_to_dict(wall) for wall in walls],
+                 "seed": seed}
+        return json.loads(self._request("PUT", "/scenes/{}".format(name), json.dumps(scene).encode("utf-8")))["ids"]
+
+    def add_walls(self, name: str, walls: List[Wall]) -> List[int]:
+        """
+        :param name: name of a scene
+        :param walls: walls being added to the scene
+        :return: id given to each wall
+        """
+        body = json.dumps({"walls": [wall_to_dict(wall) for wall in walls]}).encode("utf-8")
+        return json.loads(self._request("POST", "/scenes/{}/walls".format(name), body))["ids"]
+
+    def remove_walls(self, name: str, ids: List[int]) -> None:
+        """
+        :param name: name of a scene
+        :param ids: ids of the walls being removed from the scene
+        :return: None
+        """
+        self._request("DELETE", "/scenes/{}/walls".format(name), json.dumps({"ids": list(ids)}).encode("utf-8"))
+
+    def painters_alg(self, name: str, points: np.ndarray) -> List[np.ndarray]:
+        """
+        :param name: name of a scene
+        :param points: n x 2 array of camera locations
+        :return: pieces of walls in the order they're drawn from each camera location, as arrays of FRAGMENT_DTYPE
+            holding the id of each piece's wall and its coordinates
+        """
+        body = self._request("POST", "/scenes/{}/painters".format(name), protocol.encode_points(points))
+        return protocol.decode_groups(body, protocol.FRAGMENT_DTYPE)
+
+    def visibility_polygons(self, name: str, points: np.ndarray) -> List[np.ndarray]:
+        """
+        :param name: name of a scene
+        :param points: n x 2 array of points
+        :return: vertices of the visibility polygon from each point, as k x 2 arrays
+        """
+        body = self._request("POST", "/scenes/{}/visibility".format(name), protocol.encode_points(points))
+        return protocol.decode_groups(body, protocol.VERTEX_DTYPE)
+
+    def raycast(self, name: str, origins: np.ndarray, directions: np.ndarray,
+                max_distance: float = math.inf) -> np.ndarray:
+        """
+        :param name: name of a scene
+        :param origins: n x 2 array of ray origins
+        :param directions: n x 2 array of ray directions
+        :param max_distance: furthest distance along each ray that's searched, in multiples of its direction
+        :return: first wall hit by each ray, as an array of RAY_HIT_DTYPE holding the distance to the hit and the id of
+            the wall, inf and -1 for rays that hit nothing
+        """
+        path = "/scenes/{}/raycast?max_distance={!r}".format(name, float(max_distance))
+        return protocol.decode_ray_hits(self._request("POST", path, protocol.encode_rays(origins, directions)))
+
+    def close(self) -> None:
+        """
+        Closes the connection to the server.
+
+        :return: None
+        """
+        self._connection.close()
+
+    def _request(self, method: str, path: str, body: bytes = b"") -> bytes:
+        """
+        :param method: HTTP method of the request
+        :param path: path of the request
+        :param body: body of the request
+        :return: body of the response
+        """
+        self._connection.request(method, path, body, {"Content-Type": protocol.CONTENT_TYPE})
+        response = self._connection.getresponse()
+        content = response.read()
+        if response.status != 200:
+            raise ServiceError(response.status, response.reason)
+        version = response.getheader(protocol.VERSION_HEADER)
+        self.version = int(version) if version is not None else None
+        return content
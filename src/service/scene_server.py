@@ -0,0 +1,468 @@
+from __future__ import annotations
+
+import json
+import math
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+from shapely.geometry import box, Point
+
+from service import protocol
+from sptree.node import Node
+from sptree.partitionable import Partitionable
+from sptree.sp_tree import SPTree
+from wall.scene_io import wall_from_dict
+from wall.wall import Wall
+
+# Smallest number of camera locations whose draw orders are found in a single batched pass over the tree. Each pass
+# costs a fixed amount of work per node, so a few locations are answered faster one at a time.
+_min_batch_points = 16
+# Rows and nodes a piece table may have beyond twice as many as it was built with before a snapshot builds a new one,
+# dropping those no longer in the scene
+_min_table_slack = 1024
+
+
+class _PieceTable:
+    """
+    Row of every piece of a wall that's been in a scene's tree since the table was built, shared by the scene's
+    snapshots, holding its wall's id and coordinates.
+    Snapshots never modify the nodes of their trees, so a subtree whose root is already in the table has all of its
+    pieces in it, and a new snapshot only adds the pieces of the nodes its update created. Rows are only ever
+    appended, so snapshots made earlier keep finding theirs while rows are added for later ones.
+    """
+
+    def __init__(self, wall_ids: Dict[Wall, int], root: Optional[Node]) -> None:
+        """
+        :param wall_ids: id of every wall that may be in the table's trees
+        :param root: root of the fully built tree whose pieces are given rows
+        """
+        self.wall_ids = wall_ids
+        self.rows: Dict[Partitionable, int] = {}  # Row of every piece
+        self.pieces = np.empty(0, dtype=protocol.FRAGMENT_DTYPE)  # Rows, followed by unused space for more
+        self._nodes: Set[Node] = set()  # Nodes whose pieces have rows
+        self.add_tree(root)
+        self._max_rows = 2 * len(self.rows) + _min_table_slack
+        self._max_nodes = 2 * len(self._nodes) + _min_table_slack
+
+    def add_tree(self, root: Optional[Node]) -> None:
+        """
+        Adds rows for the pieces of every node of a tree that doesn't have them yet.
+
+        :param root: root of a fully built tree
+        :return: None
+        """
+        pieces = []
+        stack = [root] if root is not None and root not in self._nodes else []
+        while len(stack) > 0:
+            node: Node = stack.pop()
+            self._nodes.add(node)
+            pieces += [piece for piece in node.lines if piece not in self.rows]
+            stack += [child for child in (node.left, node.right) if child is not None and child not in self._nodes]
+        self._append(pieces)
+
+    def needs_rebuild(self) -> bool:
+        """
+        :return: whether so many rows or nodes were added since the table was built that it should be built again
+        """
+        return len(self.rows) > self._max_rows or len(self._nodes) > self._max_nodes
+
+    def _append(self, pieces: Iterable[Partitionable]) -> None:
+        """
+        :param pieces: pieces without rows
+        :return: None
+        """
+        pieces = list(dict.fromkeys(pieces))
+        start = len(self.rows)
+        end = start + len(pieces)
+        if end > len(self.pieces):
+            # Grown into a new array, as snapshots may be reading the current one
+            grown = np.empty(max(end, 2 * len(self.pieces)), dtype=protocol.FRAGMENT_DTYPE)
+            grown[:start] = self.pieces[:start]
+            self.pieces = grown
+        self.pieces["wall"][start:end] = [self.wall_ids[piece.get_source()] for piece in pieces]
+        self.pieces["coords"][start:end] = np.array([piece.get_base().coords[:] for piece in pieces],
+                                                    dtype=np.float64).reshape(-1, 4)
+        # Rows are only looked up once they're filled in
+        self.rows.update(zip(pieces, range(start, end)))
+
+
+class SceneSnapshot:
+    """
+    An immutable version of a served scene.
+    Updates create a new snapshot from the previous one, sharing every node of its SPTree that they don't touch, so
+    queries keep running against the snapshot they started with while an update is being made.
+    Walls are identified by ids that stay the same across snapshots, and every drawn piece of a wall is answered with
+    the id of the wall it was split from.
+    """
+
+    def __init__(self, version: int, sptree: SPTree, walls: Dict[int, Wall], next_id: int,
+                 piece_table: Optional[_PieceTable] = None) -> None:
+        """
+        :param version: number of updates made to the scene before this snapshot
+        :param sptree: SPTree of the walls, which is never modified once the snapshot is made
+        :param walls: every wall of the scene, by id
+        :param next_id: id of the next wall added to the scene
+        :param piece_table: table of the previous snapshot, which already has the walls' ids, None to build one
+        """
+        self.version = version
+        self.sptree = sptree
+        self.walls = walls
+        self._next_id = next_id
+
+        # Every piece of a wall in the tree has a row holding its wall's id and coordinates, so a draw order is
+        # answered by indexing an array instead of reading each piece's geometry. Rows of removed pieces are kept
+        # until the table has grown enough to be worth building again.
+        if piece_table is None or piece_table.needs_rebuild():
+            piece_table = _PieceTable({wall: wall_id for wall_id, wall in walls.items()}, sptree.root)
+        else:
+            piece_table.add_tree(sptree.root)
+        self._piece_table = piece_table
+        # Read once, so queries use the rows as they are now even if more are added in a larger array
+        self._rows = piece_table.rows
+        self._pieces = piece_table.pieces
+
+    @staticmethod
+    def build(walls: List[Wall], bounding_box: box, rng: Optional[random.Random] = None) -> SceneSnapshot:
+        """
+        :param walls: walls of the scene, given ids in order starting from 0
+        :param bounding_box: bounding box for the walls
+        :param rng: source of randomness for building the SPTree
+        :return: first snapshot of the scene
+        """
+        sptree = SPTree(walls, bounding_box, rng=rng)
+        return SceneSnapshot(0, sptree, dict(enumerate(walls)), len(walls))
+
+    @staticmethod
+    def from_sptree(sptree: SPTree) -> SceneSnapshot:
+        """
+        Any nodes of a lazily built SPTree that haven't been built yet are built first.
+
+        :param sptree: SPTree of walls, such as one loaded from a file, which is never modified afterwards
+        :return: first snapshot of the scene, with ids given to the walls in the order the tree holds them
+        """
+        sptree.build_remaining()
+        walls = {}  # Used as an ordered set, so ids don't depend on hashing
+        stack = [sptree.root] if sptree.root is not None else []
+        while len(stack) > 0:
+            node = stack.pop()
+            walls.update((line.get_source(), None) for line in node.lines)
+            stack += [child for child in (node.right, node.left) if child is not None]
+        return SceneSnapshot(0, sptree, dict(enumerate(walls)), len(walls))
+
+    def with_walls(self, walls: List[Wall]) -> Tuple[SceneSnapshot, List[int]]:
+        """
+        :param walls: walls being added
+        :return: next snapshot, holding walls as well, and the ids given to walls
+        """
+        ids = list(range(self._next_id, self._next_id + len(walls)))
+        scene_walls = dict(self.walls)
+        scene_walls.update(zip(ids, walls))
+        self._piece_table.wall_ids.update(zip(walls, ids))
+        snapshot = SceneSnapshot(self.version + 1, self.sptree.with_lines(walls), scene_walls,
+                                 self._next_id + len(walls), self._piece_table)
+        return snapshot, ids
+
+    def without_walls(self, ids: List[int]) -> SceneSnapshot:
+        """
+        :param ids: ids of the walls being removed
+        :return: next snapshot, without the walls
+        """
+        unknown_ids = [wall_id for wall_id in ids if wall_id not in self.walls]
+        if len(unknown_ids) > 0:
+            raise ValueError("Unknown wall ids {}".format(unknown_ids))
+        scene_walls = dict(self.walls)
+        removed = [scene_walls.pop(wall_id) for wall_id in set(ids)]
+        sptree = self.sptree.without_lines(removed)
+        # Pieces split only by the removed walls are joined back, so repeated edits don't keep growing the tree
+        sptree.merge_fragments()
+        return SceneSnapshot(self.version + 1, sptree, scene_walls, self._next_id, self._piece_table)
+
+    def painters_alg(self, points: np.ndarray) -> List[np.ndarray]:
+        """
+        :param points: n x 2 array of camera locations
+        :return: pieces of walls in the order they're drawn from each camera location, as arrays of FRAGMENT_DTYPE
+        """
+        if len(points) >= _min_batch_points:
+            pieces, piece_orders = self.sptree.painters_alg_batch(points)
+            rows = np.array([self._rows[piece] for piece in pieces], dtype=np.int64)
+            return [self._pieces[rows[order[order >= 0]]] for order in piece_orders]
+        orders = []
+        for x, y in points.tolist():
+            rows = [self._rows[piece] for coincident in self.sptree.painters_alg(Point(x, y)) for piece in coincident]
+            orders.append(self._pieces[rows])
+        return orders
+
+    def visibility_polygons(self, points: np.ndarray) -> List[np.ndarray]:
+        """
+        :param points: n x 2 array of points
+        :return: vertices of the visibility polygon from each point, as k x 2 arrays
+        """
+        return [np.array(self.sptree.visibility_polygon(Point(x, y)), dtype="<f8").reshape(-1, 2)
+                for x, y in points.tolist()]
+
+    def raycast(self, origins: np.ndarray, directions: np.ndarray, max_distance: float = math.inf) -> np.ndarray:
+        """
+        :param origins: n x 2 array of ray origins
+        :param directions: n x 2 array of ray directions
+        :param max_distance: furthest distance along each ray that's searched, in multiples of its direction
+        :return: first wall hit by each ray, as an array of RAY_HIT_DTYPE
+        """
+        distances, lines = self.sptree.raycast_batch(origins, directions, max_distance)
+        hits = np.empty(len(lines), dtype=protocol.RAY_HIT_DTYPE)
+        hits["distance"] = distances
+        hits["wall"] = [self._pieces["wall"][self._rows[line]] if line is not None else -1 for line in lines]
+        return hits
+
+
+class _Scene:
+    """
+    Current snapshot of a served scene, and the lock serializing its updates.
+    """
+
+    def __init__(self, snapshot: SceneSnapshot) -> None:
+        self.snapshot = snapshot  # Replaced whole by each update, so readers never see a partial update
+        self.update_lock = threading.Lock()
+
+
+class SceneServer:
+    """
+    Serves draw orders, visibility polygons and ray casts of built scenes to any number of local clients over HTTP.
+    Each request is handled on its own thread against the scene's current snapshot, so readers are never blocked,
+    not even by updates to the scene they're reading. Updates to the same scene are applied one at a time.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, log_requests: bool = False) -> None:
+        """
+        :param host: address the server listens on
+        :param port: port the server listens on, any free port when 0
+        :param log_requests: whether every request is logged to stderr
+        """
+        self._scenes: Dict[str, _Scene] = {}
+        self._scenes_lock = threading.Lock()  # Held while scenes are added or replaced
+        self._http_server = ThreadingHTTPServer((host, port), _SceneRequestHandler)
+        self._http_server.daemon_threads = True
+        self._http_server.scene_server = self
+        self.log_requests = log_requests
+
+    def get_address(self) -> Tuple[str, int]:
+        """
+        :return: host and port the server listens on
+        """
+        host, port = self._http_server.server_address[:2]
+        return host, port
+
+    def set_scene(self, name: str, snapshot: SceneSnapshot) -> None:
+        """
+        Serves a scene under name, replacing any scene already served under it.
+
+        :param name: name of the scene
+        :param snapshot: first snapshot of the scene
+        :return: None
+        """
+        with self._scenes_lock:
+            self._scenes[name] = _Scene(snapshot)
+
+    def get_snapshot(self, name: str) -> SceneSnapshot:
+        """
+        :param name: name of a scene
+        :return: current snapshot of the scene
+        """
+        return self._scenes[name].snapshot
+
+    def get_scene_names(self) -> List[str]:
+        """
+        :return: names of every served scene
+        """
+        return list(self._scenes)
+
+    def add_walls(self, name: str, walls: List[Wall]) -> Tuple[SceneSnapshot, List[int]]:
+        """
+        :param name: name of a scene
+        :param walls: walls being added to the scene
+        :return: scene's new snapshot, and the ids given to walls
+        """
+        scene = self._scenes[name]
+        with scene.update_lock:
+            snapshot, ids = scene.snapshot.with_walls(walls)
+            scene.snapshot = snapshot
+        return snapshot, ids
+
+    def remove_walls(self, name: str, ids: List[int]) -> SceneSnapshot:
+        """
+        :param name: name of a scene
+        :param ids: ids of the walls being removed from the scene
+        :return: scene's new snapshot
+        """
+        scene = self._scenes[name]
+        with scene.update_lock:
+            snapshot = scene.snapshot.without_walls(ids)
+            scene.snapshot = snapshot
+        return snapshot
+
+    def serve_forever(self) -> None:
+        """
+        Handles requests until shutdown is called.
+
+        :return: None
+        """
+        self._http_server.serve_forever()
+
+    def start(self) -> threading.Thread:
+        """
+        Starts a background thread which handles requests until shutdown is called.
+
+        :return: the started thread
+        """
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self) -> None:
+        """
+        Stops handling requests and closes the server's socket.
+
+        :return: None
+        """
+        self._http_server.shutdown()
+        self._http_server.server_close()
+
+
+class _SceneRequestHandler(BaseHTTPRequestHandler):
+    """
+    Routes the requests of a SceneServer:
+
+    GET /scenes - JSON of every scene's version and number of walls
+    PUT /scenes/<name> - builds a scene from a JSON scene, as written by save_scene
+    POST /scenes/<name>/walls - adds the JSON "walls" to a scene, answering with their ids
+    DELETE /scenes/<name>/walls - removes the walls with the JSON "ids" from a scene
+    POST /scenes/<name>/painters - draw order from each point
+    POST /scenes/<name>/visibility - visibility polygon from each point
+    POST /scenes/<name>/raycast?max_distance=<distance> - first wall hit by each ray
+    """
+    protocol_version = "HTTP/1.1"  # Keeps connections open, so a client doesn't reconnect for every query
+
+    def do_GET(self) -> None:
+        if urlparse(self.path).path.rstrip("/") != "/scenes":
+            self.send_error(404)
+            return
+        scene_server: SceneServer = self.server.scene_server
+        scenes = {}
+        for name in scene_server.get_scene_names():
+            snapshot = scene_server.get_snapshot(name)
+            scenes[name] = {"version": snapshot.version, "walls": len(snapshot.walls)}
+        self._send_json(scenes)
+
+    def do_PUT(self) -> None:
+        name, action = self._parse_path()
+        if name is None or action is not None:
+            self.send_error(404)
+            return
+        try:
+            scene = json.loads(self._read_body())
+            walls = [wall_from_dict(wall) for wall in scene["walls"]]
+            bounding_box = box(*scene["bounding_box"])
+            rng = random.Random(scene.get("seed"))
+        except (ValueError, KeyError, TypeError) as error:
+            self.send_error(400, "Invalid scene: {}".format(error))
+            return
+        # Built on this request's thread, so building a scene doesn't hold up queries or updates of other scenes
+        snapshot = SceneSnapshot.build(walls, bounding_box, rng)
+        self.server.scene_server.set_scene(name, snapshot)
+        self._send_json({"ids": list(snapshot.walls)}, snapshot.version)
+
+    def do_POST(self) -> None:
+        name, action = self._parse_path()
+        scene_server: SceneServer = self.server.scene_server
+        if name not in scene_server.get_scene_names() or action is None:
+            self.send_error(404)
+            return
+        body = self._read_body()
+        snapshot = scene_server.get_snapshot(name)  # Every query of the request is answered by the same snapshot
+        try:
+            if action == "walls":
+                walls = [wall_from_dict(wall) for wall in json.loads(body)["walls"]]
+                snapshot, ids = scene_server.add_walls(name, walls)
+                self._send_json({"ids": ids}, snapshot.version)
+            elif action == "painters":
+                orders = snapshot.painters_alg(protocol.decode_points(body))
+                self._send_binary(protocol.encode_groups(orders, protocol.FRAGMENT_DTYPE), snapshot.version)
+            elif action == "visibility":
+                polygons = snapshot.visibility_polygons(protocol.decode_points(body))
+                self._send_binary(protocol.encode_groups(polygons, protocol.VERTEX_DTYPE), snapshot.version)
+            elif action == "raycast":
+                max_distance = float(parse_qs(urlparse(self.path).query).get("max_distance", ["inf"])[0])
+                origins, directions = protocol.decode_rays(body)
+                hits = snapshot.raycast(origins, directions, max_distance)
+                self._send_binary(protocol.encode_ray_hits(hits), snapshot.version)
+            else:
+                self.send_error(404)
+        except (ValueError, KeyError, TypeError) as error:
+            self.send_error(400, "Invalid request: {}".format(error))
+
+    def do_DELETE(self) -> None:
+        name, action = self._parse_path()
+        scene_server: SceneServer = self.server.scene_server
+        if name not in scene_server.get_scene_names() or action != "walls":
+            self.send_error(404)
+            return
+        try:
+            ids = [int(wall_id) for wall_id in json.loads(self._read_body())["ids"]]
+            snapshot = scene_server.remove_walls(name, ids)
+        except (ValueError, KeyError, TypeError) as error:
+            self.send_error(400, "Invalid request: {}".format(error))
+            return
+        self._send_json({}, snapshot.version)
+
+    def log_message(self, format: str, *args) -> None:
+        if self.server.scene_server.log_requests:
+            super().log_message(format, *args)
+
+    def _parse_path(self) -> Tuple[Optional[str], Optional[str]]:
+        """
+        :return: name of the scene and the action requested on it, None for either when missing
+        """
+        parts = urlparse(self.path).path.strip("/").split("/")
+        if len(parts) < 2 or len(parts) > 3 or parts[0] != "scenes":
+            return None, None
+        return parts[1], parts[2] if len(parts) == 3 else None
+
+    def _read_body(self) -> bytes:
+        """
+        :return: body of the request
+        """
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _send_json(self, content: dict, version: Optional[int] = None) -> None:
+        """
+        :param content: JSON serializable response
+        :param version: version of the snapshot that answered the request
+        :return: None
+        """
+        self._send(json.dumps(content).encode("utf-8"), "application/json", version)
+
+    def _send_binary(self, body: bytes, version: int) -> None:
+        """
+        :param body: binary response
+        :param version: version of the snapshot that answered the request
+        :return: None
+        """
+        self._send(body, protocol.CONTENT_TYPE, version)
+
+    def _send(self, body: bytes, content_type: str, version: Optional[int]) -> None:
+        """
+        :param body: response
+        :param content_type: type of the response
+        :param version: version of the snapshot that answered the request
+        :return: None
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if version is not None:
+            self.send_header(protocol.VERSION_HEADER, str(version))
+        self.end_headers()
+        self.wfile.write(body)
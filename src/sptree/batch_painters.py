@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+from typing import List, NamedTuple, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from sptree.node import Node
+from sptree.partitionable import Partitionable
+from sptree.predicates import orient_array
+
+if TYPE_CHECKING:
+    from sptree.sp_tree import SPTree
+
+# Number of points traversed together. Every node keeps a few values per point of a chunk until the chunk is done,
+# so this bounds memory to a few bytes per node and point.
+_chunk_size = 4096
+
+
+class BatchTree(NamedTuple):
+    """
+    An SPTree flattened for traversing from many camera locations at once.
+    """
+    lines: List[Partitionable]  # Every line of the tree, which draw orders index into
+    nodes: List[Node]  # Nodes of the tree in pre-order
+    children: List[Tuple[int, int]]  # Index of the front and back child of every node, -1 where there is no child
+    line_ids: List[Tuple[np.ndarray, ...]]  # Indices of every node's lines, its lines seen from in front and behind
+
+
+def painters_alg_batch(sptree: SPTree, points: np.ndarray) -> Tuple[List[Partitionable], np.ndarray]:
+    """
+    Applies painter's algorithm from many camera locations at once.
+    Rather than walking the tree once per point, every node classifies all of the points against its splitting line
+    in one vectorized step. A first pass up the tree counts how many lines each subtree draws for each point, and a
+    second pass down the tree uses those counts to place every node's lines directly at their position in each
+    point's draw order, so no Python code runs per point.
+
+    :param sptree: SPTree being traversed
+    :param points: n x 2 array of camera locations
+    :return: every line of the tree, and an n x m array holding for each point the indices of the lines it draws,
+        from the background to the foreground, padded at the end with -1
+    """
+    batch_tree = flatten(sptree)
+    return batch_tree.lines, draw_orders(batch_tree, points)
+
+
+def flatten(sptree: SPTree) -> BatchTree:
+    """
+    Any nodes of a lazily built SPTree that haven't been built yet are built first.
+
+    :param sptree: SPTree being traversed
+    :return: the SPTree flattened for draw_orders, which can be reused for any number of camera locations
+    """
+    sptree.build_remaining()
+
+    # Nodes in pre-order, so every node comes before its children
+    nodes: List[Node] = []
+    stack = [sptree.root] if sptree.root is not None else []
+    while len(stack) > 0:
+        node = stack.pop()
+        nodes.append(node)
+        stack += [child for child in (node.right, node.left) if child is not None]
+    indices = {node: i for i, node in enumerate(nodes)}
+
+    lines = []
+    line_ids = []  # Indices of the lines of every node, then those seen from in front of it, then from behind it
+    for node in nodes:
+        ids = {id(line): len(lines) + i for i, line in enumerate(node.lines)}
+        lines += node.lines
+        line_ids.append(tuple(np.array([ids[id(line)] for line in node_lines], dtype=np.int32)
+                              for node_lines in (node.lines, node.front_lines, node.back_lines)))
+    children = [(indices[node.left] if node.left is not None else -1,
+                 indices[node.right] if node.right is not None else -1) for node in nodes]
+
+    return BatchTree(lines, nodes, children, line_ids)
+
+
+def draw_orders(batch_tree: BatchTree, points: np.ndarray) -> np.ndarray:
+    """
+    :param batch_tree: SPTree flattened by flatten
+    :param points: n x 2 array of camera locations
+    :return: n x m array holding for each point the indices of the lines it draws, from the background to the
+        foreground, padded at the end with -1
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    orders = [_traverse_chunk(batch_tree.nodes, batch_tree.children, batch_tree.line_ids,
+                              points[start:start + _chunk_size])
+              for start in range(0, len(points), _chunk_size)]
+    width = max((order.shape[1] for order in orders), default=0)
+    result = np.full((len(points), width), -1, dtype=np.int32)
+    start = 0
+    for order in orders:
+        result[start:start + len(order), :order.shape[1]] = order
+        start += len(order)
+    return result
+
+
+def _traverse_chunk(nodes: List[Node], children: List[Tuple[int, int]], line_ids: List[Tuple[np.ndarray, ...]],
+                    points: np.ndarray) -> np.ndarray:
+    """
+    :param nodes: nodes of the tree in pre-order
+    :param children: index of the front and back child of every node, -1 where there is no child
+    :param line_ids: indices of every node's lines, its lines seen from in front, and its lines seen from behind
+    :param points: k x 2 array of camera locations
+    :return: k x m array of the lines each point draws in order, padded at the end with -1
+    """
+    xs, ys = points[:, 0], points[:, 1]
+    # Side of every node's splitting line each point is on, shifted to 0 for in front, 1 for on and 2 for behind
+    sides = [orient_array(*node.plane, xs, ys) + 1 for node in nodes]
+
+    # Number of lines each subtree draws for each point, counted from the leaves up. Points on the splitting line
+    # only draw the node's lines if it's a leaf, and otherwise they see the lines on the side they're on
+    counts: List[np.ndarray] = [np.empty(0)] * len(nodes)
+    for i in reversed(range(len(nodes))):
+        all_ids, front_ids, back_ids = line_ids[i]
+        front, back = children[i]
+        on_count = len(all_ids) if front < 0 and back < 0 else 0
+        count = np.array([len(front_ids), on_count, len(back_ids)], dtype=np.int32)[sides[i]]
+        for child in children[i]:
+            if child >= 0:
+                count += counts[child]
+        counts[i] = count
+
+    width = int(counts[0].max()) if len(nodes) > 0 and len(points) > 0 else 0
+    order = np.full((len(points), width), -1, dtype=np.int32)
+    if width == 0:
+        return order
+
+    # Position in each point's draw order where every subtree starts, from the root down. Points in front of a node
+    # draw the subtree behind it first, then its lines, then the subtree in front, and points behind it the reverse
+    starts: List[np.ndarray] = [np.empty(0)] * len(nodes)
+    starts[0] = np.zeros(len(points), dtype=np.int32)
+    for i in range(len(nodes)):
+        all_ids, front_ids, back_ids = line_ids[i]
+        front, back = children[i]
+        start = starts[i]
+        in_front = sides[i] == 0
+        behind = sides[i] == 2
+        front_count = counts[front] if front >= 0 else 0
+        back_count = counts[back] if back >= 0 else 0
+        # Points that don't draw the front subtree first skip past it
+        front_skip = np.where(in_front, 0, front_count)
+        if front >= 0:
+            starts[front] = start + np.where(in_front, back_count + len(front_ids), 0)
+        if back >= 0:
+            starts[back] = start + front_skip + behind * len(back_ids)
+        line_start = start + front_skip + np.where(behind, 0, back_count)
+        is_leaf = front < 0 and back < 0
+        if nodes[i].front_lines is nodes[i].back_lines:
+            # Without one-sided lines every point draws the same lines, so they're placed all at once
+            _place(order, line_start, None if is_leaf else sides[i] != 1, all_ids)
+        else:
+            _place(order, line_start, in_front, front_ids)
+            _place(order, line_start, behind, back_ids)
+            if is_leaf:
+                _place(order, line_start, sides[i] == 1, all_ids)
+        # Counts and starts are only needed until the node's children are placed
+        starts[i] = counts[i] = None
+    return order
+
+
+def _place(order: np.ndarray, line_start: np.ndarray, mask: Optional[np.ndarray], ids: np.ndarray) -> None:
+    """
+    Writes a node's lines into the draw order of the points that see them.
+
+    :param order: k x m draw orders being filled
+    :param line_start: position of the node's lines in each point's draw order
+    :param mask: which points see ids, None if all of them do
+    :param ids: indices of the lines being placed
+    :return: None
+    """
+    if len(ids) == 0:
+        return
+    if mask is None:
+        order[np.arange(len(order))[:, np.newaxis], line_start[:, np.newaxis] + np.arange(len(ids))] = ids
+        return
+    rows = np.flatnonzero(mask)
+    if len(rows) > 0:
+        order[rows[:, np.newaxis], line_start[rows, np.newaxis] + np.arange(len(ids))] = ids
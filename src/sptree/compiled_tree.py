@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from sptree.predicates import orient_lines
+from sptree.sp_tree import SPTree
+
+SharedArrayHandle = Tuple[str, Tuple[int, ...], str]  # Shared memory block name, array shape and dtype
+SharedTreeHandle = Dict[str, SharedArrayHandle]
+
+_array_names = ("planes", "children", "line_offsets", "wall_bases", "wall_heights", "wall_colors", "wall_facings",
+                "wall_base_heights")
+
+
+class CompiledTree:
+    """
+    An SPTree of walls flattened into NumPy arrays.
+    Nodes are numbered in pre-order, and the walls of each node are stored contiguously, so the whole tree can be
+    written to disk or placed in shared memory without any Python objects.
+    """
+
+    def __init__(self, planes: np.ndarray, children: np.ndarray, line_offsets: np.ndarray,
+                 wall_bases: np.ndarray, wall_heights: np.ndarray, wall_colors: np.ndarray,
+                 wall_facings: np.ndarray, wall_base_heights: Optional[np.ndarray] = None) -> None:
+        """
+        :param planes: n x 4 start and end coordinates of each node's splitting line
+        :param children: n x 2 indices of each node's front and back child, -1 where there is no child
+        :param line_offsets: walls of node i are those from line_offsets[i] up to line_offsets[i + 1]
+        :param wall_bases: m x 4 start and end coordinates of each wall's base
+        :param wall_heights: height of each wall
+        :param wall_colors: m x 3 x 3 node, edge and wall color of each wall
+        :param wall_facings: side of its node's splitting line each wall is seen from, -1 for in front, 1 for behind,
+            and 0 for double-sided walls
+        :param wall_base_heights: height of the bottom of each wall above the ground, 0 for every wall when None
+        """
+        self.planes = planes
+        self.children = children
+        self.line_offsets = line_offsets
+        self.wall_bases = wall_bases
+        self.wall_heights = wall_heights
+        self.wall_colors = wall_colors
+        self.wall_facings = wall_facings
+        self.wall_base_heights = np.zeros(len(wall_heights)) if wall_base_heights is None else wall_base_heights
+
+    @staticmethod
+    def compile(sptree: SPTree) -> CompiledTree:
+        """
+        Flattens an SPTree whose lines are all Walls.
+        Any nodes of a lazily built SPTree that haven't been built yet are built first.
+
+        :param sptree: SPTree being flattened
+        :return: flattened SPTree
+        """
+        sptree.build_remaining()
+        nodes = []
+        stack = [sptree.root] if sptree.root is not None else []
+        while len(stack) > 0:
+            node = stack.pop()
+            nodes.append(node)
+            if node.right is not None:
+                stack.append(node.right)
+            if node.left is not None:
+                stack.append(node.left)
+        indices = {id(node): i for i, node in enumerate(nodes)}
+
+        walls = []
+        wall_facings = []
+        for node in nodes:
+            front_lines = {id(line) for line in node.front_lines}
+            for wall in node.lines:
+                walls.append(wall)
+                wall_facings.append(0 if wall.is_double_sided() else -1 if id(wall) in front_lines else 1)
+        return CompiledTree(
+            np.array([node.plane for node in nodes], dtype=np.float64).reshape(-1, 4),
+            np.array([[indices[id(node.left)] if node.left is not None else -1,
+                       indices[id(node.right)] if node.right is not None else -1] for node in nodes],
+                     dtype=np.int32).reshape(-1, 2),
+            np.cumsum([0] + [len(node.lines) for node in nodes], dtype=np.int64),
+            np.array([wall.get_base().coords[:] for wall in walls], dtype=np.float64).reshape(-1, 4),
+            np.array([wall.get_height() for wall in walls], dtype=np.float64),
+            np.array([[wall.node_color, wall.edge_color, wall.wall_color] for wall in walls],
+                     dtype=np.uint8).reshape(-1, 3, 3),
+            np.array(wall_facings, dtype=np.int8),
+            np.array([wall.get_base_height() for wall in walls], dtype=np.float64))
+
+    def painters_order(self, x: float, y: float) -> np.ndarray:
+        """
+        Applies painter's algorithm to the flattened tree.
+
+        :param x: x coordinate of the camera location
+        :param y: y coordinate of the camera location
+        :return: indices of the walls in the order they are drawn, from the background to the foreground, without
+            one-sided walls facing away from the camera
+        """
+        drawn_nodes = []
+        node_sides = {}  # Side of each drawn node's splitting line the camera is on
+        # Non-negative entries are subtrees still to be visited, negative entries -(i + 1) are nodes ready to be drawn
+        stack = [0] if len(self.planes) > 0 else []
+        # The sides of every splitting line are found at once, and entries are read through memoryviews, which are
+        # much faster for single entries than the arrays, without copying arrays that may be in shared memory
+        sides = memoryview(orient_lines(self.planes, x, y))
+        children = memoryview(self.children.reshape(-1))
+        while len(stack) > 0:
+            item = stack.pop()
+            if item < 0:
+                drawn_nodes.append(-item - 1)
+                continue
+            front = children[2 * item]
+            back = children[2 * item + 1]
+            side = sides[item]
+            # Entries are pushed in reverse, so the subtree further from the camera is visited first
+            if side < 0:
+                near, far = front, back
+            elif side > 0:
+                near, far = back, front
+            else:
+                # Camera is coincident to the node, so the node isn't drawn
+                near, far = back, front
+            if near >= 0:
+                stack.append(near)
+            # Leaves are always drawn
+            if side != 0 or (front < 0 and back < 0):
+                stack.append(-item - 1)
+                node_sides[item] = side
+            if far >= 0:
+                stack.append(far)
+        if len(drawn_nodes) == 0:
+            return np.empty(0, dtype=np.int64)
+        order = np.concatenate([np.arange(self.line_offsets[i], self.line_offsets[i + 1]) for i in drawn_nodes])
+        if not self.wall_facings.any():
+            return order
+        # Walls are seen from the side of their node the camera is on, and from every side of leaves it's on
+        sides = np.repeat(np.array([node_sides[i] for i in drawn_nodes], dtype=np.int8),
+                          np.diff(self.line_offsets)[drawn_nodes])
+        facings = self.wall_facings[order]
+        return order[(facings == 0) | (facings == sides) | (sides == 0)]
+
+    def save(self, path: str) -> None:
+        """
+        Writes the flattened tree to a NumPy .npz file.
+
+        :param path: file being written
+        :return: None
+        """
+        np.savez(path, **self._get_arrays())
+
+    @staticmethod
+    def load(path: str) -> CompiledTree:
+        """
+        Reads a flattened tree written by save.
+
+        :param path: file being read
+        :return: the stored flattened tree
+        """
+        with np.load(path) as arrays:
+            # Trees written before walls had base heights stand every wall on the ground
+            return CompiledTree(*(arrays[name] if name in arrays else None for name in _array_names))
+
+    def to_shared_memory(self) -> Tuple[SharedTreeHandle, List[shared_memory.SharedMemory]]:
+        """
+        Copies the arrays into shared memory, so other processes can attach to them without copying.
+        The caller is responsible for closing and unlinking the returned blocks once every process is done.
+
+        :return: handle that other processes attach with, and the shared memory blocks
+        """
+        handle = {}
+        blocks = []
+        for name, array in self._get_arrays().items():
+            block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            handle[name] = (block.name, array.shape, array.dtype.str)
+            blocks.append(block)
+        return handle, blocks
+
+    @staticmethod
+    def from_shared_memory(handle: SharedTreeHandle) -> Tuple[CompiledTree, List[shared_memory.SharedMemory]]:
+        """
+        Attaches to a flattened tree placed in shared memory by to_shared_memory.
+        The arrays are views of the shared memory, so the returned blocks must stay open while the tree is in use.
+
+        :param handle: handle returned by to_shared_memory
+        :return: flattened tree, and the shared memory blocks it views
+        """
+        arrays = []
+        blocks = []
+        for name in _array_names:
+            block_name, shape, dtype = handle[name]
+            block = shared_memory.SharedMemory(name=block_name)
+            arrays.append(np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf))
+            blocks.append(block)
+        return CompiledTree(*arrays), blocks
+
+    def _get_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        :return: every array of the flattened tree, by name
+        """
+        return {name: getattr(self, name) for name in _array_names}
@@ -0,0 +1,385 @@
+from __future__ import annotations
+
+from typing import Dict, Generator, List, Optional, Tuple, TYPE_CHECKING
+
+from sptree.node import Node
+from sptree.partitionable import Partitionable
+from sptree.predicates import line_intersection, orient
+
+if TYPE_CHECKING:
+    from sptree.sp_tree import SPTree
+
+# Cell of an SPTree: the node whose splitting line bounds it, and which side of the node it's on.
+# Side is -1 for the empty front child, 1 for the empty back child, and 0 for lines coincident to the node.
+# The cell (None, 0) holds every line of an empty SPTree.
+CellKey = Tuple[Optional[Node], int]
+Coords = Tuple[float, float, float, float]  # Start x, start y, end x and end y of a line
+# A line in a cell: the whole line, the coordinates of its piece in the cell, and the piece once it's been created
+CellEntry = Tuple[Partitionable, Coords, Optional[Partitionable]]
+
+FRONT = -1
+ON = 0
+BACK = 1
+
+
+class DynamicLayer:
+    """
+    Moving lines, such as doors, layered over a static SPTree without rebuilding it.
+    Every line is clipped by the tree's splitting lines into the empty cells it occupies, so painter's algorithm can
+    draw its pieces at the right depth among the static lines. Moving a line only reassigns its own pieces.
+    Lines in the same cell are ordered by a small tree of their own, built only when the cell is drawn.
+    Clipping only works out the coordinates of each piece, and a piece is only created once it's drawn, so moving
+    lines that aren't on screen costs little more than walking down the tree.
+    """
+
+    def __init__(self, sptree: SPTree) -> None:
+        """
+        :param sptree: static SPTree the lines move through
+        """
+        self._sptree = sptree
+        self._next_handle = 0
+        self._lines: Dict[int, List[CellKey]] = {}  # Cells occupied by each line
+        # Entry of each line in each cell, holding the line, its piece's coordinates, and the piece once it's created.
+        # Cells are convex, so a line never has more than one piece in a cell.
+        self._cells: Dict[CellKey, Dict[int, CellEntry]] = {}
+        self._cell_trees: Dict[CellKey, Node] = {}  # Ordering of cells holding more than one piece
+        # Leaf of each cell tree holding nothing but a line's whole piece, by the line's handle. Moving the line within
+        # the leaf's region doesn't change the order of anything else in the cell, so the tree is kept.
+        self._cell_leaves: Dict[CellKey, Dict[int, Node]] = {}
+        self._node_counts: Dict[Node, int] = {}  # Number of occupied cells next to each node
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def add(self, line: Partitionable) -> int:
+        """
+        Adds a moving line to the layer.
+
+        :param line: line being added
+        :return: handle used to move or remove the line
+        """
+        handle = self._next_handle
+        self._next_handle += 1
+        self._lines[handle] = []
+        coords = _get_coords(line)
+        self._place(handle, line, coords, self._clip(coords))
+        return handle
+
+    def move(self, handle: int, line: Partitionable) -> None:
+        """
+        Replaces a line of the layer with its new position.
+
+        :param handle: handle returned when the line was added
+        :param line: line at its new position
+        :return: None
+        """
+        coords = _get_coords(line)
+        clipped = self._clip(coords)
+        keys = self._lines[handle]
+        if len(clipped) == 1 and len(keys) == 1 and clipped[0][0] == keys[0]:
+            # The line stays within a single cell, so only its own entry changes
+            key = keys[0]
+            self._cells[key][handle] = line, coords, line
+            cell_tree = self._cell_trees.get(key)
+            if cell_tree is not None and not self._move_leaf(key, cell_tree, handle, line, coords):
+                self._discard_cell_tree(key)
+            return
+        self._unplace(handle)
+        self._place(handle, line, coords, clipped)
+
+    def remove(self, handle: int) -> None:
+        """
+        Removes a line from the layer.
+
+        :param handle: handle returned when the line was added
+        :return: None
+        """
+        self._unplace(handle)
+        del self._lines[handle]
+
+    def has_lines(self, node: Optional[Node]) -> bool:
+        """
+        :param node: node of the static SPTree, None for an empty SPTree
+        :return: whether any cell next to node holds a line
+        """
+        return node in self._node_counts
+
+    def get_coincident_lines(self, node: Node, side: int) -> List[Partitionable]:
+        """
+        :param node: node of the static SPTree
+        :param side: FRONT or BACK side of node the lines are seen from, or ON for every line
+        :return: pieces of lines lying on node's splitting line that can be seen from side
+        """
+        cell = self._cells.get((node, ON))
+        if cell is None:
+            return []
+        return [_get_piece(cell, handle) for handle, (line, coords, _) in cell.items()
+                if side == ON or _is_visible(line, coords, node.plane, side)]
+
+    def cell_painters_alg(self, node: Optional[Node], side: int,
+                          x: float, y: float) -> Generator[List[Partitionable], None, None]:
+        """
+        Applies painter's algorithm to the lines in a single cell.
+
+        :param node: node whose splitting line bounds the cell
+        :param side: FRONT or BACK side of node, or ON for the cell of an empty SPTree
+        :param x: x coordinate of the camera location
+        :param y: y coordinate of the camera location
+        :return: generator for Painter's Algorithm
+        """
+        key = (node, side)
+        cell = self._cells.get(key)
+        if cell is None:
+            return
+        if len(cell) == 1:
+            handle, (line, (sx, sy, ex, ey), _) = next(iter(cell.items()))
+            # One-sided lines are only seen from in front of them
+            if line.is_double_sided() or orient(sx, sy, ex, ey, x, y) < 0:
+                yield [_get_piece(cell, handle)]
+            return
+        cell_tree = self._cell_trees.get(key)
+        if cell_tree is None:
+            leaves = {}
+            lines = [(handle, _get_piece(cell, handle), coords) for handle, (_, coords, _) in cell.items()]
+            cell_tree = _build_cell_tree(lines, leaves)
+            self._cell_trees[key] = cell_tree
+            self._cell_leaves[key] = leaves
+        yield from _cell_painters_alg(cell_tree, x, y)
+
+    def _place(self, handle: int, line: Partitionable, coords: Coords, clipped: List[Tuple[CellKey, Coords]]) -> None:
+        """
+        Records the pieces of a line in the cells it occupies.
+
+        :param handle: handle of the line
+        :param line: line being placed
+        :param coords: coordinates of line
+        :param clipped: cells the line occupies, and the coordinates of its piece in each of them
+        :return: None
+        """
+        keys = []
+        for key, piece_coords in clipped:
+            cell = self._cells.get(key)
+            if cell is None:
+                cell = self._cells[key] = {}
+                self._node_counts[key[0]] = self._node_counts.get(key[0], 0) + 1
+            # A line that isn't clipped is its own piece
+            cell[handle] = line, piece_coords, line if piece_coords == coords else None
+            self._discard_cell_tree(key)
+            keys.append(key)
+        self._lines[handle] = keys
+
+    def _unplace(self, handle: int) -> None:
+        """
+        Removes every piece of a line from the cells it occupies.
+
+        :param handle: handle of the line
+        :return: None
+        """
+        for key in self._lines[handle]:
+            cell = self._cells.get(key)
+            if cell is None or handle not in cell:
+                continue
+            del cell[handle]
+            self._discard_cell_tree(key)
+            if len(cell) == 0:
+                del self._cells[key]
+                self._node_counts[key[0]] -= 1
+                if self._node_counts[key[0]] == 0:
+                    del self._node_counts[key[0]]
+        self._lines[handle] = []
+
+    def _discard_cell_tree(self, key: CellKey) -> None:
+        """
+        :param key: cell whose lines changed, so its tree is built again the next time it's drawn
+        :return: None
+        """
+        if self._cell_trees.pop(key, None) is not None:
+            del self._cell_leaves[key]
+
+    def _move_leaf(self, key: CellKey, cell_tree: Node, handle: int, line: Partitionable, coords: Coords) -> bool:
+        """
+        Moves a line's piece within a cell's tree, if the piece is all of a leaf and stays within the leaf's region.
+
+        :param key: cell the line stays in
+        :param cell_tree: tree of the cell
+        :param handle: handle of the line
+        :param line: line at its new position
+        :param coords: coordinates of the line at its new position, which lies within the cell
+        :return: whether the tree is still valid
+        """
+        leaf = self._cell_leaves[key].get(handle)
+        if leaf is None:
+            return False
+        sx, sy, ex, ey = coords
+        node = cell_tree
+        while node is not leaf:
+            start_side = orient(*node.plane, sx, sy)
+            end_side = orient(*node.plane, ex, ey)
+            if start_side < 0 and end_side < 0:
+                node = node.left
+            elif start_side > 0 and end_side > 0:
+                node = node.right
+            else:
+                return False
+            if node is None:
+                return False
+        leaf.build([_get_piece(self._cells[key], handle)], None, None)
+        return True
+
+    def _clip(self, coords: Coords) -> List[Tuple[CellKey, Coords]]:
+        """
+        Pushes a line down the static SPTree, splitting it wherever a splitting line crosses it, until every piece
+        reaches an empty cell or lies on a splitting line.
+
+        :param coords: coordinates of the line being clipped
+        :return: cells the line occupies, and the coordinates of its piece in each of them
+        """
+        root = self._sptree.root
+        if root is None:
+            return [((None, ON), coords)]
+
+        pieces = []
+        stack = [(root, coords)]
+        while len(stack) > 0:
+            node, (sx, sy, ex, ey) = stack.pop()
+            # Follows the piece down to its cell, leaving the far half of any crossing on the stack
+            while True:
+                # Lazily built subtrees are built the first time a line reaches them
+                if node.pending is not None:
+                    self._sptree.expand(node)
+                ax, ay, bx, by = node.plane
+                start_side = orient(ax, ay, bx, by, sx, sy)
+                end_side = orient(ax, ay, bx, by, ex, ey)
+                if start_side == 0 and end_side == 0:
+                    pieces.append(((node, ON), (sx, sy, ex, ey)))
+                    break
+
+                if start_side * end_side < 0:
+                    px, py = line_intersection(sx, sy, ex, ey, ax, ay, bx, by)
+                    end_side = FRONT if end_side < 0 else BACK
+                    end_child = node.left if end_side == FRONT else node.right
+                    if end_child is None:
+                        pieces.append(((node, end_side), (px, py, ex, ey)))
+                    else:
+                        stack.append((end_child, (px, py, ex, ey)))
+                    ex, ey = px, py
+                    side = FRONT if start_side < 0 else BACK
+                else:
+                    # An endpoint touching the splitting line doesn't change which side the piece is on
+                    side = FRONT if start_side + end_side < 0 else BACK
+
+                child = node.left if side == FRONT else node.right
+                if child is None:
+                    pieces.append(((node, side), (sx, sy, ex, ey)))
+                    break
+                node = child
+        return pieces
+
+
+def _get_piece(cell: Dict[int, CellEntry], handle: int) -> Partitionable:
+    """
+    :param cell: entries of the lines in a cell
+    :param handle: handle of a line in the cell
+    :return: the line's piece in the cell, created the first time it's needed
+    """
+    line, coords, piece = cell[handle]
+    if piece is None:
+        sx, sy, ex, ey = coords
+        piece = line.create_piece((sx, sy), (ex, ey))
+        cell[handle] = line, coords, piece
+    return piece
+
+
+def _get_coords(line: Partitionable) -> Coords:
+    """
+    :param line: line whose endpoints are read
+    :return: start x, start y, end x and end y of line
+    """
+    (sx, sy), (ex, ey) = line.get_base().coords
+    return sx, sy, ex, ey
+
+
+def _is_visible(line: Partitionable, coords: Coords, plane: Coords, side: int) -> bool:
+    """
+    Precondition: line lies on the line through plane
+
+    :param line: line being culled
+    :param coords: coordinates of line
+    :param plane: start and end coordinates of the line it lies on
+    :param side: FRONT or BACK side of plane line is seen from
+    :return: whether line can be seen from side
+    """
+    if line.is_double_sided():
+        return True
+    sx, sy, ex, ey = coords
+    ax, ay, bx, by = plane
+    return ((ex - sx) * (bx - ax) + (ey - sy) * (by - ay) > 0) == (side == FRONT)
+
+
+def _build_cell_tree(lines: List[Tuple[Optional[int], Partitionable, Coords]], leaves: Dict[int, Node]) -> Node:
+    """
+    Builds a tree ordering the few lines of a single cell.
+    Cells hold so few lines that splitting on the first line is as good as sampling, and much cheaper.
+
+    :param lines: handle of each line in the cell, None for a line that was split, with the line and its coordinates
+    :param leaves: leaf holding nothing but a line's whole piece, by the line's handle, which the tree's leaves are
+        added to
+    :return: root node of the tree
+    """
+    handle, splitting_line, (ax, ay, bx, by) = lines[0]
+    coincident_lines = [splitting_line]
+    front = []
+    back = []
+    for line_handle, line, coords in lines[1:]:
+        sx, sy, ex, ey = coords
+        start_side = orient(ax, ay, bx, by, sx, sy)
+        end_side = orient(ax, ay, bx, by, ex, ey)
+        if start_side == 0 and end_side == 0:
+            coincident_lines.append(line)
+        elif start_side * end_side < 0:
+            px, py = line_intersection(sx, sy, ex, ey, ax, ay, bx, by)
+            for side, half_coords in ((start_side, (sx, sy, px, py)), (end_side, (px, py, ex, ey))):
+                hsx, hsy, hex_, hey = half_coords
+                half = line.create_piece((hsx, hsy), (hex_, hey))
+                (front if side < 0 else back).append((None, half, half_coords))
+        elif start_side + end_side < 0:
+            front.append((line_handle, line, coords))
+        else:
+            back.append((line_handle, line, coords))
+    node = Node(coincident_lines, _build_cell_tree(front, leaves) if len(front) > 0 else None,
+                _build_cell_tree(back, leaves) if len(back) > 0 else None, (ax, ay, bx, by))
+    if handle is not None and len(coincident_lines) == 1 and node.is_leaf():
+        leaves[handle] = node
+    return node
+
+
+def _cell_painters_alg(node: Optional[Node], x: float, y: float) -> Generator[List[Partitionable], None, None]:
+    """
+    Applies painter's algorithm to the tree of a single cell, in the same order as SPTree.painters_alg.
+
+    :param node: root node of the tree
+    :param x: x coordinate of the camera location
+    :param y: y coordinate of the camera location
+    :return: generator for Painter's Algorithm
+    """
+    if node is None:
+        return
+    if node.is_leaf() and node.front_lines is node.back_lines:
+        yield node.lines
+        return
+    side = orient(*node.plane, x, y)
+    if side < 0:
+        yield from _cell_painters_alg(node.right, x, y)
+        if len(node.front_lines) > 0:
+            yield node.front_lines
+        yield from _cell_painters_alg(node.left, x, y)
+    elif side > 0:
+        yield from _cell_painters_alg(node.left, x, y)
+        if len(node.back_lines) > 0:
+            yield node.back_lines
+        yield from _cell_painters_alg(node.right, x, y)
+    else:
+        yield from _cell_painters_alg(node.left, x, y)
+        yield from _cell_painters_alg(node.right, x, y)
+        if node.is_leaf():
+            yield node.lines
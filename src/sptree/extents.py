@@ -0,0 +1,50 @@
+from typing import Dict, Optional, Tuple
+
+from sptree.node import Node
+
+Extent = Tuple[float, float, float, float]  # Minimum x, minimum y, maximum x and maximum y of a subtree's lines
+
+
+def get_extent(node: Optional[Node], extents: Dict[Node, Optional[Extent]]) -> Optional[Extent]:
+    """
+    Measures the bounding box of every line in a subtree, reusing and recording the extents of its subtrees.
+    A lazily built subtree that hasn't been built yet is measured from its unpartitioned lines. Splitting only ever
+    shortens lines, so that extent still bounds the subtree once it's built.
+
+    :param node: root of a subtree
+    :param extents: extent of every subtree measured so far, which node's extent is added to
+    :return: bounding box of every line in the subtree, None if it has no lines
+    """
+    if node is None:
+        return None
+    if node in extents:
+        return extents[node]
+    xs = []
+    ys = []
+    pending = node.pending
+    lines = [line for group in pending for line in group] if pending is not None else node.lines
+    for line in lines:
+        (sx, sy), (ex, ey) = line.get_base().coords
+        xs += (sx, ex)
+        ys += (sy, ey)
+    if pending is None:
+        for child in (node.left, node.right):
+            child_extent = get_extent(child, extents)
+            if child_extent is not None:
+                xs += (child_extent[0], child_extent[2])
+                ys += (child_extent[1], child_extent[3])
+    extent = (min(xs), min(ys), max(xs), max(ys)) if len(xs) > 0 else None
+    extents[node] = extent
+    return extent
+
+
+def intersects(extent: Optional[Extent], minx: float, miny: float, maxx: float, maxy: float) -> bool:
+    """
+    :param extent: bounding box, None for an empty one
+    :param minx: minimum x of a rectangle
+    :param miny: minimum y of a rectangle
+    :param maxx: maximum x of a rectangle
+    :param maxy: maximum y of a rectangle
+    :return: whether the bounding box overlaps or touches the rectangle
+    """
+    return extent is not None and extent[0] <= maxx and extent[2] >= minx and extent[1] <= maxy and extent[3] >= miny
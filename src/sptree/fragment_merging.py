@@ -0,0 +1,186 @@
+from typing import Dict, List, Optional, Tuple
+
+from sptree.node import Node
+from sptree.partitionable import Partitionable
+from sptree.predicates import orient
+
+Coords = Tuple[float, float, float, float]  # Start x, start y, end x and end y of a line
+
+
+def merge_fragments(root: Optional[Node]) -> Tuple[Optional[Node], int]:
+    """
+    Joins adjacent pieces of the same line back together wherever painter's algorithm stays correct from every
+    viewpoint, so fewer pieces are traversed and drawn.
+
+    A piece is kept in the node of one of the two pieces it replaces, which puts it on the far side of every splitting
+    line between the two nodes. From a viewpoint next to the part that crosses a splitting line, that part hides
+    anything else on its side of the line, yet it's drawn before all of it. So pieces are only joined when every
+    splitting line they'd cross has no lines of its own and nothing else is on the far side, such as once
+    SPTree.without_lines has removed what made the split necessary.
+
+    Pieces are split apart where they cross the splitting line of the node they part at, and a tree fresh from a build
+    holds the line every splitting line came from. That line is drawn between the two pieces from every viewpoint off
+    it, and hides part of one of them from some, so such a tree has nothing to join and is returned straight away.
+
+    Nodes are copied rather than modified, so trees sharing nodes with this one are unaffected.
+
+    :param root: root of a fully built tree
+    :return: root of the tree with pieces joined, and the number of pieces removed
+    """
+    # Pieces can only be joined within the subtree of a node without lines, so only those subtrees are searched
+    regions = []
+    stack = [root] if root is not None else []
+    while len(stack) > 0:
+        node = stack.pop()
+        if len(node.lines) == 0:
+            regions.append(node)
+        else:
+            stack += [child for child in (node.left, node.right) if child is not None]
+    if len(regions) == 0:
+        return root, 0
+
+    parents: Dict[Node, Optional[Node]] = {}
+    depths: Dict[Node, int] = {}
+    # Pieces of each line within each region, as pieces in different regions are kept apart by lines
+    pieces_by_source: Dict[Tuple[Node, Partitionable], List[Tuple[Partitionable, Node]]] = {}
+    nodes = []
+    stack = [(region, None, 0, region) for region in regions]
+    while len(stack) > 0:
+        node, parent, depth, region = stack.pop()
+        parents[node] = parent
+        depths[node] = depth
+        nodes.append(node)
+        for line in node.lines:
+            pieces_by_source.setdefault((region, line.get_source()), []).append((line, node))
+        stack += [(child, node, depth + 1, region) for child in (node.left, node.right) if child is not None]
+
+    # Number of lines in every subtree, kept up to date as pieces are joined
+    counts: Dict[Node, int] = {}
+    for node in reversed(nodes):
+        counts[node] = len(node.lines) + sum(counts[child] for child in (node.left, node.right) if child is not None)
+
+    lines: Dict[Node, List[Partitionable]] = {}  # Lines of every node whose lines changed
+    num_merged = 0
+    for (_, source), pieces in pieces_by_source.items():
+        if len(pieces) < 2:
+            continue
+        # Pieces are ordered along their source, so pieces that were split apart end up next to each other
+        (sx, sy), (ex, ey) = source.get_base().coords
+        pieces.sort(key=lambda piece: _get_position(piece[0], sx, sy, ex - sx, ey - sy))
+        piece, node = pieces[0]
+        for next_piece, next_node in pieces[1:]:
+            if piece.get_base().coords[-1] != next_piece.get_base().coords[0]:
+                piece, node = next_piece, next_node
+                continue
+            joined = piece.join(next_piece)
+            joined_coords = _get_coords(joined)
+            # Either node may keep the joined piece, and the other loses its piece
+            for keeping_node, kept_piece, losing_node, lost_piece in ((node, piece, next_node, next_piece),
+                                                                      (next_node, next_piece, node, piece)):
+                if _can_keep(joined_coords, keeping_node, losing_node, parents, depths, counts, lines):
+                    keeping_lines = lines.setdefault(keeping_node, list(keeping_node.lines))
+                    keeping_lines[keeping_lines.index(kept_piece)] = joined
+                    losing_lines = lines.setdefault(losing_node, list(losing_node.lines))
+                    losing_lines.remove(lost_piece)
+                    ancestor = losing_node
+                    while ancestor is not None:
+                        counts[ancestor] -= 1
+                        ancestor = parents[ancestor]
+                    piece, node = joined, keeping_node
+                    num_merged += 1
+                    break
+            else:
+                piece, node = next_piece, next_node
+
+    if num_merged == 0:
+        return root, 0
+    return _copy_changed(root, lines), num_merged
+
+
+def _can_keep(coords: Coords, keeping_node: Node, losing_node: Node, parents: Dict[Node, Optional[Node]],
+              depths: Dict[Node, int], counts: Dict[Node, int], lines: Dict[Node, List[Partitionable]]) -> bool:
+    """
+    :param coords: coordinates of the joined piece
+    :param keeping_node: node that would keep the joined piece
+    :param losing_node: node that would lose its piece
+    :param parents: parent of every node
+    :param depths: depth of every node
+    :param counts: number of lines in every subtree
+    :param lines: lines of every node whose lines changed
+    :return: whether painter's algorithm stays correct with the joined piece in keeping_node
+    """
+    ancestor = _get_common_ancestor(keeping_node, losing_node, parents, depths)
+    sx, sy, ex, ey = coords
+    child = keeping_node
+    while child is not ancestor:
+        node = parents[child]
+        other_child = node.right if child is node.left else node.left
+        num_lines = len(lines.get(node, node.lines))
+        num_other_lines = counts[other_child] if other_child is not None else 0
+        # The piece being joined away doesn't count, since it's leaving
+        if node is losing_node:
+            num_lines -= 1
+        elif node is ancestor:
+            num_other_lines -= 1
+        if num_lines > 0 or num_other_lines > 0:
+            # The joined piece has to stay on the kept side of a splitting line that separates it from other lines
+            kept_side = -1 if child is node.left else 1
+            if orient(*node.plane, sx, sy) == -kept_side or orient(*node.plane, ex, ey) == -kept_side:
+                return False
+        child = node
+    return True
+
+
+def _get_common_ancestor(a: Node, b: Node, parents: Dict[Node, Optional[Node]], depths: Dict[Node, int]) -> Node:
+    """
+    :return: deepest node that is a or an ancestor of a, and also b or an ancestor of b
+    """
+    while depths[a] > depths[b]:
+        a = parents[a]
+    while depths[b] > depths[a]:
+        b = parents[b]
+    while a is not b:
+        a = parents[a]
+        b = parents[b]
+    return a
+
+
+def _copy_changed(node: Optional[Node], lines: Dict[Node, List[Partitionable]]) -> Optional[Node]:
+    """
+    :param node: root of a subtree
+    :param lines: new lines of every node whose lines changed
+    :return: root of the subtree with those nodes and their ancestors copied, node itself if nothing changed in it
+    """
+    if node is None:
+        return None
+    left = _copy_changed(node.left, lines)
+    right = _copy_changed(node.right, lines)
+    if node not in lines and left is node.left and right is node.right:
+        return node
+    node_lines = lines.get(node, node.lines)
+    if len(node_lines) == 0 and (left is None or right is None):
+        # Nothing is left to split space for, so the remaining child takes over the node's region
+        return left if left is not None else right
+    return Node(node_lines, left, right, node.plane)
+
+
+def _get_coords(line: Partitionable) -> Coords:
+    """
+    :param line: line whose endpoints are read
+    :return: start x, start y, end x and end y of line
+    """
+    (sx, sy), (ex, ey) = line.get_base().coords
+    return sx, sy, ex, ey
+
+
+def _get_position(line: Partitionable, sx: float, sy: float, dx: float, dy: float) -> float:
+    """
+    :param line: piece of a line
+    :param sx: x coordinate of the line's start
+    :param sy: y coordinate of the line's start
+    :param dx: x component of the line's direction
+    :param dy: y component of the line's direction
+    :return: how far along the line the piece starts
+    """
+    (px, py), _ = line.get_base().coords
+    return (px - sx) * dx + (py - sy) * dy
@@ -0,0 +1,120 @@
+import math
+from typing import Dict, List, Optional, Tuple
+
+from sptree.partitionable import Partitionable
+
+LineGroup = List[Partitionable]  # Lines that all lie on the same infinite line
+LineEquation = Tuple[float, float, float]  # a, b, c of the line a * x + b * y = c, with (a, b) a unit normal
+BucketKey = Tuple[int, int]
+
+
+def group_coincident_lines(lines: List[Partitionable], tolerance: float) -> List[LineGroup]:
+    """
+    Groups lines that lie on the same infinite line.
+    Each line's equation is normalized and hashed into buckets sized by tolerance, so a line only has to be compared
+    against the groups in neighbouring buckets, making the grouping O(n) overall.
+    Coincident lines that land in buckets too far apart are left ungrouped, and are found by the tree builder instead.
+
+    :param lines: lines being grouped
+    :param tolerance: maximum distance an endpoint may be from a group's line while still being coincident with it
+    :return: groups of coincident lines, in the order their first line appears in lines
+    """
+    if len(lines) == 0:
+        return []
+
+    coords = [line.get_base().coords[:] for line in lines]
+    extent = max(max(abs(sx), abs(sy), abs(ex), abs(ey)) for (sx, sy), (ex, ey) in coords)
+    tolerance = max(tolerance, 1e-300)
+    # An angular difference of angle_bucket_size moves a line by about tolerance at the scene's furthest point
+    angle_bucket_size = tolerance / max(extent, tolerance)
+    offset_bucket_size = 2 * tolerance
+    num_angle_buckets = max(1, int(math.pi / angle_bucket_size))
+
+    groups: List[LineGroup] = []
+    equations: List[LineEquation] = []  # Equation of each group's line
+    buckets: Dict[BucketKey, List[int]] = {}  # Indices of the groups hashed into each bucket
+    for line, ((sx, sy), (ex, ey)) in zip(lines, coords):
+        # A line with no length has no equation, so it can't be grouped
+        if sx == ex and sy == ey:
+            groups.append([line])
+            equations.append((0.0, 0.0, math.inf))
+            continue
+
+        angle, equation = _get_normalized_equation(sx, sy, ex, ey)
+        # The last bucket also takes the angles left over after the whole buckets, so only stepping past either end
+        # wraps around and reverses the line's direction
+        angle_key = min(int(angle / angle_bucket_size), num_angle_buckets - 1)
+        offset_key = math.floor(equation[2] / offset_bucket_size)
+
+        group_index = None
+        for key in _get_neighbouring_keys(angle_key, offset_key, num_angle_buckets,
+                                          math.floor(-equation[2] / offset_bucket_size)):
+            group_index = _find_group(sx, sy, ex, ey, buckets.get(key, ()), equations, tolerance)
+            if group_index is not None:
+                break
+
+        if group_index is None:
+            buckets.setdefault((angle_key, offset_key), []).append(len(groups))
+            groups.append([line])
+            equations.append(equation)
+        else:
+            groups[group_index].append(line)
+    return groups
+
+
+def _get_normalized_equation(sx: float, sy: float, ex: float, ey: float) -> Tuple[float, LineEquation]:
+    """
+    Computes the equation of the line through the distinct points (sx, sy) and (ex, ey).
+    The line's direction is flipped where needed so that every line has a unique equation.
+
+    :return: angle of the line's direction in [0, pi) and the line's equation
+    """
+    dx = ex - sx
+    dy = ey - sy
+    if dy < 0 or (dy == 0 and dx < 0):
+        dx = -dx
+        dy = -dy
+    length = math.hypot(dx, dy)
+    angle = math.atan2(dy, dx)
+    a = -dy / length
+    b = dx / length
+    return angle, (a, b, a * sx + b * sy)
+
+
+def _get_neighbouring_keys(angle_key: int, offset_key: int, num_angle_buckets: int,
+                           flipped_offset_key: int) -> List[BucketKey]:
+    """
+    :param angle_key: angle bucket of the line
+    :param offset_key: offset bucket of the line
+    :param num_angle_buckets: total number of angle buckets
+    :param flipped_offset_key: offset bucket of the line with its direction reversed
+    :return: keys of the line's bucket followed by every bucket adjacent to it
+    """
+    keys = []
+    for angle_step in (0, -1, 1):
+        neighbour_angle_key = angle_key + angle_step
+        neighbour_offset_key = offset_key
+        # Angles just below pi wrap around to angles just above 0, which reverses the line's direction
+        if neighbour_angle_key < 0 or neighbour_angle_key >= num_angle_buckets:
+            neighbour_angle_key %= num_angle_buckets
+            neighbour_offset_key = flipped_offset_key
+        for offset_step in (0, -1, 1):
+            keys.append((neighbour_angle_key, neighbour_offset_key + offset_step))
+    return keys
+
+
+def _find_group(sx: float, sy: float, ex: float, ey: float, group_indices: List[int],
+                equations: List[LineEquation], tolerance: float) -> Optional[int]:
+    """
+    Finds a group whose line the segment from (sx, sy) to (ex, ey) lies on.
+
+    :param group_indices: indices of the groups being searched
+    :param equations: equation of every group's line
+    :param tolerance: maximum distance an endpoint may be from a group's line
+    :return: index of the matching group, or None if there isn't one
+    """
+    for group_index in group_indices:
+        a, b, c = equations[group_index]
+        if abs(a * sx + b * sy - c) <= tolerance and abs(a * ex + b * ey - c) <= tolerance:
+            return group_index
+    return None
@@ -1,9 +1,9 @@
 from typing import Tuple
 
 from shapely.geometry import LineString
-from shapely.ops import split
 
 from sptree.partitionable import Partitionable
+from sptree.predicates import Coord2D, line_intersection
 
 
 class LineWrapper(Partitionable):
@@ -13,10 +13,33 @@ class LineWrapper(Partitionable):
 
     def __init__(self, line: LineString):
         self._line = line
+        self._source = self  # Unsplit line this line was split from
 
     def split(self, splitting_part: Partitionable) -> Tuple[Partitionable, Partitionable]:
-        first_half, second_half = split(self._line, splitting_part.get_base())
-        return LineWrapper(LineString(first_half.coords)), LineWrapper(LineString(second_half.coords))
+        (sx, sy), (ex, ey) = self._line.coords
+        (ax, ay), (bx, by) = splitting_part.get_base().coords
+        split_point = line_intersection(sx, sy, ex, ey, ax, ay, bx, by)
+        first_half = LineWrapper(LineString([(sx, sy), split_point]))
+        second_half = LineWrapper(LineString([split_point, (ex, ey)]))
+        first_half._source = second_half._source = self._source
+        return first_half, second_half
+
+    def create_piece(self, start: Coord2D, end: Coord2D) -> Partitionable:
+        piece = LineWrapper(LineString([start, end]))
+        piece._source = self._source
+        return piece
+
+    def join(self, other: Partitionable) -> Partitionable:
+        start = self._line.coords[0]
+        end = other.get_base().coords[-1]
+        if (start, end) == tuple(self._source.get_base().coords):
+            return self._source
+        joined = LineWrapper(LineString([start, end]))
+        joined._source = self._source
+        return joined
 
     def get_base(self) -> LineString:
         return self._line
+
+    def get_source(self) -> Partitionable:
+        return self._source
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
+from shapely.geometry import LineString
+
+from sptree.line_wrapper import LineWrapper
 from sptree.partitionable import Partitionable
 
 
@@ -11,13 +14,102 @@ class Node:
     that further subdivide the space.
     """
 
-    def __init__(self, lines: List[Partitionable], left: Optional[Node] = None, right: Optional[Node] = None) -> None:
-        self.lines = lines  # Contains splitting line and any coincident lines
+    def __init__(self, lines: List[Partitionable], left: Optional[Node] = None, right: Optional[Node] = None,
+                 plane: Optional[Tuple[float, float, float, float]] = None) -> None:
+        """
+        :param lines: splitting line and any coincident lines
+        :param left: nodes with lines in front of the splitting line
+        :param right: nodes with lines behind the splitting line
+        :param plane: start and end coordinates of the splitting line, those of the first line when None
+        """
+        self.lines = lines  # Contains splitting line and any coincident lines, empty once they've all been removed
+        if plane is None:
+            (ax, ay), (bx, by) = lines[0].get_base().coords
+            plane = (ax, ay, bx, by)
+        self.plane = plane  # Start and end coordinates of the splitting line
+        # Lines that can be seen from in front of and from behind the splitting line
+        self.front_lines, self.back_lines = Node._get_visible_lines(lines, self.plane)
         self.left = left  # Nodes with lines in front of this node's splitting line
         self.right = right  # Nodes with lines behind this node's splitting line
+        self.pending = None  # Unpartitioned lines of a lazily built subtree, None once the subtree has been built
+        self.pending_seed = None  # Seed of the randomness the pending lines are partitioned with
+
+    @staticmethod
+    def create_pending(groups: List[List[Partitionable]], seed: int) -> Node:
+        """
+        Creates a node whose subtree will be built from groups when it's first needed.
+        Each pending node has its own seed, so the subtree is the same whichever order nodes are built in.
+
+        :param groups: unpartitioned lines of the subtree, grouped by the infinite line they lie on
+        :param seed: seed of the randomness the subtree is built with
+        :return: unbuilt node
+        """
+        # The node's lines and children are placeholders until it's built
+        node = Node(groups[0])
+        node.pending = groups
+        node.pending_seed = seed
+        return node
+
+    def build(self, lines: List[Partitionable], left: Optional[Node], right: Optional[Node]) -> None:
+        """
+        Fills in a pending node with the result of partitioning its lines.
+
+        :param lines: splitting line and any coincident lines
+        :param left: nodes with lines in front of the splitting line
+        :param right: nodes with lines behind the splitting line
+        :return: None
+        """
+        self.lines = lines
+        (ax, ay), (bx, by) = lines[0].get_base().coords
+        self.plane = (ax, ay, bx, by)
+        self.front_lines, self.back_lines = Node._get_visible_lines(lines, self.plane)
+        self.left = left
+        self.right = right
+        # Cleared last, so a node is never seen as built before all of its fields are
+        self.pending = None
+
+    def get_splitting_line(self) -> Partitionable:
+        """
+        :return: a line lying on the node's splitting line, for splitting lines that cross it
+        """
+        if len(self.lines) > 0:
+            return self.lines[0]
+        # Every line of the node has been removed, leaving only its plane
+        ax, ay, bx, by = self.plane
+        return LineWrapper(LineString([(ax, ay), (bx, by)]))
 
     def is_leaf(self) -> bool:
         """
         :return: whether this node is a leaf node
         """
         return self.left is None and self.right is None
+
+    @staticmethod
+    def _get_visible_lines(lines: List[Partitionable], plane: Tuple[float, float, float, float]) \
+            -> Tuple[List[Partitionable], List[Partitionable]]:
+        """
+        Culls one-sided lines facing away from each side of the splitting line.
+        A one-sided coincident line faces the same way as the splitting line when it points the same way.
+
+        :param lines: splitting line and any coincident lines
+        :param plane: start and end coordinates of the splitting line
+        :return: lines seen from in front of the splitting line, and lines seen from behind it
+        """
+        if all(line.is_double_sided() for line in lines):
+            # Both sides see every line, so traversal doesn't need to tell them apart
+            return lines, lines
+
+        ax, ay, bx, by = plane
+        front_lines = []
+        back_lines = []
+        for line in lines:
+            if line.is_double_sided():
+                front_lines.append(line)
+                back_lines.append(line)
+                continue
+            (sx, sy), (ex, ey) = line.get_base().coords
+            if (ex - sx) * (bx - ax) + (ey - sy) * (by - ay) > 0:
+                front_lines.append(line)
+            else:
+                back_lines.append(line)
+        return front_lines, back_lines
@@ -4,6 +4,8 @@ from typing import Tuple
 
 from shapely.geometry import LineString
 
+from sptree.predicates import Coord2D
+
 
 class Partitionable:
     """
@@ -13,15 +15,53 @@ class Partitionable:
 
     def split(self, part: Partitionable) -> Tuple[Partitionable, Partitionable]:
         """
-        Split this Partitionable using part.
+        Split this Partitionable where it crosses the infinite line through part.
 
         :param part: splitting line
         :return: split partitionable object
         """
         raise NotImplementedError
 
+    def create_piece(self, start: Coord2D, end: Coord2D) -> Partitionable:
+        """
+        Creates the piece of this Partitionable between two points, as if it had been split at both of them.
+
+        Precondition: start and end lie on this Partitionable, in the same order as its own start and end
+
+        :param start: start of the piece
+        :param end: end of the piece
+        :return: piece between start and end
+        """
+        raise NotImplementedError
+
+    def join(self, other: Partitionable) -> Partitionable:
+        """
+        Joins this Partitionable with the next piece of the same line, undoing a split.
+
+        Precondition: other was split from the same line as this Partitionable, and starts where it ends
+
+        :param other: piece following this one
+        :return: single piece covering both
+        """
+        raise NotImplementedError
+
     def get_base(self) -> LineString:
         """
         :return: the line representing this Partitionable as seen from a top-down perspective
         """
         raise NotImplementedError
+
+    def is_double_sided(self) -> bool:
+        """
+        A one-sided Partitionable can only be seen from in front of it, the side its start, end and a viewer wind
+        clockwise around.
+
+        :return: whether this Partitionable can be seen from both sides
+        """
+        return True
+
+    def get_source(self) -> Partitionable:
+        """
+        :return: the original, unsplit Partitionable this one was split from, or itself if it was never split
+        """
+        return self
@@ -0,0 +1,120 @@
+from fractions import Fraction
+from typing import Tuple
+
+import numpy as np
+
+Coord2D = Tuple[float, float]
+
+# Relative error bound on the floating point evaluation of the orientation determinant.
+# Determinants whose magnitude exceeds this bound (scaled by the magnitude of the inputs) have a correct sign.
+# Credit to Shewchuk, "Adaptive Precision Floating-Point Arithmetic and Fast Robust Geometric Predicates"
+_epsilon = np.finfo(np.float64).eps / 2
+_orient_error_bound = (3 + 16 * _epsilon) * _epsilon
+
+
+def orient(ax: float, ay: float, bx: float, by: float, cx: float, cy: float) -> int:
+    """
+    Determines which side of the directed line through a and b the point c is on.
+    A fast floating point test is used, falling back to exact rational arithmetic when the result is ambiguous.
+
+    :param ax: x coordinate of the line's start
+    :param ay: y coordinate of the line's start
+    :param bx: x coordinate of the line's end
+    :param by: y coordinate of the line's end
+    :param cx: x coordinate of the point being classified
+    :param cy: y coordinate of the point being classified
+    :return: 1 if a, b, c are counter-clockwise, -1 if they are clockwise, 0 if they are collinear
+    """
+    det_left = (bx - ax) * (cy - ay)
+    det_right = (by - ay) * (cx - ax)
+    det = det_left - det_right
+    # Without cancellation the sign of det is exact, which covers points that share a coordinate with a or b
+    if (det_left > 0) != (det_right > 0) or det_left == 0 or det_right == 0:
+        return (det > 0) - (det < 0)
+    error_bound = _orient_error_bound * (abs(det_left) + abs(det_right))
+    if det > error_bound:
+        return 1
+    if -det > error_bound:
+        return -1
+    return _exact_orient(ax, ay, bx, by, cx, cy)
+
+
+def orient_array(ax: float, ay: float, bx: float, by: float, cx: np.ndarray, cy: np.ndarray) -> np.ndarray:
+    """
+    Vectorized form of orient for many points against a single line.
+
+    :param ax: x coordinate of the line's start
+    :param ay: y coordinate of the line's start
+    :param bx: x coordinate of the line's end
+    :param by: y coordinate of the line's end
+    :param cx: x coordinates of the points being classified
+    :param cy: y coordinates of the points being classified
+    :return: array containing 1, -1 or 0 for each point, with the same meaning as orient
+    """
+    cx = np.asarray(cx, dtype=np.float64)
+    cy = np.asarray(cy, dtype=np.float64)
+    det_left = (bx - ax) * (cy - ay)
+    det_right = (by - ay) * (cx - ax)
+    det = det_left - det_right
+    error_bound = _orient_error_bound * (np.abs(det_left) + np.abs(det_right))
+    sides = np.sign(det).astype(np.int8)
+    # Only the ambiguous results need to be recomputed exactly, and there's no cancellation unless both products
+    # have the same sign
+    ambiguous = (np.abs(det) <= error_bound) & ((det_left > 0) == (det_right > 0)) & (det_left != 0) & (det_right != 0)
+    for i in np.flatnonzero(ambiguous):
+        sides.flat[i] = _exact_orient(ax, ay, bx, by, cx.flat[i], cy.flat[i])
+    return sides
+
+
+def orient_lines(lines: np.ndarray, cx: float, cy: float) -> np.ndarray:
+    """
+    Vectorized form of orient for a single point against many lines.
+
+    :param lines: n x 4 start and end coordinates of the lines
+    :param cx: x coordinate of the point being classified
+    :param cy: y coordinate of the point being classified
+    :return: array containing 1, -1 or 0 for each line, with the same meaning as orient
+    """
+    ax, ay, bx, by = lines[:, 0], lines[:, 1], lines[:, 2], lines[:, 3]
+    det_left = (bx - ax) * (cy - ay)
+    det_right = (by - ay) * (cx - ax)
+    det = det_left - det_right
+    error_bound = _orient_error_bound * (np.abs(det_left) + np.abs(det_right))
+    sides = np.sign(det).astype(np.int8)
+    ambiguous = (np.abs(det) <= error_bound) & ((det_left > 0) == (det_right > 0)) & (det_left != 0) & (det_right != 0)
+    for i in np.flatnonzero(ambiguous):
+        sides[i] = _exact_orient(*lines[i].tolist(), cx, cy)
+    return sides
+
+
+def _exact_orient(ax: float, ay: float, bx: float, by: float, cx: float, cy: float) -> int:
+    """
+    Evaluates the orientation determinant using exact rational arithmetic.
+
+    :return: 1 if a, b, c are counter-clockwise, -1 if they are clockwise, 0 if they are collinear
+    """
+    ax, ay = Fraction(ax), Fraction(ay)
+    det = (Fraction(bx) - ax) * (Fraction(cy) - ay) - (Fraction(by) - ay) * (Fraction(cx) - ax)
+    return (det > 0) - (det < 0)
+
+
+def line_intersection(sx: float, sy: float, ex: float, ey: float,
+                      ax: float, ay: float, bx: float, by: float) -> Coord2D:
+    """
+    Finds where the segment from s to e meets the infinite line through a and b.
+
+    Precondition: s and e lie strictly on opposite sides of the line through a and b
+
+    :return: point of intersection
+    """
+    start_det = (bx - ax) * (sy - ay) - (by - ay) * (sx - ax)
+    end_det = (bx - ax) * (ey - ay) - (by - ay) * (ex - ax)
+    if (start_det > 0 > end_det) or (start_det < 0 < end_det):
+        t = start_det / (start_det - end_det)
+    else:
+        # Determinants are too small to be trusted, so compute the intersection parameter exactly
+        ax, ay, bx, by = Fraction(ax), Fraction(ay), Fraction(bx), Fraction(by)
+        start_det = (bx - ax) * (Fraction(sy) - ay) - (by - ay) * (Fraction(sx) - ax)
+        end_det = (bx - ax) * (Fraction(ey) - ay) - (by - ay) * (Fraction(ex) - ax)
+        t = float(start_det / (start_det - end_det))
+    return sx + t * (ex - sx), sy + t * (ey - sy)
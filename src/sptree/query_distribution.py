@@ -0,0 +1,68 @@
+import math
+import random
+from typing import List, Tuple
+
+import numpy as np
+
+from sptree.line_groups import LineGroup
+from sptree.partitionable import Partitionable
+from sptree.predicates import orient_array
+
+# Number of groups considered as the splitting line of a node that camera locations reach. Each is compared against
+# every line of the node, so this is kept well below the number of lines of a large scene.
+num_candidates = 16
+# Cost of splitting every line of a node, in nodes of expected depth. Every fragment is drawn from everywhere, so
+# splitting lines to make a few regions shallow has to pay for itself.
+split_weight = 1.0
+
+
+def pick_splitting_group(groups: List[LineGroup], points: np.ndarray, rng: random.Random) -> int:
+    """
+    Picks the splitting line that's expected to make camera locations cheapest to reach.
+    A camera location on one side of a splitting line still has to walk down the subtree on that side, which for a
+    balanced subtree is about log2 of its number of lines deep. Splitting lines that leave the camera locations on a
+    side with few lines are preferred, so frequently visited regions end up near the root, while lines the splitting
+    line would cut are penalized.
+
+    :param groups: groups of coincident lines to choose from
+    :param points: k x 2 array of the camera locations within the node's region, at least one
+    :param rng: source of randomness for sampling groups
+    :return: index of the group with the lowest expected cost
+    """
+    candidates = rng.sample(range(len(groups)), num_candidates) if len(groups) > num_candidates \
+        else range(len(groups))
+    lines = [line for group in groups for line in group]
+    endpoints = np.array([line.get_base().coords[:] for line in lines], dtype=np.float64).reshape(-1, 4)
+
+    best_cost = math.inf
+    best_index = 0
+    for i in candidates:
+        (ax, ay), (bx, by) = groups[i][0].get_base().coords
+        start_sides = orient_array(ax, ay, bx, by, endpoints[:, 0], endpoints[:, 1])
+        end_sides = orient_array(ax, ay, bx, by, endpoints[:, 2], endpoints[:, 3])
+        coincident = (start_sides == 0) & (end_sides == 0)
+        crossed = start_sides * end_sides < 0
+        num_crossed = int(np.count_nonzero(crossed))
+        num_front = int(np.count_nonzero(~coincident & ~crossed & (start_sides + end_sides < 0))) + num_crossed
+        num_back = len(lines) - int(np.count_nonzero(coincident)) - num_front + num_crossed
+
+        point_sides = orient_array(ax, ay, bx, by, points[:, 0], points[:, 1])
+        points_in_front = int(np.count_nonzero(point_sides <= 0))
+        expected_depth = (points_in_front * math.log2(num_front + 1) +
+                          (len(points) - points_in_front) * math.log2(num_back + 1)) / len(points)
+        cost = expected_depth + split_weight * num_crossed / len(lines)
+        if cost < best_cost:
+            best_cost = cost
+            best_index = i
+    return best_index
+
+
+def split_points(points: np.ndarray, splitting_line: Partitionable) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :param points: k x 2 array of camera locations
+    :param splitting_line: line the points are divided by
+    :return: points in front of or on the splitting line, and points behind it
+    """
+    (ax, ay), (bx, by) = splitting_line.get_base().coords
+    sides = orient_array(ax, ay, bx, by, points[:, 0], points[:, 1])
+    return points[sides <= 0], points[sides > 0]
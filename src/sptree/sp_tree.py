@@ -1,16 +1,32 @@
 from __future__ import annotations
 
+import copy
+import math
+import pickle
 import random
+import sys
+import threading
 from enum import Enum
-from typing import List, Optional, Generator
+from typing import Callable, Dict, List, Optional, Generator, TextIO, Tuple
 
-from shapely.geometry import box, LineString, Point, LinearRing, Polygon
+import numpy as np
+from shapely.geometry import box, Point
 
-from sptree.line_wrapper import LineWrapper
+from sptree import batch_painters, dynamic_layer, fragment_merging, query_distribution, spatial_queries, \
+    traversal_heatmap, tree_merging
+from sptree.dynamic_layer import DynamicLayer
+from sptree.extents import Extent, get_extent, intersects
+from sptree.line_groups import LineGroup, group_coincident_lines
 from sptree.node import Node
 from sptree.partitionable import Partitionable
+from sptree.predicates import orient, orient_array
+from sptree.spatial_queries import RayHit, Region
+from sptree.traversal_heatmap import TraversalHeatmap
+from sptree.tree_stats import TraversalCost, TreeStats, compute_level_histogram, compute_stats, \
+    compute_traversal_cost, dump_level_histogram
+from sptree.visibility import Coord2D, VisibilityCalculator
 
-error = 1e-13  # Floating point precision
+coincidence_tolerance = 1e-9  # Distance at which lines are considered coincident, relative to the scene's extent
 
 
 class SPTree:
@@ -20,100 +36,378 @@ class SPTree:
     behind the splitting line.
     """
 
-    def __init__(self, lines: List[Partitionable], bounding_box: box) -> None:
-        self.root = SPTree._construct(lines, bounding_box)
+    def __init__(self, lines: List[Partitionable], bounding_box: box, lazy: bool = False,
+                 rng: Optional[random.Random] = None, camera_samples: Optional[np.ndarray] = None) -> None:
+        """
+        :param lines: input lines
+        :param bounding_box: bounding box for lines
+        :param lazy: whether subtrees are only built once a traversal first needs them
+        :param rng: source of randomness for picking splitting lines, seeded to build the same tree every time
+        :param camera_samples: n x 2 array of typical camera locations, which splitting lines are picked to make cheap
+            to reach. Ignored by lazy builds, which pick splitting lines as traversals reach them
+        """
+        groups = group_coincident_lines(lines, _get_tolerance(bounding_box))
+        self._rng = random.Random() if rng is None else rng
+        if lazy:
+            self.root = Node.create_pending(groups, self._rng.getrandbits(64)) if len(groups) > 0 else None
+        else:
+            points = None if camera_samples is None else np.asarray(camera_samples, dtype=np.float64).reshape(-1, 2)
+            self.root = SPTree._construct(groups, self._rng, points)
         self.bounding_box = bounding_box
+        self.input_count = len(lines)  # Number of lines before any were split
+        self._build_lock = threading.Lock()  # Held while a pending node is being built
+        self._visibility: Optional[VisibilityCalculator] = None  # Created by the first visibility query
+        self._extents: Dict[Node, Optional[Extent]] = {}  # Extent of every subtree measured by rectangle queries
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_build_lock"]
+        del state["_visibility"]
+        del state["_extents"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._build_lock = threading.Lock()
+        self._visibility = None
+        self._extents = {}
 
     @staticmethod
-    def _construct(lines: List[Partitionable], bounding_box: box) -> Optional[Node]:
+    def _construct(groups: List[LineGroup], rng: random.Random,
+                   points: Optional[np.ndarray] = None) -> Optional[Node]:
         """
-        Create a SPTree from the given lines by subdividing the space in half using planes.
+        Create a SPTree from the given groups of coincident lines by subdividing the space in half using planes.
 
-        :param lines: input lines
-        :param bounding_box: bounding box for lines
+        :param groups: input lines, grouped by the infinite line they lie on
+        :param rng: source of randomness for picking splitting lines
+        :param points: k x 2 array of the camera locations within the space being subdivided, None to ignore them
         :return: root node of the created SPTree
         """
-        if len(lines) == 0:
+        if len(groups) == 0:
             return None
 
-        # Pick a splitting line that results in relatively few required splits
-        splitting_line = SPTree._pick_splitting_line(lines, bounding_box)
-        coincident_lines = [splitting_line]  # All lines coincident to the splitting line
-        front = []  # All lines in front of the splitting line
-        back = []  # All lines behind the splitting line
+        coincident_lines, front, back = SPTree._partition(groups, rng, points)
 
-        # Extend splitting line to intersect with the bounding box
-        splitting_plane = _get_splitting_plane(splitting_line, bounding_box)
-        splitting_base = splitting_plane.get_base()
+        # Recursively subdivide space in front of and behind the splitting line
+        front_points, back_points = (None, None) if points is None \
+            else query_distribution.split_points(points, coincident_lines[0])
+        front_node = SPTree._construct(front, rng, front_points)
+        back_node = SPTree._construct(back, rng, back_points)
+        cur_node = Node(coincident_lines, front_node, back_node)
 
-        # Classify all lines as being behind or in front of the splitting line
-        # Lines that are intersected by the splitting plane will be split in half, with halves individually classified
-        for i in range(len(lines)):
-            # Splitting line already accounted for
-            if lines[i] == splitting_line:
-                continue
-            line = lines[i]
-            base = line.get_base()
-            line_start = Point(base.coords[0])
-            line_end = Point(base.coords[1])
-            # Coincident line to splitting plane
-            # Distance is checked rather than using contains() because of floating point issues
-            if splitting_base.distance(line_start) < error and splitting_base.distance(line_end) < error:
+        return cur_node
+
+    def expand(self, node: Node) -> None:
+        """
+        Builds a pending node in place by partitioning its lines, leaving its children pending.
+        Does nothing if the node has already been built. Nodes are built with randomness seeded by their parent rather
+        than the tree's, so a seeded tree has the same shape however traversals and background threads interleave.
+
+        :param node: node being built
+        :return: None
+        """
+        if node.pending is None:
+            return
+        with self._build_lock:
+            # Another thread may have built the node while this one waited for the lock
+            if node.pending is None:
+                return
+            rng = random.Random(node.pending_seed)
+            coincident_lines, front, back = SPTree._partition(node.pending, rng)
+            node.build(coincident_lines,
+                       Node.create_pending(front, rng.getrandbits(64)) if len(front) > 0 else None,
+                       Node.create_pending(back, rng.getrandbits(64)) if len(back) > 0 else None)
+
+    def build_remaining(self, progress: Optional[Callable[[int, int], None]] = None) -> None:
+        """
+        Builds every node of a lazily built SPTree that hasn't been built yet.
+
+        :param progress: called after each node is built with the number of lines placed in the nodes built so far,
+            and the number of lines still waiting in the pending nodes reached so far
+        :return: None
+        """
+        stack = [self.root] if self.root is not None else []
+        num_placed = 0
+        num_waiting = _count_pending(self.root) if progress is not None else 0
+        while len(stack) > 0:
+            node = stack.pop()
+            if progress is None:
+                self.expand(node)
+            else:
+                num_pending = _count_pending(node)
+                self.expand(node)
+                num_waiting += _count_pending(node.left) + _count_pending(node.right) - num_pending
+                if num_pending > 0:
+                    num_placed += len(node.lines)
+                    progress(num_placed, num_waiting)
+            if node.left is not None:
+                stack.append(node.left)
+            if node.right is not None:
+                stack.append(node.right)
+
+    def build_remaining_in_background(self) -> threading.Thread:
+        """
+        Starts a background thread which builds every node of a lazily built SPTree that hasn't been built yet.
+        Traversals can continue while it runs.
+
+        :return: the started thread
+        """
+        thread = threading.Thread(target=self.build_remaining, daemon=True)
+        thread.start()
+        return thread
+
+    def with_lines(self, lines: List[Partitionable]) -> SPTree:
+        """
+        Creates a copy of the SPTree with lines added, leaving this SPTree unchanged.
+        Only the nodes on the paths the new lines take are copied, and every other node is shared, so the copy is
+        cheap to make and this SPTree can still be traversed while it's made.
+        New lines are partitioned below the existing splitting lines, so repeated additions may leave the copy less
+        balanced than a tree rebuilt from scratch.
+        Any nodes of a lazily built SPTree that haven't been built yet are built first.
+
+        :param lines: lines being added
+        :return: copy of the SPTree holding lines as well
+        """
+        self.build_remaining()
+        tree = self._copy_with_root(SPTree._insert(self.root, lines, _get_tolerance(self.bounding_box), self._rng))
+        tree.input_count = self.input_count + len(lines)
+        return tree
+
+    def without_lines(self, sources: List[Partitionable]) -> SPTree:
+        """
+        Creates a copy of the SPTree with every piece of some lines removed, leaving this SPTree unchanged.
+        Like with_lines, only the nodes holding pieces of the lines and the paths to them are copied. A node left
+        without lines keeps splitting space along its plane, so nothing has to be partitioned again.
+        Any nodes of a lazily built SPTree that haven't been built yet are built first.
+
+        :param sources: lines being removed, as they were before being split
+        :return: copy of the SPTree without sources
+        """
+        self.build_remaining()
+        tolerance = _get_tolerance(self.bounding_box)
+        root = self.root
+        for source in sources:
+            (sx, sy), (ex, ey) = source.get_base().coords
+            root = SPTree._remove(root, source, (sx, sy, ex, ey), tolerance)
+        tree = self._copy_with_root(root)
+        tree.input_count = self.input_count - len(sources)
+        return tree
+
+    def merge(self, other: SPTree) -> SPTree:
+        """
+        Combines two SPTrees without building a tree from their lines again, leaving both unchanged.
+        This SPTree's splitting lines are kept, and the other SPTree is partitioned by them, splitting only its lines
+        that cross them. Its subtrees that lie entirely on one side of a splitting line are moved there whole, so
+        merging is cheapest when the trees cover different areas, and when this is the larger of the two.
+        Any nodes of either SPTree that haven't been built yet are built first.
+
+        :param other: SPTree being merged into this one
+        :return: SPTree holding the lines of both, within a bounding box covering both
+        """
+        self.build_remaining()
+        other.build_remaining()
+        tree = self._copy_with_root(tree_merging.merge_trees(self.root, other.root))
+        minx, miny, maxx, maxy = self.bounding_box.bounds
+        other_minx, other_miny, other_maxx, other_maxy = other.bounding_box.bounds
+        tree.bounding_box = box(min(minx, other_minx), min(miny, other_miny),
+                                max(maxx, other_maxx), max(maxy, other_maxy))
+        tree.input_count = self.input_count + other.input_count
+        return tree
+
+    def merge_fragments(self) -> int:
+        """
+        Joins adjacent pieces of the same line back together wherever painter's algorithm stays correct from every
+        viewpoint. Only splits that nothing depends on any more, such as those left by without_lines, are undone.
+        A freshly built SPTree has none, since the line each splitting line came from is drawn between the pieces it
+        split, so this isn't part of building one, and returns straight away on one.
+        Nodes are copied rather than modified, so copies made by with_lines and without_lines are unaffected.
+        Any nodes of a lazily built SPTree that haven't been built yet are built first.
+
+        :return: number of pieces removed
+        """
+        self.build_remaining()
+        self.root, num_merged = fragment_merging.merge_fragments(self.root)
+        if num_merged > 0:
+            self._visibility = None  # Cached bounds belong to the old nodes
+        return num_merged
+
+    def _copy_with_root(self, root: Optional[Node]) -> SPTree:
+        """
+        :param root: root node of the copy
+        :return: shallow copy of the SPTree with a different root
+        """
+        # Copying goes through __getstate__, so the copy gets its own lock and visibility state
+        tree = copy.copy(self)
+        tree.root = root
+        return tree
+
+    @staticmethod
+    def _insert(node: Optional[Node], lines: List[Partitionable], tolerance: float,
+                rng: random.Random) -> Optional[Node]:
+        """
+        Adds lines to the subtree rooted at node, copying every node they reach.
+
+        :param node: root of the subtree, None for an empty subtree
+        :param lines: lines being added
+        :param tolerance: distance at which lines are considered coincident
+        :param rng: source of randomness for picking splitting lines of new subtrees
+        :return: root of the copied subtree, node itself if there are no lines
+        """
+        if len(lines) == 0:
+            return node
+        if node is None:
+            return SPTree._construct(group_coincident_lines(lines, tolerance), rng)
+
+        # Lines are classified against the node just as _partition classifies them
+        ax, ay, bx, by = node.plane
+        endpoints = _get_endpoints(lines)
+        start_sides = orient_array(ax, ay, bx, by, endpoints[:, 0], endpoints[:, 1]).tolist()
+        end_sides = orient_array(ax, ay, bx, by, endpoints[:, 2], endpoints[:, 3]).tolist()
+        coincident_lines = []
+        front = []
+        back = []
+        for line, start_side, end_side in zip(lines, start_sides, end_sides):
+            if start_side == 0 and end_side == 0:
                 coincident_lines.append(line)
-            # Splitting plane crosses line
-            # Split line in half and classify both halves accordingly
-            elif splitting_base.crosses(line.get_base()):
-                first_half, second_half = line.split(splitting_plane)
-                SPTree._categorize_line(first_half, splitting_line, front, back)
-                SPTree._categorize_line(second_half, splitting_line, front, back)
-            # Line entirely enclosed within one side of the splitting plane
+            elif start_side * end_side < 0:
+                for half in line.split(node.get_splitting_line()):
+                    (sx, sy), (ex, ey) = half.get_base().coords
+                    if sx == ex and sy == ey:
+                        continue
+                    (front if orient(ax, ay, bx, by, (sx + ex) / 2, (sy + ey) / 2) < 0 else back).append(half)
+            elif start_side + end_side < 0:
+                front.append(line)
             else:
-                SPTree._categorize_line(line, splitting_line, front, back)
+                back.append(line)
+        return Node(node.lines + coincident_lines,
+                    SPTree._insert(node.left, front, tolerance, rng),
+                    SPTree._insert(node.right, back, tolerance, rng),
+                    node.plane)
 
-        # Recursively subdivide space in front of and behind the splitting line
-        front_node = SPTree._construct(front, bounding_box)
-        back_node = SPTree._construct(back, bounding_box)
-        cur_node = Node(coincident_lines, front_node, back_node)
+    @staticmethod
+    def _remove(node: Optional[Node], source: Partitionable, coords: Tuple[float, float, float, float],
+                tolerance: float) -> Optional[Node]:
+        """
+        Removes every piece of source from the subtree rooted at node, copying every node that held a piece.
 
-        return cur_node
+        :param node: root of the subtree
+        :param source: line being removed, as it was before being split
+        :param coords: start and end coordinates of source
+        :param tolerance: distance a split may have rounded a piece of source across a splitting line
+        :return: root of the copied subtree, node itself if it held no piece of source, or None if nothing is left
+        """
+        if node is None:
+            return None
+        # Pieces of a line only reach the sides of a splitting line its endpoints are on, give or take the rounding of
+        # split points, which can put a tiny piece just across a splitting line that an endpoint touches
+        ax, ay, bx, by = node.plane
+        sx, sy, ex, ey = coords
+        length = math.hypot(bx - ax, by - ay)
+        start_distance = ((bx - ax) * (sy - ay) - (by - ay) * (sx - ax)) / length
+        end_distance = ((bx - ax) * (ey - ay) - (by - ay) * (ex - ax)) / length
+        left = SPTree._remove(node.left, source, coords, tolerance) \
+            if min(start_distance, end_distance) < tolerance else node.left
+        right = SPTree._remove(node.right, source, coords, tolerance) \
+            if max(start_distance, end_distance) > -tolerance else node.right
+        lines = [line for line in node.lines if line.get_source() is not source]
+        if len(lines) == len(node.lines) and left is node.left and right is node.right:
+            return node
+        if len(lines) == 0 and left is None and right is None:
+            return None
+        # The splitting line itself may have been removed, so the plane is kept for the children to stay valid
+        return Node(lines, left, right, node.plane)
 
     @staticmethod
-    def _pick_splitting_line(lines: List[Partitionable], bounding_box: box) -> Partitionable:
+    def _partition(groups: List[LineGroup], rng: random.Random,
+                   points: Optional[np.ndarray] = None) -> Tuple[List[Partitionable], List[LineGroup], List[LineGroup]]:
         """
-        Randomly selects a sampling of lines and returns the one resulting in the least number of lines split
-        from its splitting plane.
+        Picks a splitting line from groups and divides the remaining lines by which side of it they're on.
+        Every group is used as a single splitter, so its lines never have to be found or classified again.
 
-        :param lines: lines to choose from
-        :param bounding_box: bounding box for lines
-        :return: sampled line requiring the least number of splits from other lines
-        """
-        line_sample = random.sample(lines, 5) if len(lines) >= 5 else lines
-        sample_num_pieces = []  # Stores the number of split pieces for each sampled line
-        # Calculate the number of split pieces for each sampled line
-        for i in range(len(line_sample)):
-            num_pieces = 0
-            splitting_plane = _get_splitting_plane(line_sample[i], bounding_box)
-            splitting_base = splitting_plane.get_base()
-            for j in range(len(line_sample)):
-                # Skip the splitting line because it won't create any pieces with itself
-                if j == i:
-                    continue
-                line = lines[j].get_base()
-                line_start = Point(line.coords[0])
-                line_end = Point(line.coords[1])
-                # Coincident line to splitting plane: no resulting pieces
-                if splitting_base.distance(line_start) < error and splitting_base.distance(line_end) < error:
-                    continue
-                # Splitting plane crosses line: cuts line in half resulting in two disjoint pieces
-                elif splitting_base.crosses(line):
-                    num_pieces += 2
-                # Line enclosed within one side of the splitting plane: one piece
+        :param groups: input lines, grouped by the infinite line they lie on
+        :param rng: source of randomness for picking splitting lines
+        :param points: k x 2 array of the camera locations within the space being divided, None to ignore them
+        :return: lines coincident to the splitting line, groups in front of it and groups behind it
+        """
+        # Pick a splitting line that keeps the camera locations close to the root, or where there are none, one that
+        # results in relatively few required splits
+        if points is not None and len(points) > 0:
+            splitting_index = query_distribution.pick_splitting_group(groups, points, rng)
+        else:
+            splitting_index = SPTree._pick_splitting_group(groups, rng)
+        splitting_line = groups[splitting_index][0]
+        coincident_lines = list(groups[splitting_index])  # All lines coincident to the splitting line
+        front = []  # All groups in front of the splitting line
+        back = []  # All groups behind the splitting line
+
+        # Classify the endpoints of all other lines against the splitting line at once
+        other_groups = groups[:splitting_index] + groups[splitting_index + 1:]
+        lines = [line for group in other_groups for line in group]
+        start_sides, end_sides = _get_endpoint_sides(_get_endpoints(lines), splitting_line)
+        start_sides = start_sides.tolist()
+        end_sides = end_sides.tolist()
+
+        # Classify all lines as being behind or in front of the splitting line
+        # Lines that are intersected by the splitting plane will be split in half, with halves individually classified
+        # Lines stay in their group on whichever side they end up on
+        i = 0
+        for group in other_groups:
+            group_front = []
+            group_back = []
+            for line in group:
+                start_side = start_sides[i]
+                end_side = end_sides[i]
+                i += 1
+                # Coincident line to splitting plane that wasn't already grouped with it
+                if start_side == 0 and end_side == 0:
+                    coincident_lines.append(line)
+                # Splitting plane crosses line
+                # Split line in half and classify both halves accordingly
+                # A half left with no length by a split that rounded onto an endpoint can't be seen, and would have
+                # no plane if it were ever picked as a splitting line, so it's dropped
+                elif start_side * end_side < 0:
+                    for half in line.split(splitting_line):
+                        if half.get_base().length > 0:
+                            SPTree._categorize_line(half, splitting_line, group_front, group_back)
+                # Line entirely enclosed within one side of the splitting plane
+                # An endpoint touching the splitting plane doesn't change which side the line is on
+                elif start_side + end_side < 0:
+                    group_front.append(line)
                 else:
-                    num_pieces += 1
-            sample_num_pieces.append(num_pieces)  # Record number of split pieces for this sample line
+                    group_back.append(line)
+            if len(group_front) > 0:
+                front.append(group_front)
+            if len(group_back) > 0:
+                back.append(group_back)
+
+        return coincident_lines, front, back
+
+    @staticmethod
+    def _pick_splitting_group(groups: List[LineGroup], rng: random.Random) -> int:
+        """
+        Randomly selects a sampling of groups and returns the one whose line results in the least number of lines
+        split from its splitting plane.
+
+        :param groups: groups of coincident lines to choose from
+        :param rng: source of randomness for sampling groups
+        :return: index of the sampled group requiring the least number of splits from other lines
+        """
+        sample_indices = rng.sample(range(len(groups)), 5) if len(groups) >= 5 else range(len(groups))
+        sample_lines = [line for i in sample_indices for line in groups[i]]
+        sample_endpoints = _get_endpoints(sample_lines)
+        sample_num_pieces = []  # Stores the number of split pieces for each sampled group
+        # Calculate the number of split pieces for each sampled group
+        for i in sample_indices:
+            start_sides, end_sides = _get_endpoint_sides(sample_endpoints, groups[i][0])
+            # Coincident lines to the splitting plane (including the group itself) result in no pieces,
+            # lines crossed by the splitting plane are cut into two pieces, and all other lines stay as one piece
+            coincident = (start_sides == 0) & (end_sides == 0)
+            crossed = start_sides * end_sides < 0
+            num_pieces = int(np.count_nonzero(~coincident)) + int(np.count_nonzero(crossed))
+            sample_num_pieces.append(num_pieces)  # Record number of split pieces for this sample group
 
         min_pieces_index = min((val, index) for (index, val) in enumerate(sample_num_pieces))[1]
-        return line_sample[min_pieces_index]
+        return sample_indices[min_pieces_index]
 
     @staticmethod
     def _categorize_line(line: Partitionable, splitting_line: Partitionable,
@@ -129,55 +423,295 @@ class SPTree:
         :param behind: lines behind the splitting line
         :return: None
         """
-        if _is_point_in_front_of_line(line.get_base().centroid, splitting_line):
+        (sx, sy), (ex, ey) = line.get_base().coords
+        if _is_point_in_front_of_line(Point((sx + ex) / 2, (sy + ey) / 2), splitting_line):
             front.append(line)
         else:
             behind.append(line)
 
-    def painters_alg(self, point: Point) -> Generator[List[Partitionable], None, None]:
+    def save(self, path: str) -> None:
+        """
+        Writes the SPTree to a file so it can be loaded without being rebuilt.
+
+        :param path: file being written
+        :return: None
+        """
+        with open(path, "wb") as file:
+            pickle.dump(self, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path: str) -> SPTree:
+        """
+        Reads an SPTree written by save.
+
+        :param path: file being read
+        :return: the stored SPTree
+        """
+        with open(path, "rb") as file:
+            return pickle.load(file)
+
+    def stats(self) -> TreeStats:
+        """
+        Any nodes of a lazily built SPTree that haven't been built yet are built first.
+
+        :return: node count, depth, balance, fragmentation and memory statistics of the SPTree
+        """
+        self.build_remaining()
+        return compute_stats(self.root, self.input_count)
+
+    def level_histogram(self) -> List[Tuple[int, int]]:
+        """
+        Any nodes of a lazily built SPTree that haven't been built yet are built first.
+
+        :return: number of nodes and number of lines at each level of the SPTree, starting with the root's level
+        """
+        self.build_remaining()
+        return compute_level_histogram(self.root)
+
+    def dump_level_histogram(self, file: TextIO = sys.stdout) -> None:
+        """
+        Writes a table of the number of nodes and lines at every level of the SPTree.
+        Any nodes of a lazily built SPTree that haven't been built yet are built first.
+
+        :param file: where the table is written
+        :return: None
+        """
+        self.build_remaining()
+        dump_level_histogram(self.root, file)
+
+    def traversal_cost(self, points: np.ndarray) -> TraversalCost:
+        """
+        Any nodes of a lazily built SPTree that haven't been built yet are built first.
+
+        :param points: n x 2 array of camera locations
+        :return: expected cost of traversing the SPTree from those camera locations
+        """
+        self.build_remaining()
+        return compute_traversal_cost(self.root, points)
+
+    def traversal_heatmap(self, resolution: Tuple[int, int], measure_overdraw: bool = False,
+                          processes: Optional[int] = 1) -> TraversalHeatmap:
+        """
+        Measures the cost of painter's algorithm from a grid of camera locations across the bounding box, to find the
+        regions of a scene that are expensive to draw and compare trees built in different ways.
+        Any nodes of a lazily built SPTree that haven't been built yet are built first.
+
+        :param resolution: number of columns and rows of the grid
+        :param measure_overdraw: whether to also measure how many lines cover every direction seen from each location
+        :param processes: number of worker processes, the number of CPUs when None, or 1 to measure in this process
+        :return: maps of the cost at every cell of the grid
+        """
+        return traversal_heatmap.compute_traversal_heatmap(self, resolution, measure_overdraw, processes)
+
+    def optimized_for(self, camera_samples: np.ndarray) -> SPTree:
+        """
+        Rebuilds the SPTree from its original lines, picking splitting lines that make the given camera locations cheap
+        to reach. The new tree stays valid from everywhere, it's only shallower where cameras spend their time.
+
+        :param camera_samples: n x 2 array of typical camera locations, such as those recorded by camera traces
+        :return: new SPTree holding the same lines
+        """
+        self.build_remaining()
+        sources = {}
+        stack = [self.root] if self.root is not None else []
+        while len(stack) > 0:
+            node = stack.pop()
+            for line in node.lines:
+                sources.setdefault(id(line.get_source()), line.get_source())
+            stack += [child for child in (node.left, node.right) if child is not None]
+        return SPTree(list(sources.values()), self.bounding_box, rng=self._rng, camera_samples=camera_samples)
+
+    def locate(self, point: Point) -> Region:
+        """
+        Points on a splitting line are located on its front side.
+
+        :param point: point being located
+        :return: region of space containing point
+        """
+        return spatial_queries.locate(self, point.x, point.y)
+
+    def locate_batch(self, points: np.ndarray) -> List[Region]:
+        """
+        :param points: n x 2 array of points being located
+        :return: region of space containing each point
+        """
+        return spatial_queries.locate_batch(self, points)
+
+    def lines_in_rect(self, minx: float, miny: float, maxx: float, maxy: float) -> List[Partitionable]:
+        """
+        Finds the lines that may be seen through a rectangular window onto the scene, skipping whole subtrees that
+        lie outside of it. Lazily built subtrees are only built where they overlap the rectangle.
+
+        :param minx: minimum x of the rectangle
+        :param miny: minimum y of the rectangle
+        :param maxx: maximum x of the rectangle
+        :param maxy: maximum y of the rectangle
+        :return: lines whose bounding boxes overlap the rectangle, in no particular order
+        """
+        return spatial_queries.lines_in_rect(self, minx, miny, maxx, maxy)
+
+    def get_extents(self) -> Dict[Node, Optional[Extent]]:
+        """
+        :return: bounding box of the lines of every subtree measured so far, filled in as subtrees are measured
+        """
+        return self._extents
+
+    def raycast(self, origin: Point, direction: Tuple[float, float],
+                max_distance: float = math.inf) -> Optional[RayHit]:
+        """
+        Finds the first line hit by a ray, walking the SPTree front to back along it.
+
+        :param origin: origin of the ray
+        :param direction: direction of the ray
+        :param max_distance: furthest distance along the ray that's searched, in multiples of direction
+        :return: first line hit, or None if the ray doesn't hit any line
+        """
+        return spatial_queries.raycast(self, origin.x, origin.y, direction[0], direction[1], max_distance)
+
+    def raycast_batch(self, origins: np.ndarray, directions: np.ndarray,
+                      max_distance: float = math.inf) -> Tuple[np.ndarray, List[Optional[Partitionable]]]:
+        """
+        :param origins: n x 2 array of ray origins
+        :param directions: n x 2 array of ray directions
+        :param max_distance: furthest distance along each ray that's searched, in multiples of its direction
+        :return: distance to each ray's first hit, inf for rays that don't hit any line, and the line each ray hits
+        """
+        return spatial_queries.raycast_batch(self, origins, directions, max_distance)
+
+    def segment_blocked(self, start: Point, end: Point) -> bool:
+        """
+        Checks collision when moving from start to end, or line of sight between them.
+
+        :param start: start of the segment
+        :param end: end of the segment
+        :return: whether any line crosses or touches the segment, other than at start
+        """
+        return spatial_queries.segment_blocked(self, start.x, start.y, end.x, end.y)
+
+    def segment_blocked_batch(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """
+        :param starts: n x 2 array of segment starts
+        :param ends: n x 2 array of segment ends
+        :return: whether any line crosses or touches each segment, other than at its start
+        """
+        return spatial_queries.segment_blocked_batch(self, starts, ends)
+
+    def visibility_polygon(self, point: Point) -> List[Coord2D]:
+        """
+        Computes the region that can be seen from point, bounded by the nearest lines and the bounding box.
+        Lines are visited front to back and clipped to the angles that are still uncovered, stopping once every angle
+        is covered. Work from earlier calls is reused, so calling this every frame is cheap.
+
+        :param point: camera location
+        :return: vertices of the visibility polygon, in counter-clockwise order of their angle around point
+        """
+        if self._visibility is None:
+            self._visibility = VisibilityCalculator(self)
+        return self._visibility.compute(point.x, point.y)
+
+    def painters_alg(self, point: Point, layer: Optional[DynamicLayer] = None,
+                     rect: Optional[Extent] = None) -> Generator[List[Partitionable], None, None]:
         """
         Applies painter's algorithm to the SPTree.
         The SPTree is recursively travelled via the generator, starting from nodes in the background and working
         towards nodes in the foreground.
+        Given a rectangle, subtrees whose lines all lie outside of it are skipped, so drawing part of a large scene
+        costs time in proportion to how much of it is in the rectangle. Skipping lines leaves the rest in back to front
+        order, and lazily built subtrees are only built where they overlap the rectangle.
 
         :param point: camera location
+        :param layer: moving lines drawn at the right depth among the SPTree's lines
+        :param rect: minimum x, minimum y, maximum x and maximum y of the area being drawn, None to draw every line.
+            Ignored along with a layer, whose lines may be anywhere in a skipped subtree's region
         :return: generator for Painter's Algorithm
         """
-        return SPTree._painters_alg(self.root, point, self.bounding_box)
+        x, y = point.x, point.y
+        if self.root is None:
+            if layer is not None:
+                return layer.cell_painters_alg(None, dynamic_layer.ON, x, y)
+            return iter(())
+        return self._painters_alg(self.root, x, y, layer, rect if layer is None else None)
+
+    def painters_alg_batch(self, points: np.ndarray) -> Tuple[List[Partitionable], np.ndarray]:
+        """
+        Applies painter's algorithm from many camera locations in a single pass over the SPTree, which is much faster
+        than calling painters_alg for each of them. Lines are drawn in the same order as painters_alg draws them.
+        Any nodes of a lazily built SPTree that haven't been built yet are built first.
 
-    @staticmethod
-    def _painters_alg(cur_node: Node, point: Point, bounding_box: box) -> Generator[List[Partitionable], None, None]:
-        if cur_node is None:
+        :param points: n x 2 array of camera locations
+        :return: every line of the SPTree, and an n x m array holding for each camera location the indices of the
+            lines it draws, from the background to the foreground, padded at the end with -1
+        """
+        return batch_painters.painters_alg_batch(self, points)
+
+    def _painters_alg(self, cur_node: Node, x: float, y: float, layer: Optional[DynamicLayer],
+                      rect: Optional[Extent]) -> Generator[List[Partitionable], None, None]:
+        if rect is not None and not intersects(get_extent(cur_node, self._extents), *rect):
             return
+        # Lazily built subtrees are built the first time they're reached
+        self.expand(cur_node)
+
+        has_layer_lines = layer is not None and layer.has_lines(cur_node)
 
-        # Last node to draw
-        elif cur_node.is_leaf():
+        # Last node to draw, which is seen the same way from either side unless it has one-sided lines
+        if cur_node.is_leaf() and not has_layer_lines and cur_node.front_lines is cur_node.back_lines:
             yield cur_node.lines
+            return
+
+        perspective = _classify_point(x, y, cur_node.plane)
 
         # Point is in front of cur_node, so paint nodes further away i.e. right subtree first, then this node,
         # and finally points in front of this node i.e. left subtree
-        elif Perspective.classify(point, cur_node.lines[0], bounding_box) == Perspective.FRONT:
-            if cur_node.right is not None:
-                yield from SPTree._painters_alg(cur_node.right, point, bounding_box)
-            yield cur_node.lines
-            if cur_node.left is not None:
-                yield from SPTree._painters_alg(cur_node.left, point, bounding_box)
+        # One-sided lines facing away from the point are culled
+        if perspective == Perspective.FRONT:
+            lines = cur_node.front_lines
+            if has_layer_lines:
+                lines = lines + layer.get_coincident_lines(cur_node, dynamic_layer.FRONT)
+            yield from self._painters_alg_child(cur_node, dynamic_layer.BACK, x, y, layer, rect)
+            if len(lines) > 0:
+                yield lines
+            yield from self._painters_alg_child(cur_node, dynamic_layer.FRONT, x, y, layer, rect)
 
         # Point is in behind cur_node, so paint nodes further away i.e. left subtree first, then this node,
         # and finally points behind this node i.e. right subtree
-        elif Perspective.classify(point, cur_node.lines[0], bounding_box) == Perspective.BACK:
-            if cur_node.left is not None:
-                yield from SPTree._painters_alg(cur_node.left, point, bounding_box)
-            yield cur_node.lines
-            if cur_node.right is not None:
-                yield from SPTree._painters_alg(cur_node.right, point, bounding_box)
-
-        # Point is coincident to cur_node, so it isn't drawn
+        elif perspective == Perspective.BACK:
+            lines = cur_node.back_lines
+            if has_layer_lines:
+                lines = lines + layer.get_coincident_lines(cur_node, dynamic_layer.BACK)
+            yield from self._painters_alg_child(cur_node, dynamic_layer.FRONT, x, y, layer, rect)
+            if len(lines) > 0:
+                yield lines
+            yield from self._painters_alg_child(cur_node, dynamic_layer.BACK, x, y, layer, rect)
+
+        # Point is coincident to cur_node, so it isn't drawn unless it's a leaf
         else:
-            if cur_node.left is not None:
-                yield from SPTree._painters_alg(cur_node.left, point, bounding_box)
-            if cur_node.right is not None:
-                yield from SPTree._painters_alg(cur_node.right, point, bounding_box)
+            yield from self._painters_alg_child(cur_node, dynamic_layer.FRONT, x, y, layer, rect)
+            yield from self._painters_alg_child(cur_node, dynamic_layer.BACK, x, y, layer, rect)
+            if cur_node.is_leaf():
+                lines = cur_node.lines
+                if has_layer_lines:
+                    lines = lines + layer.get_coincident_lines(cur_node, dynamic_layer.ON)
+                yield lines
+
+    def _painters_alg_child(self, cur_node: Node, side: int, x: float, y: float, layer: Optional[DynamicLayer],
+                            rect: Optional[Extent]) -> Generator[List[Partitionable], None, None]:
+        """
+        Applies painter's algorithm to the subtree on one side of cur_node, or to the layer's lines in that cell when
+        there is no subtree.
+
+        :param cur_node: node whose child is painted
+        :param side: FRONT for the left child, or BACK for the right child
+        :param x: x coordinate of the camera location
+        :param y: y coordinate of the camera location
+        :param layer: moving lines drawn among the SPTree's lines
+        :param rect: area being drawn, outside of which subtrees are skipped, None to draw every line
+        :return: generator for Painter's Algorithm
+        """
+        child = cur_node.left if side == dynamic_layer.FRONT else cur_node.right
+        if child is not None:
+            yield from self._painters_alg(child, x, y, layer, rect)
+        elif layer is not None and layer.has_lines(cur_node):
+            yield from layer.cell_painters_alg(cur_node, side, x, y)
 
 
 class Perspective(Enum):
@@ -189,21 +723,48 @@ class Perspective(Enum):
     BACK = 3
 
     @staticmethod
-    def classify(point: Point, line: Partitionable, bounding_box: box) -> Perspective:
+    def classify(point: Point, line: Partitionable) -> Perspective:
         """
         Classifies the position of point relative to line.
 
         :param point: point being classified
         :param line: line being used as the point of reference
-        :param bounding_box: bounding box containing this line
         :return: ON if point is on the line, FRONT if point is in front of the line, or BACK if point is behind the line
         """
-        if _get_splitting_plane(line, bounding_box).get_base().distance(point) < error:
-            return Perspective.ON
-        if _is_point_in_front_of_line(point, line):
-            return Perspective.FRONT
-        else:
-            return Perspective.BACK
+        (ax, ay), (bx, by) = line.get_base().coords
+        return _classify_point(point.x, point.y, (ax, ay, bx, by))
+
+    @staticmethod
+    def classify_array(points: np.ndarray, line: Partitionable) -> np.ndarray:
+        """
+        Classifies the positions of many points relative to line at once.
+
+        :param points: n x 2 array of points being classified
+        :param line: line being used as the point of reference
+        :return: array holding the value of ON, FRONT or BACK for each point
+        """
+        (ax, ay), (bx, by) = line.get_base().coords
+        sides = orient_array(ax, ay, bx, by, points[:, 0], points[:, 1])
+        return np.where(sides == 0, Perspective.ON.value,
+                        np.where(sides < 0, Perspective.FRONT.value, Perspective.BACK.value))
+
+
+def _classify_point(x: float, y: float, plane: Tuple[float, float, float, float]) -> Perspective:
+    """
+    Classifies the position of the point (x, y) relative to the line through the start and end of plane.
+
+    :param x: x coordinate of the point
+    :param y: y coordinate of the point
+    :param plane: start and end coordinates of the line
+    :return: ON if point is on the line, FRONT if point is in front of the line, or BACK if point is behind the line
+    """
+    side = orient(*plane, x, y)
+    if side == 0:
+        return Perspective.ON
+    elif side < 0:
+        return Perspective.FRONT
+    else:
+        return Perspective.BACK
 
 
 def _is_point_in_front_of_line(point: Point, line: Partitionable) -> bool:
@@ -216,46 +777,45 @@ def _is_point_in_front_of_line(point: Point, line: Partitionable) -> bool:
     :param line: line being used as the point of reference
     :return: True if it's in front, False otherwise
     """
-    return not LinearRing([*line.get_base().coords, point]).is_ccw
+    (ax, ay), (bx, by) = line.get_base().coords
+    return orient(ax, ay, bx, by, point.x, point.y) < 0
 
 
-def _get_splitting_plane(line: Partitionable, polygon: Polygon) -> LineWrapper:
+def _count_pending(node: Optional[Node]) -> int:
+    """
+    :param node: node of a lazily built SPTree
+    :return: number of lines waiting to be partitioned in node, 0 if it's None or already built
     """
-    Extends a line inside a polygon to split said polygon.
+    pending = node.pending if node is not None else None
+    return sum(len(group) for group in pending) if pending is not None else 0
+
 
-    Credit to https://stackoverflow.com/a/62413539
-    :param line: line being extended
-    :param polygon: polygon being split
-    :return: plane that splits the polygon's bounding box
+def _get_tolerance(bounding_box: box) -> float:
     """
-    minx, miny, maxx, maxy = polygon.bounds
-
-    bounding_box = box(minx, miny, maxx, maxy)
-    p1, p2 = line.get_base().boundary
-    if p1.x == p2.x:  # vertical line
-        extended_line = LineString([(p1.x, miny), (p1.x, maxy)])
-    elif p1.y == p2.y:  # horizontal line
-        extended_line = LineString([(minx, p1.y), (maxx, p1.y)])
-    else:
-        # Calculate all 4 possible points of intersection
+    :param bounding_box: bounding box for the lines of an SPTree
+    :return: distance at which the SPTree's lines are considered coincident
+    """
+    minx, miny, maxx, maxy = bounding_box.bounds
+    return coincidence_tolerance * max(abs(minx), abs(miny), abs(maxx), abs(maxy), 1)
 
-        # Linear equation: y = mx + b
-        m = (p2.y - p1.y) / (p2.x - p1.x)  # Slope
-        b = p1.y - m * p1.x  # y-intercept
-        y0 = m * minx + b
-        y1 = m * maxx + b
-        x0 = (miny - b) / m
-        x1 = (maxy - b) / m
-        points_on_boundary_lines = [Point(minx, y0), Point(maxx, y1), Point(x0, miny), Point(x1, maxy)]
-        unique_points_on_boundary_lines = []
 
-        for p in points_on_boundary_lines:
-            if p not in unique_points_on_boundary_lines:
-                unique_points_on_boundary_lines.append(p)
+def _get_endpoints(lines: List[Partitionable]) -> np.ndarray:
+    """
+    :param lines: lines whose endpoints are collected
+    :return: n x 4 array holding the start x, start y, end x and end y of each line
+    """
+    return np.array([line.get_base().coords[:] for line in lines], dtype=np.float64).reshape(-1, 4)
 
-        # Use the closest two points to the bounding box to form the splitting plane
 
-        points_sorted_by_distance = sorted(unique_points_on_boundary_lines, key=bounding_box.distance)
-        extended_line = LineString(points_sorted_by_distance[:2])
+def _get_endpoint_sides(endpoints: np.ndarray, line: Partitionable) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Classifies the endpoints of many lines against the line through line.
+    Negative values are in front of line, positive values are behind line, and 0 is on line.
 
-    return LineWrapper(extended_line)
+    :param endpoints: n x 4 array of line endpoints, as created by _get_endpoints
+    :param line: line being used as the point of reference
+    :return: orientations of the start points and of the end points
+    """
+    (ax, ay), (bx, by) = line.get_base().coords
+    return orient_array(ax, ay, bx, by, endpoints[:, 0], endpoints[:, 1]), \
+        orient_array(ax, ay, bx, by, endpoints[:, 2], endpoints[:, 3])
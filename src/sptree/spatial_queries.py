@@ -0,0 +1,347 @@
+from __future__ import annotations
+
+import math
+from typing import List, NamedTuple, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from sptree.dynamic_layer import BACK, FRONT
+from sptree.extents import get_extent, intersects
+from sptree.node import Node
+from sptree.partitionable import Partitionable
+from sptree.predicates import orient, orient_array
+
+if TYPE_CHECKING:
+    from sptree.sp_tree import SPTree
+
+# Tolerance, relative to a line's length, within which a hit just past either end of the line still counts.
+# Hit points are computed in floating point, so a ray through a line's endpoint may land fractionally outside it.
+_endpoint_tolerance = 1e-9
+
+
+class Region(NamedTuple):
+    """
+    A convex region of space that an SPTree doesn't subdivide any further: the empty child on one side of a node.
+    """
+    node: Optional[Node]  # Node whose splitting line bounds the region, None when the SPTree is empty
+    side: int  # FRONT or BACK side of node's splitting line the region is on
+
+
+class RayHit(NamedTuple):
+    """
+    The first line a ray hits.
+    """
+    line: Partitionable  # Line that was hit
+    distance: float  # Distance from the ray's origin to the hit, in multiples of the ray's direction
+    x: float  # x coordinate of the hit
+    y: float  # y coordinate of the hit
+
+
+def locate(sptree: SPTree, x: float, y: float) -> Region:
+    """
+    Finds the region containing the point (x, y).
+    Points on a splitting line are located on its front side.
+
+    :param sptree: SPTree being searched
+    :param x: x coordinate of the point
+    :param y: y coordinate of the point
+    :return: region containing the point
+    """
+    node = sptree.root
+    if node is None:
+        return Region(None, FRONT)
+    while True:
+        # Lazily built subtrees are built the first time they're reached
+        sptree.expand(node)
+        side = BACK if orient(*node.plane, x, y) > 0 else FRONT
+        child = node.left if side == FRONT else node.right
+        if child is None:
+            return Region(node, side)
+        node = child
+
+
+def locate_batch(sptree: SPTree, points: np.ndarray) -> List[Region]:
+    """
+    Vectorized form of locate for many points at once.
+
+    :param sptree: SPTree being searched
+    :param points: n x 2 array of points
+    :return: region containing each point
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    regions: List[Optional[Region]] = [None] * len(points)
+    if sptree.root is None:
+        return [Region(None, FRONT)] * len(points)
+
+    # Points are pushed down the tree together, splitting into smaller groups at every node
+    stack = [(sptree.root, np.arange(len(points)))]
+    while len(stack) > 0:
+        node, indices = stack.pop()
+        sptree.expand(node)
+        sides = orient_array(*node.plane, points[indices, 0], points[indices, 1])
+        for side, child, mask in ((FRONT, node.left, sides <= 0), (BACK, node.right, sides > 0)):
+            side_indices = indices[mask]
+            if len(side_indices) == 0:
+                continue
+            if child is None:
+                region = Region(node, side)
+                for i in side_indices.tolist():
+                    regions[i] = region
+            else:
+                stack.append((child, side_indices))
+    return regions
+
+
+def lines_in_rect(sptree: SPTree, minx: float, miny: float, maxx: float, maxy: float) -> List[Partitionable]:
+    """
+    Finds the lines whose bounding boxes overlap a rectangle.
+    Subtrees whose lines all lie outside the rectangle are skipped using the extent of every node's subtree, so the
+    time taken depends on how many lines are near the rectangle rather than on the size of the tree.
+
+    :param sptree: SPTree being searched
+    :param minx: minimum x of the rectangle
+    :param miny: minimum y of the rectangle
+    :param maxx: maximum x of the rectangle
+    :param maxy: maximum y of the rectangle
+    :return: lines overlapping the rectangle, in no particular order
+    """
+    extents = sptree.get_extents()
+    lines = []
+    stack = [sptree.root] if sptree.root is not None else []
+    while len(stack) > 0:
+        node = stack.pop()
+        if not intersects(get_extent(node, extents), minx, miny, maxx, maxy):
+            continue
+        # Lazily built subtrees are built the first time they're reached
+        sptree.expand(node)
+        for line in node.lines:
+            (sx, sy), (ex, ey) = line.get_base().coords
+            if intersects((min(sx, ex), min(sy, ey), max(sx, ex), max(sy, ey)), minx, miny, maxx, maxy):
+                lines.append(line)
+        stack += [child for child in (node.left, node.right) if child is not None]
+    return lines
+
+
+def raycast(sptree: SPTree, ox: float, oy: float, dx: float, dy: float,
+            max_distance: float = math.inf) -> Optional[RayHit]:
+    """
+    Finds the first line hit by the ray from (ox, oy) along (dx, dy).
+    The tree is walked front to back along the ray, so only the nodes whose splitting lines the ray crosses are
+    visited, and the first hit found is the nearest. Lines the ray starts on or runs along aren't hit.
+
+    :param sptree: SPTree being searched
+    :param ox: x coordinate of the ray's origin
+    :param oy: y coordinate of the ray's origin
+    :param dx: x component of the ray's direction
+    :param dy: y component of the ray's direction
+    :param max_distance: furthest distance along the ray that's searched, in multiples of its direction
+    :return: first line hit, or None if the ray doesn't hit any line
+    """
+    # Subtrees still to be searched, and the interval of the ray inside them. Entries holding a list instead of a
+    # Node are the lines of a node whose splitting line the ray crosses at that distance.
+    stack = [(sptree.root, 0.0, max_distance)] if sptree.root is not None else []
+    while len(stack) > 0:
+        node, t_start, t_end = stack.pop()
+        if not isinstance(node, Node):
+            hit = _get_hit(node, ox, oy, dx, dy, t_start)
+            if hit is not None:
+                return hit
+            continue
+
+        sptree.expand(node)
+        ax, ay, bx, by = node.plane
+        # The orientation determinant of the point at distance t along the ray is origin_det + t * direction_det
+        origin_det = (bx - ax) * (oy - ay) - (by - ay) * (ox - ax)
+        direction_det = (bx - ax) * dy - (by - ay) * dx
+        origin_side = orient(ax, ay, bx, by, ox, oy)
+        # Rays parallel to the splitting line never cross it, while a ray starting on the splitting line crosses it
+        # at its origin, which isn't a hit
+        if direction_det == 0:
+            t_cross = -1
+        elif origin_side == 0:
+            t_cross = 0
+        else:
+            t_cross = -origin_det / direction_det
+        # The near side is the side the ray is on at t_start, which is the other side than its origin when it
+        # crossed the splitting line before reaching this subtree
+        if 0 <= t_cross and (t_cross < t_start or t_cross == 0):
+            near_front = direction_det < 0
+        else:
+            near_front = origin_side < 0
+        near, far = (node.left, node.right) if near_front else (node.right, node.left)
+
+        if 0 < t_cross and t_start <= t_cross <= t_end:
+            # Pushed in reverse, so the near side is searched first, then this node's lines, then the far side
+            if far is not None:
+                stack.append((far, t_cross, t_end))
+            stack.append((node.lines, t_cross, t_cross))
+            if near is not None:
+                stack.append((near, t_start, t_cross))
+        elif near is not None:
+            stack.append((near, t_start, t_end))
+    return None
+
+
+def raycast_batch(sptree: SPTree, origins: np.ndarray, directions: np.ndarray,
+                  max_distance: float = math.inf) -> Tuple[np.ndarray, List[Optional[Partitionable]]]:
+    """
+    Vectorized form of raycast for many rays at once.
+    Rays are walked through the tree together, so each node is visited once for all the rays that reach it.
+
+    :param sptree: SPTree being searched
+    :param origins: n x 2 array of ray origins
+    :param directions: n x 2 array of ray directions
+    :param max_distance: furthest distance along each ray that's searched, in multiples of its direction
+    :return: distance to each ray's first hit in multiples of its direction, inf for rays that don't hit any line,
+        and the line each ray hits, None for rays that don't hit any line
+    """
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+    directions = np.asarray(directions, dtype=np.float64).reshape(-1, 2)
+    num_rays = len(origins)
+    hit_distances = np.full(num_rays, math.inf)
+    hit_lines: List[Optional[Partitionable]] = [None] * num_rays
+    if sptree.root is None or num_rays == 0:
+        return hit_distances, hit_lines
+
+    ox, oy = origins[:, 0], origins[:, 1]
+    dx, dy = directions[:, 0], directions[:, 1]
+    _raycast_batch(sptree, sptree.root, np.arange(num_rays), np.zeros(num_rays), np.full(num_rays, max_distance),
+                   ox, oy, dx, dy, hit_distances, hit_lines)
+    return hit_distances, hit_lines
+
+
+def segment_blocked(sptree: SPTree, ax: float, ay: float, bx: float, by: float) -> bool:
+    """
+    Determines whether any line crosses or touches the segment from a to b, other than at a.
+    Used for collision between positions and for line of sight between points.
+
+    :param sptree: SPTree being searched
+    :param ax: x coordinate of the segment's start
+    :param ay: y coordinate of the segment's start
+    :param bx: x coordinate of the segment's end
+    :param by: y coordinate of the segment's end
+    :return: True if the segment is blocked, False otherwise
+    """
+    return raycast(sptree, ax, ay, bx - ax, by - ay, 1.0) is not None
+
+
+def segment_blocked_batch(sptree: SPTree, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Vectorized form of segment_blocked for many segments at once.
+
+    :param sptree: SPTree being searched
+    :param starts: n x 2 array of segment starts
+    :param ends: n x 2 array of segment ends
+    :return: whether each segment is blocked
+    """
+    starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=np.float64).reshape(-1, 2)
+    hit_distances, _ = raycast_batch(sptree, starts, ends - starts, 1.0)
+    return np.isfinite(hit_distances)
+
+
+def _raycast_batch(sptree: SPTree, node: Optional[Node], rays: np.ndarray, t_start: np.ndarray, t_end: np.ndarray,
+                   ox: np.ndarray, oy: np.ndarray, dx: np.ndarray, dy: np.ndarray,
+                   hit_distances: np.ndarray, hit_lines: List[Optional[Partitionable]]) -> None:
+    """
+    Searches a subtree for the first hit of every ray in rays, recording hits in hit_distances and hit_lines.
+    Each ray still searches its near side, then the node's lines, then its far side, but different rays may have
+    different near sides.
+
+    :param sptree: SPTree being searched
+    :param node: root of the subtree
+    :param rays: indices of the rays reaching the subtree
+    :param t_start: distance along each ray where it enters the subtree
+    :param t_end: distance along each ray where it leaves the subtree
+    :param ox: x coordinates of the origins of all rays
+    :param oy: y coordinates of the origins of all rays
+    :param dx: x components of the directions of all rays
+    :param dy: y components of the directions of all rays
+    :param hit_distances: distance to the first hit of all rays, inf until a ray hits a line
+    :param hit_lines: line first hit by all rays, None until a ray hits a line
+    :return: None
+    """
+    if node is None or len(rays) == 0:
+        return
+    sptree.expand(node)
+    ax, ay, bx, by = node.plane
+    ray_ox, ray_oy = ox[rays], oy[rays]
+    origin_det = (bx - ax) * (ray_oy - ay) - (by - ay) * (ray_ox - ax)
+    direction_det = (bx - ax) * dy[rays] - (by - ay) * dx[rays]
+    origin_sides = orient_array(ax, ay, bx, by, ray_ox, ray_oy)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_cross = np.where(direction_det == 0, -1.0, np.where(origin_sides == 0, 0.0, -origin_det / direction_det))
+    crossed_before = (0 <= t_cross) & ((t_cross < t_start) | (t_cross == 0))
+    near_front = np.where(crossed_before, direction_det < 0, origin_sides < 0)
+    crosses = (0 < t_cross) & (t_start <= t_cross) & (t_cross <= t_end)
+    near_end = np.where(crosses, t_cross, t_end)
+
+    # Near sides of every ray
+    for child, mask in ((node.left, near_front), (node.right, ~near_front)):
+        _raycast_batch(sptree, child, rays[mask], t_start[mask], near_end[mask], ox, oy, dx, dy,
+                       hit_distances, hit_lines)
+
+    # Lines of this node, for rays that cross it without hitting anything on their near side
+    crossing = crosses & np.isinf(hit_distances[rays])
+    if not crossing.any():
+        return
+    crossing_rays = rays[crossing]
+    crossing_t = t_cross[crossing]
+    hit_x = ox[crossing_rays] + crossing_t * dx[crossing_rays]
+    hit_y = oy[crossing_rays] + crossing_t * dy[crossing_rays]
+    unhit = np.ones(len(crossing_rays), dtype=bool)
+    for line in node.lines:
+        hits = unhit & _hits_line_array(line, hit_x, hit_y)
+        for i in np.flatnonzero(hits).tolist():
+            hit_distances[crossing_rays[i]] = crossing_t[i]
+            hit_lines[crossing_rays[i]] = line
+        unhit &= ~hits
+
+    # Far sides of rays that haven't hit anything yet
+    far_rays = crossing_rays[unhit]
+    far_start = crossing_t[unhit]
+    far_end = t_end[crossing][unhit]
+    far_front = ~near_front[crossing][unhit]
+    for child, mask in ((node.left, far_front), (node.right, ~far_front)):
+        _raycast_batch(sptree, child, far_rays[mask], far_start[mask], far_end[mask], ox, oy, dx, dy,
+                       hit_distances, hit_lines)
+
+
+def _get_hit(lines: List[Partitionable], ox: float, oy: float, dx: float, dy: float, t: float) -> Optional[RayHit]:
+    """
+    Precondition: the ray crosses the infinite line all of lines lie on at distance t
+
+    :param lines: lines of a node
+    :param ox: x coordinate of the ray's origin
+    :param oy: y coordinate of the ray's origin
+    :param dx: x component of the ray's direction
+    :param dy: y component of the ray's direction
+    :param t: distance along the ray where it crosses the lines' infinite line
+    :return: the ray's hit on whichever of lines it hits, or None if it passes between them
+    """
+    x = ox + t * dx
+    y = oy + t * dy
+    for line in lines:
+        (sx, sy), (ex, ey) = line.get_base().coords
+        length_squared = (ex - sx) ** 2 + (ey - sy) ** 2
+        u = ((x - sx) * (ex - sx) + (y - sy) * (ey - sy)) / length_squared if length_squared > 0 else 0
+        if -_endpoint_tolerance <= u <= 1 + _endpoint_tolerance:
+            return RayHit(line, t, x, y)
+    return None
+
+
+def _hits_line_array(line: Partitionable, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Precondition: every point lies on the infinite line through line
+
+    :param line: line being hit
+    :param x: x coordinates of the points
+    :param y: y coordinates of the points
+    :return: whether each point lies within line
+    """
+    (sx, sy), (ex, ey) = line.get_base().coords
+    length_squared = (ex - sx) ** 2 + (ey - sy) ** 2
+    if length_squared == 0:
+        return np.zeros(len(x), dtype=bool)
+    u = ((x - sx) * (ex - sx) + (y - sy) * (ey - sy)) / length_squared
+    return (-_endpoint_tolerance <= u) & (u <= 1 + _endpoint_tolerance)
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import math
+from multiprocessing import Pool
+from typing import NamedTuple, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from sptree import batch_painters
+from sptree.tree_stats import compute_locate_depths
+
+if TYPE_CHECKING:
+    from sptree.sp_tree import SPTree
+
+# Number of camera locations traversed together. Larger chunks spread the cost of visiting every node over more
+# locations, while their draw orders take a few bytes per location and line.
+_chunk_size = 4096
+# Number of camera locations whose overdraw is measured at once. The endpoints of every line each of them draws are
+# gathered, so this bounds memory to a few dozen bytes per location and line.
+_overdraw_chunk_size = 1024
+
+# State of each worker process, set once by _init_worker so it isn't sent along with every chunk
+_worker_measurer: Optional[_ChunkMeasurer] = None
+
+
+class TraversalHeatmap(NamedTuple):
+    """
+    Cost of painter's algorithm measured from every camera location of a grid over a scene.
+    Maps are indexed by row then column, so rows run along y and columns along x.
+    """
+    xs: np.ndarray  # x coordinate of every column of the grid
+    ys: np.ndarray  # y coordinate of every row of the grid
+    node_count: int  # Number of nodes painter's algorithm visits, which is the same from every camera location
+    nodes_drawn: np.ndarray  # Number of nodes whose lines are drawn, which one-sided lines facing away can lower
+    fragments: np.ndarray  # Number of lines drawn
+    depths: np.ndarray  # Number of nodes on the path from the root to the region containing the camera location
+    overdraw: Optional[np.ndarray]  # Average number of drawn lines along a ray from the camera, None if not measured
+
+    def save(self, path: str) -> None:
+        """
+        Writes the grid and every map to a compressed NumPy .npz file.
+
+        :param path: file being written
+        :return: None
+        """
+        maps = {name: value for name, value in self._asdict().items() if value is not None}
+        np.savez_compressed(path, **maps)
+
+
+def compute_traversal_heatmap(sptree: SPTree, resolution: Tuple[int, int], measure_overdraw: bool = False,
+                              processes: Optional[int] = 1) -> TraversalHeatmap:
+    """
+    Runs painter's algorithm from the center of every cell of a grid across the SPTree's bounding box.
+    Draw orders are found for a chunk of camera locations at a time by painters_alg_batch's vectorized traversal, so
+    no Python code runs per camera location, and chunks can be split across a pool of worker processes. Any nodes of
+    a lazily built SPTree that haven't been built yet are built first.
+
+    :param sptree: SPTree being measured
+    :param resolution: number of columns and rows of the grid, at least 1 each
+    :param measure_overdraw: whether to also measure how many lines cover every direction seen from each location,
+        which costs about as much again as the traversal
+    :param processes: number of worker processes, the number of CPUs when None, or 1 to measure in this process
+    :return: maps of the traversal's cost at every cell of the grid
+    """
+    columns, rows = resolution
+    minx, miny, maxx, maxy = sptree.bounding_box.bounds
+    xs = minx + (np.arange(columns) + 0.5) * (maxx - minx) / columns
+    ys = miny + (np.arange(rows) + 0.5) * (maxy - miny) / rows
+    grid_x, grid_y = np.meshgrid(xs, ys)
+    points = np.column_stack((grid_x.ravel(), grid_y.ravel()))
+    chunks = [points[start:start + _chunk_size] for start in range(0, len(points), _chunk_size)]
+
+    measurer = _ChunkMeasurer(sptree, measure_overdraw)
+    if processes == 1:
+        results = [measurer.measure(chunk) for chunk in chunks]
+    else:
+        with Pool(processes, initializer=_init_worker, initargs=(measurer,)) as pool:
+            results = pool.map(_measure_chunk, chunks)
+
+    shape = (rows, columns)
+    nodes_drawn, fragments, overdraw = (np.concatenate(maps).reshape(shape) for maps in zip(*results))
+    return TraversalHeatmap(xs=xs, ys=ys, node_count=len(measurer.batch_tree.nodes),
+                            nodes_drawn=nodes_drawn, fragments=fragments,
+                            depths=compute_locate_depths(sptree.root, points).reshape(shape),
+                            overdraw=overdraw if measure_overdraw else None)
+
+
+class _ChunkMeasurer:
+    """
+    Measures the cost of painter's algorithm from chunks of camera locations.
+    """
+
+    def __init__(self, sptree: SPTree, measure_overdraw: bool) -> None:
+        """
+        :param sptree: SPTree being measured
+        :param measure_overdraw: whether overdraw is measured
+        """
+        self.batch_tree = batch_painters.flatten(sptree)
+        self.measure_overdraw = measure_overdraw
+        # Node each line belongs to, as a node's lines are always drawn next to each other
+        self._line_nodes = np.repeat(np.arange(len(self.batch_tree.nodes)),
+                                     [len(node.lines) for node in self.batch_tree.nodes]).astype(np.int32)
+        self._coords = np.array([line.get_base().coords[:] for line in self.batch_tree.lines],
+                                dtype=np.float64).reshape(-1, 4)
+
+    def measure(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        :param points: k x 2 array of camera locations
+        :return: number of nodes drawn, number of lines drawn, and overdraw from each camera location, where overdraw
+            is 0 when it isn't measured
+        """
+        order = batch_painters.draw_orders(self.batch_tree, points)
+        drawn = order >= 0
+        fragments = np.count_nonzero(drawn, axis=1)
+        nodes_drawn = np.zeros(len(points), dtype=np.int64)
+        overdraw = np.zeros(len(points), dtype=np.float64)
+        if order.shape[1] == 0:
+            return nodes_drawn, fragments, overdraw
+        # A node starts wherever the line drawn differs in node from the one drawn before it
+        nodes = np.where(drawn, self._line_nodes[order], -1)
+        nodes_drawn += drawn[:, 0] + np.count_nonzero(drawn[:, 1:] & (nodes[:, 1:] != nodes[:, :-1]), axis=1)
+        if self.measure_overdraw:
+            for start in range(0, len(points), _overdraw_chunk_size):
+                end = start + _overdraw_chunk_size
+                overdraw[start:end] = _get_overdraw(self._coords[order[start:end]], drawn[start:end],
+                                                    points[start:end])
+        return nodes_drawn, fragments, overdraw
+
+
+def _init_worker(measurer: _ChunkMeasurer) -> None:
+    """
+    :param measurer: measurer of the SPTree, sent to every worker process once
+    :return: None
+    """
+    global _worker_measurer
+    _worker_measurer = measurer
+
+
+def _measure_chunk(points: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    :param points: k x 2 array of camera locations
+    :return: number of nodes drawn, number of lines drawn, and overdraw from each camera location
+    """
+    return _worker_measurer.measure(points)
+
+
+def _get_overdraw(coords: np.ndarray, drawn: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """
+    Measures the angle every drawn line covers as seen from the camera, which is the share of a panoramic view it's
+    drawn over, and adds them up.
+
+    :param coords: k x m x 4 array of the start and end coordinates of the lines each camera location draws
+    :param drawn: k x m array of which entries of coords are lines rather than padding
+    :param points: k x 2 array of camera locations
+    :return: average number of lines drawn along a ray from each camera location
+    """
+    ax = coords[:, :, 0] - points[:, 0, np.newaxis]
+    ay = coords[:, :, 1] - points[:, 1, np.newaxis]
+    bx = coords[:, :, 2] - points[:, 0, np.newaxis]
+    by = coords[:, :, 3] - points[:, 1, np.newaxis]
+    angles = np.abs(np.arctan2(ax * by - ay * bx, ax * bx + ay * by))
+    return np.where(drawn, angles, 0).sum(axis=1) / (2 * math.pi)
@@ -0,0 +1,112 @@
+from typing import Dict, List, Optional, Tuple
+
+from sptree.extents import Extent, get_extent
+from sptree.node import Node
+from sptree.partitionable import Partitionable
+from sptree.predicates import orient
+
+Plane = Tuple[float, float, float, float]  # Start x, start y, end x and end y of a splitting line
+
+
+def merge_trees(root: Optional[Node], other_root: Optional[Node]) -> Optional[Node]:
+    """
+    Combines two trees by passing the other tree down this one's splitting lines, as if its lines were inserted one at
+    a time, except that whole subtrees are moved at once.
+    At every splitting line, the other tree is cut into the part in front of it and the part behind it. A subtree
+    whose lines all lie on one side is moved to that side as it is, and only the nodes of subtrees that straddle the
+    splitting line are copied, splitting just the lines that cross it. Trees covering different areas therefore merge
+    in time proportional to their depth, rather than to their number of lines.
+
+    Nodes are copied rather than modified, so both trees are left unchanged and share nodes with the result.
+
+    :param root: root of a fully built tree, whose splitting lines are kept
+    :param other_root: root of a fully built tree, whose lines are partitioned by the first tree's splitting lines
+    :return: root of a tree holding the lines of both
+    """
+    return _merge(root, other_root, {})
+
+
+def _merge(node: Optional[Node], other: Optional[Node], extents: Dict[Node, Optional[Extent]]) -> Optional[Node]:
+    """
+    :param node: root of a subtree of the first tree
+    :param other: root of a subtree holding the other tree's lines within node's region
+    :param extents: extent of every subtree of the other tree measured so far
+    :return: root of a subtree holding the lines of both
+    """
+    if other is None:
+        return node
+    if node is None:
+        return other
+    front, back, coincident_lines = _partition_tree(other, node.plane, node.get_splitting_line(), extents)
+    left = _merge(node.left, front, extents)
+    right = _merge(node.right, back, extents)
+    if len(coincident_lines) == 0 and left is node.left and right is node.right:
+        return node
+    return Node(node.lines + coincident_lines, left, right, node.plane)
+
+
+def _partition_tree(node: Optional[Node], plane: Plane, splitting_line: Partitionable,
+                    extents: Dict[Node, Optional[Extent]]) -> Tuple[Optional[Node], Optional[Node],
+                                                                    List[Partitionable]]:
+    """
+    Cuts a subtree along a splitting line. Both parts keep the subtree's splitting lines, so they're still valid trees.
+
+    :param node: root of the subtree being cut
+    :param plane: start and end coordinates of the splitting line
+    :param splitting_line: line the subtree's lines are split by
+    :param extents: extent of every subtree measured so far
+    :return: part of the subtree in front of the splitting line, part behind it, and lines coincident to it
+    """
+    if node is None:
+        return None, None, []
+    extent = get_extent(node, extents)
+    if extent is None:
+        return None, None, []
+    minx, miny, maxx, maxy = extent
+    corner_sides = {orient(*plane, x, y) for x, y in ((minx, miny), (maxx, miny), (maxx, maxy), (minx, maxy))}
+    if corner_sides == {-1}:
+        return node, None, []
+    if corner_sides == {1}:
+        return None, node, []
+
+    # Lines are classified just as SPTree._insert classifies them
+    ax, ay, bx, by = plane
+    front_lines = []
+    back_lines = []
+    coincident_lines = []
+    for line in node.lines:
+        (sx, sy), (ex, ey) = line.get_base().coords
+        start_side = orient(ax, ay, bx, by, sx, sy)
+        end_side = orient(ax, ay, bx, by, ex, ey)
+        if start_side == 0 and end_side == 0:
+            coincident_lines.append(line)
+        elif start_side * end_side < 0:
+            for half in line.split(splitting_line):
+                (sx, sy), (ex, ey) = half.get_base().coords
+                if sx == ex and sy == ey:
+                    continue
+                (front_lines if orient(ax, ay, bx, by, (sx + ex) / 2, (sy + ey) / 2) < 0 else back_lines).append(half)
+        elif start_side + end_side < 0:
+            front_lines.append(line)
+        else:
+            back_lines.append(line)
+
+    left_front, left_back, left_coincident = _partition_tree(node.left, plane, splitting_line, extents)
+    right_front, right_back, right_coincident = _partition_tree(node.right, plane, splitting_line, extents)
+    return _create_node(front_lines, left_front, right_front, node.plane), \
+        _create_node(back_lines, left_back, right_back, node.plane), \
+        coincident_lines + left_coincident + right_coincident
+
+
+def _create_node(lines: List[Partitionable], left: Optional[Node], right: Optional[Node],
+                 plane: Plane) -> Optional[Node]:
+    """
+    :param lines: lines of the node
+    :param left: front child of the node
+    :param right: back child of the node
+    :param plane: splitting line of the node
+    :return: node holding lines, or the only non-empty child when there's nothing left for it to split
+    """
+    if len(lines) == 0 and (left is None or right is None):
+        return left if left is not None else right
+    return Node(lines, left, right, plane)
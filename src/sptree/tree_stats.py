@@ -0,0 +1,195 @@
+import math
+import sys
+from typing import List, NamedTuple, Optional, TextIO, Tuple
+
+import numpy as np
+from shapely.geometry.base import BaseGeometry
+
+from sptree.node import Node
+from sptree.partitionable import Partitionable
+from sptree.predicates import orient_array
+
+
+class TreeStats(NamedTuple):
+    """
+    Summary of the shape and size of an SPTree.
+    """
+    node_count: int  # Number of nodes in the tree
+    leaf_count: int  # Number of nodes without children
+    max_depth: int  # Number of nodes on the longest path from the root, 0 for an empty tree
+    average_depth: float  # Average number of nodes on the path from the root to a leaf
+    balance_factor: float  # max_depth relative to the smallest possible depth, 1.0 being perfectly balanced
+    input_count: int  # Number of lines the tree was built from
+    fragment_count: int  # Number of lines stored in the tree after splitting
+    fragment_ratio: float  # input_count / fragment_count, 1.0 meaning no line had to be split
+    memory_bytes: int  # Estimate of the memory used by the nodes and the lines they hold
+
+
+class TraversalCost(NamedTuple):
+    """
+    Expected cost of traversing an SPTree from a sample of camera locations.
+    Queries that start from the camera, such as collisions, ray casts and visibility, first walk down to the region
+    containing it, so their cost grows with its depth. Painter's algorithm visits every node and draws every fragment
+    from anywhere, so its cost doesn't depend on the camera.
+    """
+    mean_depth: float  # Average number of nodes on the path from the root to the region containing a camera location
+    max_depth: int  # Largest number of nodes on the path to the region containing any of the camera locations
+    node_count: int  # Number of nodes visited by painter's algorithm
+    fragment_count: int  # Number of lines drawn by painter's algorithm
+
+    def __str__(self) -> str:
+        return "mean depth {:.2f}, max depth {}, {} nodes, {} fragments".format(
+            self.mean_depth, self.max_depth, self.node_count, self.fragment_count)
+
+
+def compute_stats(root: Optional[Node], input_count: int) -> TreeStats:
+    """
+    Collects statistics about the tree rooted at root.
+
+    :param root: root of the tree
+    :param input_count: number of lines the tree was built from
+    :return: statistics of the tree
+    """
+    node_count = 0
+    leaf_count = 0
+    leaf_depth_total = 0
+    max_depth = 0
+    fragment_count = 0
+    memory_bytes = 0
+    for node, depth in _walk(root):
+        node_count += 1
+        max_depth = max(max_depth, depth)
+        fragment_count += len(node.lines)
+        memory_bytes += _estimate_node_size(node)
+        if node.is_leaf():
+            leaf_count += 1
+            leaf_depth_total += depth
+
+    min_depth = math.ceil(math.log2(node_count + 1))
+    return TreeStats(node_count=node_count,
+                     leaf_count=leaf_count,
+                     max_depth=max_depth,
+                     average_depth=leaf_depth_total / leaf_count if leaf_count > 0 else 0.0,
+                     balance_factor=max_depth / min_depth if min_depth > 0 else 1.0,
+                     input_count=input_count,
+                     fragment_count=fragment_count,
+                     fragment_ratio=input_count / fragment_count if fragment_count > 0 else 1.0,
+                     memory_bytes=memory_bytes)
+
+
+def compute_traversal_cost(root: Optional[Node], points: np.ndarray) -> TraversalCost:
+    """
+    Measures the expected cost of traversing the tree rooted at root from the given camera locations.
+
+    :param root: root of a fully built tree
+    :param points: n x 2 array of camera locations
+    :return: expected traversal cost
+    """
+    depths = compute_locate_depths(root, points)
+    stats = compute_stats(root, 0)
+    return TraversalCost(mean_depth=float(depths.mean()) if len(depths) > 0 else 0.0,
+                         max_depth=int(depths.max()) if len(depths) > 0 else 0,
+                         node_count=stats.node_count,
+                         fragment_count=stats.fragment_count)
+
+
+def compute_locate_depths(root: Optional[Node], points: np.ndarray) -> np.ndarray:
+    """
+    Points on a splitting line are counted on its front side, like SPTree.locate.
+
+    :param root: root of a fully built tree
+    :param points: n x 2 array of camera locations
+    :return: number of nodes on the path from the root to the region containing each point
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    depths = np.zeros(len(points), dtype=np.int64)
+    # Points are pushed down the tree together, splitting into smaller groups at every node
+    stack = [(root, np.arange(len(points)))] if root is not None and len(points) > 0 else []
+    while len(stack) > 0:
+        node, indices = stack.pop()
+        depths[indices] += 1
+        sides = orient_array(*node.plane, points[indices, 0], points[indices, 1])
+        for child, mask in ((node.left, sides <= 0), (node.right, sides > 0)):
+            if child is not None and mask.any():
+                stack.append((child, indices[mask]))
+    return depths
+
+
+def compute_level_histogram(root: Optional[Node]) -> List[Tuple[int, int]]:
+    """
+    Counts the nodes and lines at every level of the tree rooted at root.
+
+    :param root: root of the tree
+    :return: number of nodes and number of lines at each level, starting with the root's level
+    """
+    histogram = []
+    for node, depth in _walk(root):
+        while len(histogram) < depth:
+            histogram.append([0, 0])
+        histogram[depth - 1][0] += 1
+        histogram[depth - 1][1] += len(node.lines)
+    return [(num_nodes, num_lines) for num_nodes, num_lines in histogram]
+
+
+def dump_level_histogram(root: Optional[Node], file: TextIO = sys.stdout) -> None:
+    """
+    Writes a table of the number of nodes and lines at every level of the tree rooted at root.
+
+    :param root: root of the tree
+    :param file: where the table is written
+    :return: None
+    """
+    histogram = compute_level_histogram(root)
+    widest = max((num_nodes for num_nodes, _ in histogram), default=0)
+    print("{:>5}  {:>7}  {:>7}".format("level", "nodes", "lines"), file=file)
+    for level, (num_nodes, num_lines) in enumerate(histogram):
+        bar = "#" * max(1, round(40 * num_nodes / widest))
+        print("{:>5}  {:>7}  {:>7}  {}".format(level, num_nodes, num_lines, bar), file=file)
+
+
+def _walk(root: Optional[Node]):
+    """
+    Iterates over every node of the tree rooted at root without recursion, so deep trees can be walked.
+
+    :param root: root of the tree
+    :return: generator of each node along with its depth, the root having depth 1
+    """
+    stack = [(root, 1)] if root is not None else []
+    while len(stack) > 0:
+        node, depth = stack.pop()
+        yield node, depth
+        if node.right is not None:
+            stack.append((node.right, depth + 1))
+        if node.left is not None:
+            stack.append((node.left, depth + 1))
+
+
+def _estimate_node_size(node: Node) -> int:
+    """
+    :param node: node being measured
+    :return: estimated number of bytes used by node and the lines it holds
+    """
+    size = sys.getsizeof(node) + sys.getsizeof(vars(node)) + sys.getsizeof(node.lines) + sys.getsizeof(node.plane)
+    for line in node.lines:
+        size += _estimate_line_size(line)
+    return size
+
+
+def _estimate_line_size(line: Partitionable) -> int:
+    """
+    :param line: line being measured
+    :return: estimated number of bytes used by line and the values it holds
+    """
+    size = sys.getsizeof(line)
+    attributes = getattr(line, "__dict__", None)
+    if attributes is None:
+        return size
+    size += sys.getsizeof(attributes)
+    for value in attributes.values():
+        if isinstance(value, BaseGeometry):
+            # Coordinates are held by GEOS rather than Python, at 2 doubles per coordinate
+            size += sys.getsizeof(value) + 16 * len(value.coords)
+        else:
+            # Includes the data buffer of NumPy arrays
+            size += sys.getsizeof(value)
+    return size
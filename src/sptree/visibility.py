@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import math
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from sptree.node import Node
+from sptree.partitionable import Partitionable
+from sptree.predicates import orient
+
+if TYPE_CHECKING:
+    from sptree.sp_tree import SPTree
+
+Coord2D = Tuple[float, float]
+Bounds = Tuple[float, float, float, float]  # Min x, min y, max x and max y
+
+_full_turn = 2 * math.pi
+
+
+class VisibilityCalculator:
+    """
+    Computes the region of an SPTree's scene that can be seen from a point.
+    Lines are visited front to back, and each one is clipped to the angles around the point that no nearer line has
+    covered yet. Subtrees whose bounds only span covered angles are skipped, and the walk stops once every angle
+    is covered, so only lines near the point are usually visited.
+    The bounds of every subtree are kept between calls, as is the last polygon in case the point hasn't moved.
+    Several threads may compute polygons with the same calculator at once.
+    """
+
+    def __init__(self, sptree: SPTree) -> None:
+        """
+        :param sptree: SPTree of the scene
+        """
+        self._sptree = sptree
+        self._bounds: Dict[Node, Bounds] = {}  # Bounds of the lines in each visited subtree
+        # Last point and its polygon, replaced together so other threads never see one without the other
+        self._last: Tuple[Optional[Coord2D], List[Coord2D]] = (None, [])
+
+    def compute(self, x: float, y: float) -> List[Coord2D]:
+        """
+        Lines only block what's behind them from the side they can be seen from, and the scene's bounding box
+        blocks everything else.
+
+        :param x: x coordinate of the point
+        :param y: y coordinate of the point
+        :return: vertices of the visibility polygon from the point, in counter-clockwise order of their angle
+        """
+        last_point, last_polygon = self._last
+        if last_point == (x, y):
+            return last_polygon
+
+        uncovered = _AngularIntervals()
+        pieces: List[Tuple[float, Coord2D, Coord2D]] = []  # Angle where each visible piece starts, and its ends
+        root = self._sptree.root
+        # Entries holding a list instead of a Node are the lines of a node, reached in front to back order
+        stack = [root] if root is not None else []
+        while len(stack) > 0 and not uncovered.is_empty():
+            node = stack.pop()
+            if not isinstance(node, Node):
+                for line in node:
+                    _clip_line(line, x, y, uncovered, pieces)
+                continue
+
+            # Lazily built subtrees are built the first time they're reached
+            self._sptree.expand(node)
+            if not self._may_be_visible(node, x, y, uncovered):
+                continue
+            side = orient(*node.plane, x, y)
+            # Pushed in reverse, so the near side is visited first, then this node's lines, then the far side
+            if side < 0:
+                near, lines, far = node.left, node.front_lines, node.right
+            elif side > 0:
+                near, lines, far = node.right, node.back_lines, node.left
+            else:
+                # Point is coincident to the node, so its lines are seen edge on and can't block anything
+                near, lines, far = node.left, [], node.right
+            if far is not None:
+                stack.append(far)
+            if len(lines) > 0:
+                stack.append(lines)
+            if near is not None:
+                stack.append(near)
+
+        # Whatever nothing blocked reaches the bounding box
+        if not uncovered.is_empty():
+            minx, miny, maxx, maxy = self._sptree.bounding_box.bounds
+            corners = [(minx, miny), (maxx, miny), (maxx, maxy), (minx, maxy)]
+            for i in range(4):
+                _clip_segment(corners[i], corners[(i + 1) % 4], x, y, uncovered, pieces)
+
+        pieces.sort(key=lambda piece: piece[0])
+        polygon = []
+        for _, start, end in pieces:
+            for vertex in (start, end):
+                # Adjacent pieces meet at the same vertex, up to rounding where a line ends on another one
+                if len(polygon) == 0 or not _is_close(polygon[-1], vertex):
+                    polygon.append(vertex)
+        if len(polygon) > 1 and _is_close(polygon[0], polygon[-1]):
+            polygon.pop()
+
+        self._last = ((x, y), polygon)
+        return polygon
+
+    def _may_be_visible(self, node: Node, x: float, y: float, uncovered: _AngularIntervals) -> bool:
+        """
+        :param node: root of a subtree
+        :param x: x coordinate of the point
+        :param y: y coordinate of the point
+        :param uncovered: angles no line has covered yet
+        :return: False if no line of the subtree can be seen from the point, True if one might be
+        """
+        minx, miny, maxx, maxy = self._get_bounds(node)
+        if minx <= x <= maxx and miny <= y <= maxy:
+            return True
+        # Seen from outside, the bounds span less than a half turn, measured here around the direction to their centre
+        centre_angle = math.atan2((miny + maxy) / 2 - y, (minx + maxx) / 2 - x)
+        offsets = [(math.atan2(cy - y, cx - x) - centre_angle + math.pi) % _full_turn - math.pi
+                   for cx, cy in ((minx, miny), (maxx, miny), (maxx, maxy), (minx, maxy))]
+        return uncovered.overlaps(centre_angle + min(offsets), centre_angle + max(offsets))
+
+    def _get_bounds(self, node: Node) -> Bounds:
+        """
+        :param node: root of a subtree
+        :return: bounds of every line in the subtree
+        """
+        bounds = self._bounds.get(node)
+        if bounds is not None:
+            return bounds
+        if node.pending is not None:
+            # Splitting never moves a line outside its original bounds, so an unbuilt subtree's bounds are final
+            lines = [line for group in node.pending for line in group]
+            child_bounds = []
+        else:
+            lines = node.lines
+            child_bounds = [self._get_bounds(child) for child in (node.left, node.right) if child is not None]
+        xs = []
+        ys = []
+        for line in lines:
+            (sx, sy), (ex, ey) = line.get_base().coords
+            xs += (sx, ex)
+            ys += (sy, ey)
+        for child_minx, child_miny, child_maxx, child_maxy in child_bounds:
+            xs += (child_minx, child_maxx)
+            ys += (child_miny, child_maxy)
+        bounds = (min(xs), min(ys), max(xs), max(ys))
+        self._bounds[node] = bounds
+        return bounds
+
+
+class _AngularIntervals:
+    """
+    Disjoint intervals of angles in [0, 2 pi), kept sorted.
+    """
+
+    def __init__(self) -> None:
+        self._starts = [0.0]
+        self._ends = [_full_turn]
+
+    def is_empty(self) -> bool:
+        """
+        :return: whether there are no intervals left
+        """
+        return len(self._starts) == 0
+
+    def overlaps(self, low: float, high: float) -> bool:
+        """
+        :param low: start of the range of angles, which may be outside [0, 2 pi)
+        :param high: end of the range of angles, at most a full turn after low
+        :return: whether any interval overlaps the range going counter-clockwise from low to high
+        """
+        return any(self._overlaps(range_low, range_high) for range_low, range_high in _normalize(low, high))
+
+    def subtract(self, low: float, high: float) -> List[Tuple[float, float]]:
+        """
+        Removes a range of angles from the intervals.
+
+        :param low: start of the range of angles, in [0, 2 pi)
+        :param high: end of the range of angles, in [0, 2 pi]
+        :return: parts of the range that overlapped the intervals, in increasing order
+        """
+        # First interval that may overlap, since every earlier interval ends at or before low
+        first = bisect_right(self._ends, low)
+        last = first
+        removed = []
+        remainders_starts = []
+        remainders_ends = []
+        while last < len(self._starts) and self._starts[last] < high:
+            start, end = self._starts[last], self._ends[last]
+            overlap_low, overlap_high = max(start, low), min(end, high)
+            if overlap_low < overlap_high:
+                removed.append((overlap_low, overlap_high))
+            if start < low:
+                remainders_starts.append(start)
+                remainders_ends.append(low)
+            if high < end:
+                remainders_starts.append(high)
+                remainders_ends.append(end)
+            last += 1
+        if last > first:
+            self._starts[first:last] = remainders_starts
+            self._ends[first:last] = remainders_ends
+        return removed
+
+    def _overlaps(self, low: float, high: float) -> bool:
+        i = bisect_right(self._ends, low)
+        return i < len(self._starts) and self._starts[i] < high
+
+
+def _is_close(a: Coord2D, b: Coord2D) -> bool:
+    """
+    :return: whether a and b are the same point, up to rounding
+    """
+    return math.isclose(a[0], b[0], rel_tol=1e-9, abs_tol=1e-9) and math.isclose(a[1], b[1], rel_tol=1e-9, abs_tol=1e-9)
+
+
+def _normalize(low: float, high: float) -> List[Tuple[float, float]]:
+    """
+    :param low: start of a range of angles
+    :param high: end of the range of angles, at most a full turn after low
+    :return: the range as one or two ranges within [0, 2 pi]
+    """
+    span = high - low
+    low %= _full_turn
+    if low + span <= _full_turn:
+        return [(low, low + span)]
+    return [(low, _full_turn), (0.0, low + span - _full_turn)]
+
+
+def _clip_line(line: Partitionable, x: float, y: float, uncovered: _AngularIntervals,
+               pieces: List[Tuple[float, Coord2D, Coord2D]]) -> None:
+    """
+    Records the parts of a line seen from (x, y) through uncovered angles, and covers those angles.
+
+    :param line: line being clipped
+    :param x: x coordinate of the point
+    :param y: y coordinate of the point
+    :param uncovered: angles no nearer line has covered yet
+    :param pieces: visible pieces found so far, as their start angle and end points
+    :return: None
+    """
+    start, end = line.get_base().coords
+    _clip_segment(start, end, x, y, uncovered, pieces)
+
+
+def _clip_segment(start: Coord2D, end: Coord2D, x: float, y: float, uncovered: _AngularIntervals,
+                  pieces: List[Tuple[float, Coord2D, Coord2D]]) -> None:
+    """
+    Segment form of _clip_line.
+    """
+    side = orient(x, y, start[0], start[1], end[0], end[1])
+    if side == 0:
+        # Segments seen edge on don't cover any angle
+        return
+    # Angles are swept counter-clockwise, so the segment is swept from whichever end the sweep reaches first
+    first, second = (start, end) if side > 0 else (end, start)
+    low = math.atan2(first[1] - y, first[0] - x) % _full_turn
+    high = math.atan2(second[1] - y, second[0] - x) % _full_turn
+    ranges = [(low, high)] if low < high else [(low, _full_turn), (0.0, high)]
+    for range_low, range_high in ranges:
+        for visible_low, visible_high in uncovered.subtract(range_low, range_high):
+            pieces.append((visible_low,
+                           first if visible_low == low else _cast(first, second, x, y, visible_low),
+                           second if visible_high == high else _cast(first, second, x, y, visible_high)))
+
+
+def _cast(start: Coord2D, end: Coord2D, x: float, y: float, angle: float) -> Coord2D:
+    """
+    Precondition: the ray crosses the line through start and end
+
+    :param start: start of the segment
+    :param end: end of the segment
+    :param x: x coordinate of the ray's origin
+    :param y: y coordinate of the ray's origin
+    :param angle: angle of the ray
+    :return: where the ray from (x, y) at angle crosses the line through start and end
+    """
+    dx, dy = math.cos(angle), math.sin(angle)
+    ux, uy = end[0] - start[0], end[1] - start[1]
+    t = ((start[0] - x) * uy - (start[1] - y) * ux) / (dx * uy - dy * ux)
+    return x + t * dx, y + t * dy
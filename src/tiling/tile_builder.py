@@ -0,0 +1,155 @@
+import json
+import math
+import os
+import pickle
+from typing import Dict, Iterable, List, Tuple
+
+from shapely.geometry import box, LineString
+
+from sptree.line_wrapper import LineWrapper
+from sptree.partitionable import Partitionable
+from sptree.sp_tree import SPTree
+
+TileKey = Tuple[int, int]  # Column and row of a tile
+
+INDEX_FILE = "index.json"
+_buffer_limit = 100000  # Number of pieces held in memory before they're spilled to disk
+
+
+def build_tiles(lines: Iterable[Partitionable], bounding_box: box, tile_size: float, directory: str) -> None:
+    """
+    Cuts the scene into square tiles and writes a separate SPTree for every non-empty tile to directory.
+    Lines are streamed through to disk before any tree is built, so the whole scene never has to be in memory at once.
+
+    :param lines: lines of the scene
+    :param bounding_box: bounding box for all lines
+    :param tile_size: width and height of a tile
+    :param directory: directory the tiles and their index are written to
+    :return: None
+    """
+    os.makedirs(directory, exist_ok=True)
+    minx, miny, maxx, maxy = bounding_box.bounds
+    columns = max(1, math.ceil((maxx - minx) / tile_size))
+    rows = max(1, math.ceil((maxy - miny) / tile_size))
+
+    # Sort pieces of lines into the tile they fall in, spilling them to disk as the buffer fills up
+    buffered: Dict[TileKey, List[Partitionable]] = {}
+    num_buffered = 0
+    for line in lines:
+        for piece in _cut_line(line, minx, miny, tile_size):
+            key = _get_tile_key(piece, minx, miny, tile_size, columns, rows)
+            buffered.setdefault(key, []).append(piece)
+            num_buffered += 1
+        if num_buffered >= _buffer_limit:
+            _spill(buffered, directory)
+            num_buffered = 0
+    _spill(buffered, directory)
+
+    # Build the tree of each tile from its spilled pieces
+    tiles = []
+    for file_name in sorted(os.listdir(directory)):
+        if not file_name.endswith(".pieces"):
+            continue
+        column, row = map(int, file_name[:-len(".pieces")].split("_")[1:])
+        pieces_path = os.path.join(directory, file_name)
+        pieces = _read_pieces(pieces_path)
+        tile_box = box(minx + column * tile_size, miny + row * tile_size,
+                       minx + (column + 1) * tile_size, miny + (row + 1) * tile_size)
+        SPTree(pieces, tile_box).save(os.path.join(directory, get_tile_file_name((column, row))))
+        os.remove(pieces_path)
+        tiles.append([column, row])
+
+    with open(os.path.join(directory, INDEX_FILE), "w") as file:
+        json.dump({"bounding_box": [minx, miny, maxx, maxy],
+                   "tile_size": tile_size,
+                   "columns": columns,
+                   "rows": rows,
+                   "tiles": tiles}, file)
+
+
+def get_tile_file_name(key: TileKey) -> str:
+    """
+    :param key: column and row of the tile
+    :return: name of the file storing the tile's SPTree
+    """
+    return "tile_{}_{}.sptree".format(*key)
+
+
+def _cut_line(line: Partitionable, minx: float, miny: float, tile_size: float) -> List[Partitionable]:
+    """
+    Splits a line wherever it crosses a tile boundary.
+
+    :param line: line being cut
+    :param minx: left edge of the first column of tiles
+    :param miny: top edge of the first row of tiles
+    :param tile_size: width and height of a tile
+    :return: pieces of line that each lie within a single tile
+    """
+    pieces = [line]
+    for axis, origin in ((0, minx), (1, miny)):
+        cut_pieces = []
+        for piece in pieces:
+            start, end = piece.get_base().coords[:2]
+            low, high = sorted((start[axis], end[axis]))
+            # Boundaries strictly between the endpoints cross the piece
+            first = math.floor((low - origin) / tile_size) + 1
+            last = math.ceil((high - origin) / tile_size) - 1
+            for boundary in range(first, last + 1):
+                position = origin + boundary * tile_size
+                if axis == 0:
+                    splitter = LineWrapper(LineString([(position, 0), (position, 1)]))
+                else:
+                    splitter = LineWrapper(LineString([(0, position), (1, position)]))
+                first_half, piece = piece.split(splitter)
+                # Order the halves so the piece still to be cut is always the one further along the axis
+                if first_half.get_base().coords[0][axis] > piece.get_base().coords[0][axis]:
+                    first_half, piece = piece, first_half
+                cut_pieces.append(first_half)
+            cut_pieces.append(piece)
+        pieces = cut_pieces
+    return pieces
+
+
+def _get_tile_key(line: Partitionable, minx: float, miny: float, tile_size: float,
+                  columns: int, rows: int) -> TileKey:
+    """
+    :param line: line lying within a single tile
+    :param minx: left edge of the first column of tiles
+    :param miny: top edge of the first row of tiles
+    :param tile_size: width and height of a tile
+    :param columns: number of columns of tiles
+    :param rows: number of rows of tiles
+    :return: column and row of the tile containing line
+    """
+    (sx, sy), (ex, ey) = line.get_base().coords[:2]
+    column = math.floor(((sx + ex) / 2 - minx) / tile_size)
+    row = math.floor(((sy + ey) / 2 - miny) / tile_size)
+    return min(max(column, 0), columns - 1), min(max(row, 0), rows - 1)
+
+
+def _spill(buffered: Dict[TileKey, List[Partitionable]], directory: str) -> None:
+    """
+    Appends the buffered pieces of every tile to that tile's pieces file, and empties the buffer.
+
+    :param buffered: pieces waiting to be written, by tile
+    :param directory: directory the pieces files are written to
+    :return: None
+    """
+    for key, pieces in buffered.items():
+        with open(os.path.join(directory, "pieces_{}_{}.pieces".format(*key)), "ab") as file:
+            pickle.dump(pieces, file, protocol=pickle.HIGHEST_PROTOCOL)
+    buffered.clear()
+
+
+def _read_pieces(path: str) -> List[Partitionable]:
+    """
+    :param path: pieces file of a tile
+    :return: every piece appended to the file
+    """
+    pieces = []
+    with open(path, "rb") as file:
+        while True:
+            try:
+                pieces.extend(pickle.load(file))
+            except EOFError:
+                return pieces
@@ -0,0 +1,178 @@
+import json
+import os
+import queue
+import threading
+from typing import Dict, Generator, List, Optional, Set
+
+from shapely.geometry import box, Point
+
+from sptree.extents import Extent
+from sptree.partitionable import Partitionable
+from sptree.sp_tree import SPTree
+from tiling.tile_builder import INDEX_FILE, TileKey, get_tile_file_name
+
+
+class TiledScene:
+    """
+    A scene cut into square tiles, each with its own SPTree stored on disk by build_tiles.
+    Only the tiles around the camera are kept in memory. They're loaded and evicted by a background thread
+    as the camera moves, so the scene can be much larger than the available memory.
+    """
+
+    def __init__(self, directory: str, load_radius: int = 2) -> None:
+        """
+        :param directory: directory written by build_tiles
+        :param load_radius: number of tiles around the camera's tile to keep loaded
+        """
+        with open(os.path.join(directory, INDEX_FILE)) as file:
+            index = json.load(file)
+        self.directory = directory
+        self.bounding_box = box(*index["bounding_box"])
+        self.tile_size = index["tile_size"]
+        self.columns = index["columns"]
+        self.rows = index["rows"]
+        self.load_radius = load_radius
+        self._stored_tiles: Set[TileKey] = set(map(tuple, index["tiles"]))  # Non-empty tiles
+        self._loaded_tiles: Dict[TileKey, SPTree] = {}
+        self._requested_tiles: Set[TileKey] = set()  # Tiles queued to be loaded
+        self._camera_tile: Optional[TileKey] = None
+        self._tiles_changed = False  # Whether tiles were loaded or evicted since the last check
+        self._lock = threading.Lock()
+        self._load_queue: queue.Queue = queue.Queue()
+        self._loader = threading.Thread(target=self._load_tiles, daemon=True)
+        self._loader.start()
+
+    def painters_alg(self, point: Point, rect: Optional[Extent] = None) -> Generator[List[Partitionable], None, None]:
+        """
+        Applies painter's algorithm to the loaded tiles around point.
+        Tiles are visited from back to front, and each tile's SPTree is drawn with its own painter's algorithm.
+
+        :param point: camera location
+        :param rect: minimum x, minimum y, maximum x and maximum y of the area being drawn, None to draw every line
+        :return: generator for Painter's Algorithm
+        """
+        self.update_camera_location(point)
+        camera_column, camera_row = self._get_tile_key(point)
+        with self._lock:
+            tiles = list(self._loaded_tiles.items())
+        # Tiles in other columns are separated from the camera by vertical tile boundaries, and tiles in the same
+        # column by horizontal tile boundaries, so drawing further columns and then further rows first is back to front
+        tiles.sort(key=lambda tile: (-abs(tile[0][0] - camera_column), -abs(tile[0][1] - camera_row)))
+        for _, sptree in tiles:
+            yield from sptree.painters_alg(point, rect=rect)
+
+    def segment_blocked(self, start: Point, end: Point) -> bool:
+        """
+        Only lines in loaded tiles are considered, which always include the tiles around the camera.
+
+        :param start: start of the segment
+        :param end: end of the segment
+        :return: whether any line crosses or touches the segment, other than at start
+        """
+        with self._lock:
+            sptrees = list(self._loaded_tiles.values())
+        return any(sptree.segment_blocked(start, end) for sptree in sptrees)
+
+    def lines_in_rect(self, minx: float, miny: float, maxx: float, maxy: float) -> List[Partitionable]:
+        """
+        Only lines in loaded tiles are found, which always include the tiles around the camera.
+
+        :param minx: minimum x of the rectangle
+        :param miny: minimum y of the rectangle
+        :param maxx: maximum x of the rectangle
+        :param maxy: maximum y of the rectangle
+        :return: lines whose bounding boxes overlap the rectangle, in no particular order
+        """
+        with self._lock:
+            sptrees = list(self._loaded_tiles.values())
+        return [line for sptree in sptrees for line in sptree.lines_in_rect(minx, miny, maxx, maxy)]
+
+    def update_camera_location(self, point: Point) -> None:
+        """
+        Queues the tiles around point to be loaded and evicts tiles that are out of range.
+        Loading happens in the background, so this never waits on the disk.
+
+        :param point: camera location
+        :return: None
+        """
+        camera_tile = self._get_tile_key(point)
+        if camera_tile == self._camera_tile:
+            return
+
+        nearby_tiles = self._get_nearby_tiles(camera_tile, self.load_radius)
+        with self._lock:
+            self._camera_tile = camera_tile
+            # Tiles are kept one tile beyond the load radius so moving back and forth over a boundary doesn't thrash
+            kept_tiles = self._get_nearby_tiles(camera_tile, self.load_radius + 1)
+            for key in list(self._loaded_tiles):
+                if key not in kept_tiles:
+                    del self._loaded_tiles[key]
+                    self._tiles_changed = True
+            # Load the closest tiles first
+            missing_tiles = sorted(nearby_tiles - self._loaded_tiles.keys() - self._requested_tiles,
+                                   key=lambda key: max(abs(key[0] - camera_tile[0]), abs(key[1] - camera_tile[1])))
+            self._requested_tiles.update(missing_tiles)
+        for key in missing_tiles:
+            self._load_queue.put(key)
+
+    def has_new_tiles(self) -> bool:
+        """
+        :return: whether tiles were loaded or evicted since the last call, meaning the scene should be redrawn
+        """
+        with self._lock:
+            tiles_changed = self._tiles_changed
+            self._tiles_changed = False
+        return tiles_changed
+
+    def close(self) -> None:
+        """
+        Stops the background loader.
+
+        :return: None
+        """
+        self._load_queue.put(None)
+        self._loader.join()
+
+    def _load_tiles(self) -> None:
+        """
+        Loads queued tiles from disk until a None is queued.
+
+        :return: None
+        """
+        while True:
+            key = self._load_queue.get()
+            if key is None:
+                return
+            with self._lock:
+                camera_tile = self._camera_tile
+            # Skip tiles the camera moved away from while they were queued
+            if key in self._get_nearby_tiles(camera_tile, self.load_radius + 1):
+                sptree = SPTree.load(os.path.join(self.directory, get_tile_file_name(key)))
+            else:
+                sptree = None
+            with self._lock:
+                self._requested_tiles.discard(key)
+                if sptree is not None:
+                    self._loaded_tiles[key] = sptree
+                    self._tiles_changed = True
+
+    def _get_tile_key(self, point: Point) -> TileKey:
+        """
+        :param point: location in the scene
+        :return: column and row of the tile containing point, clamped to the scene's tiles
+        """
+        minx, miny, _, _ = self.bounding_box.bounds
+        column = int((point.x - minx) // self.tile_size)
+        row = int((point.y - miny) // self.tile_size)
+        return min(max(column, 0), self.columns - 1), min(max(row, 0), self.rows - 1)
+
+    def _get_nearby_tiles(self, center: TileKey, radius: int) -> Set[TileKey]:
+        """
+        :param center: column and row of the central tile
+        :param radius: number of tiles around center being included
+        :return: the stored tiles within radius of center
+        """
+        return {(column, row)
+                for column in range(center[0] - radius, center[0] + radius + 1)
+                for row in range(center[1] - radius, center[1] + radius + 1)
+                if (column, row) in self._stored_tiles}
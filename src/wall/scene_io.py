@@ -0,0 +1,83 @@
+import json
+import random
+from typing import List, Tuple
+
+from shapely.geometry import box, LineString
+
+from wall.wall import Wall
+from wall.wall_creator import create_walls
+
+
+def save_scene(walls: List[Wall], bounding_box: box, path: str) -> None:
+    """
+    Writes the walls of a scene and their bounding box to a JSON file.
+
+    :param walls: walls of the scene
+    :param bounding_box: bounding box for all walls
+    :param path: file being written
+    :return: None
+    """
+    scene = {
+        "bounding_box": list(bounding_box.bounds),
+        "walls": [wall_to_dict(wall) for wall in walls]
+    }
+    with open(path, "w") as file:
+        json.dump(scene, file)
+
+
+def load_scene(path: str) -> Tuple[List[Wall], box]:
+    """
+    Reads a scene written by save_scene.
+
+    :param path: file being read
+    :return: walls of the scene and their bounding box
+    """
+    with open(path) as file:
+        scene = json.load(file)
+    return [wall_from_dict(wall) for wall in scene["walls"]], box(*scene["bounding_box"])
+
+
+def wall_to_dict(wall: Wall) -> dict:
+    """
+    :param wall: wall being described
+    :return: JSON serializable description of wall, as stored in scene files
+    """
+    return {"base": [list(coord) for coord in wall.get_base().coords],
+            "height": wall.get_height(),
+            "node_color": list(wall.node_color),
+            "edge_color": list(wall.edge_color),
+            "wall_color": list(wall.wall_color),
+            "double_sided": wall.is_double_sided(),
+            "base_height": wall.get_base_height()}
+
+
+def wall_from_dict(description: dict) -> Wall:
+    """
+    :param description: description of a wall written by wall_to_dict
+    :return: the described wall
+    """
+    return Wall(LineString(description["base"]), description["height"], tuple(description["node_color"]),
+                tuple(description["edge_color"]), tuple(description["wall_color"]),
+                description.get("double_sided", True), description.get("base_height", 0))
+
+
+def create_scene(description: dict) -> Tuple[List[Wall], box]:
+    """
+    Creates the walls of a scene from a JSON serializable description of where they come from.
+    A description either names a JSON scene file under "scene", or gives the "width", "height", "num_walls",
+    "min_wall_height" and "max_wall_height" of randomly generated walls. Generated walls are the same every time
+    when the description includes a "seed". A description with more than one "levels" stacks that many levels of
+    generated walls, each standing on top of the tallest walls the one below could have.
+
+    :param description: description of the scene
+    :return: walls of the scene and their bounding box
+    """
+    if description.get("scene") is not None:
+        return load_scene(description["scene"])
+    b_box = box(0, 0, description["width"], description["height"])
+    rng = random.Random(description.get("seed"))
+    walls = []
+    for level in range(description.get("levels", 1)):
+        walls += create_walls(b_box, description["num_walls"], description["min_wall_height"],
+                              description["max_wall_height"], rng, level * description["max_wall_height"])
+    return walls, b_box
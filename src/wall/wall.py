@@ -1,10 +1,11 @@
+import copy
 from typing import Tuple, Generator
 
 import numpy as np
 from shapely.geometry import LineString
-from shapely.ops import split
 
 from sptree.partitionable import Partitionable
+from sptree.predicates import Coord2D, line_intersection
 
 Color = Tuple[int, int, int]
 
@@ -13,31 +14,37 @@ class Wall(Partitionable):
     """
     A 3D rectangular wall defined by four corner nodes.
     The edges and nodes can have a different color from the wall itself.
+    Walls stand on the ground unless given a base height, such as walls on an upper level of a building.
     """
 
-    def __init__(self, base: LineString, height: int, node_color: Color, edge_color: Color, wall_color: Color) -> None:
-        self._base = base
+    def __init__(self, base: LineString, height: int, node_color: Color, edge_color: Color, wall_color: Color,
+                 double_sided: bool = True, base_height: float = 0) -> None:
+        self._base = base  # None for a piece until its base is first needed
         self._height = height
-        self.nodes = Wall._create_nodes(base, height)
+        self._double_sided = double_sided  # One-sided walls can only be seen from in front of them
+        self._base_height = base_height  # Height of the bottom of the wall above the ground
+        start, end = base.coords
+        self.nodes = Wall._create_nodes(start, end, height, base_height)
         self.node_color = node_color
         self.edge_color = edge_color
         self.wall_color = wall_color
+        self._source = self  # Unsplit wall this wall was split from
 
     @staticmethod
-    def _create_nodes(base: LineString, height: int) -> np.ndarray:
+    def _create_nodes(start: Coord2D, end: Coord2D, height: int, base_height: float) -> np.ndarray:
         """
         Create the corner nodes of the wall.
-        :param base: line parallel to the ground
+        :param start: start of the line parallel to the ground
+        :param end: end of the line parallel to the ground
         :param height: height of the wall
+        :param base_height: height of the bottom of the wall above the ground
         :return: array of corner nodes
         """
-        start, end = tuple(base.coords)
-        nodes = np.empty([0, 4])
-        nodes = np.vstack((nodes, np.array([start[0], 0, start[1], 1])))
-        nodes = np.vstack((nodes, np.array([end[0], 0, end[1], 1])))
-        nodes = np.vstack((nodes, np.array([end[0], height, end[1], 1])))
-        nodes = np.vstack((nodes, np.array([start[0], height, start[1], 1])))
-        return nodes
+        top = base_height + height
+        return np.array([[start[0], base_height, start[1], 1],
+                         [end[0], base_height, end[1], 1],
+                         [end[0], top, end[1], 1],
+                         [start[0], top, start[1], 1]], dtype=np.float64)
 
     def get_edges(self) -> Generator[Tuple[np.ndarray, np.ndarray], None, None]:
         """
@@ -56,9 +63,54 @@ class Wall(Partitionable):
         return
 
     def split(self, part: Partitionable) -> Tuple[Partitionable, Partitionable]:
-        first_half, second_half = split(self._base, part.get_base())
-        return Wall(LineString(first_half.coords), self._height, self.node_color, (255, 255, 255), self.wall_color), \
-               Wall(LineString(second_half.coords), self._height, self.node_color, (255, 255, 255), self.wall_color)
+        (sx, sy), (ex, ey) = self.get_base().coords
+        (ax, ay), (bx, by) = part.get_base().coords
+        split_point = line_intersection(sx, sy, ex, ey, ax, ay, bx, by)
+        first_half = Wall(LineString([(sx, sy), split_point]), self._height, self.node_color, (255, 255, 255),
+                          self.wall_color, self._double_sided, self._base_height)
+        second_half = Wall(LineString([split_point, (ex, ey)]), self._height, self.node_color, (255, 255, 255),
+                           self.wall_color, self._double_sided, self._base_height)
+        first_half._source = second_half._source = self._source
+        return first_half, second_half
+
+    def create_piece(self, start: Coord2D, end: Coord2D) -> Partitionable:
+        # Pieces of moving walls are created every frame, so their bases are left until something asks for them
+        piece = copy.copy(self)
+        piece._base = None
+        piece.nodes = Wall._create_nodes(start, end, self._height, self._base_height)
+        piece.edge_color = (255, 255, 255)
+        return piece
+
+    def join(self, other: Partitionable) -> Partitionable:
+        start = self.get_base().coords[0]
+        end = other.get_base().coords[-1]
+        # Joining every piece back together gives back the original wall, edge color and all
+        if (start, end) == tuple(self._source.get_base().coords):
+            return self._source
+        joined = Wall(LineString([start, end]), self._height, self.node_color, (255, 255, 255), self.wall_color,
+                      self._double_sided, self._base_height)
+        joined._source = self._source
+        return joined
 
     def get_base(self) -> LineString:
+        if self._base is None:
+            self._base = LineString([(self.nodes[0, 0], self.nodes[0, 2]), (self.nodes[1, 0], self.nodes[1, 2])])
         return self._base
+
+    def is_double_sided(self) -> bool:
+        return self._double_sided
+
+    def get_source(self) -> Partitionable:
+        return self._source
+
+    def get_height(self) -> int:
+        """
+        :return: height of the wall
+        """
+        return self._height
+
+    def get_base_height(self) -> float:
+        """
+        :return: height of the bottom of the wall above the ground
+        """
+        return self._base_height
@@ -1,5 +1,5 @@
-from random import randint
-from typing import List, Tuple
+import random
+from typing import List, Optional, Tuple
 
 from shapely.geometry import LineString
 from shapely.geometry import box
@@ -10,7 +10,8 @@ WHITE = (255, 255, 255)
 Color = Tuple[int, int, int]
 
 
-def create_walls(bounding_box: box, num_walls: int, min_height: int, max_height: int) -> List[Wall]:
+def create_walls(bounding_box: box, num_walls: int, min_height: int, max_height: int,
+                 rng: Optional[random.Random] = None, base_height: float = 0) -> List[Wall]:
     """
     Creates a list of non-intersecting walls that fall within a defined bounding box.
     Walls will be of random colors.
@@ -19,21 +20,25 @@ def create_walls(bounding_box: box, num_walls: int, min_height: int, max_height:
     :param num_walls: number of walls to create
     :param min_height: minimum height of the walls
     :param max_height: maximum height of the walls
+    :param rng: source of randomness, seeded to create the same walls every time
+    :param base_height: height of the bottom of the walls above the ground
     :return: list of non-intersecting walls within bounding_box
     """
+    rng = random.Random() if rng is None else rng
     lines = []
     for i in range(num_walls):
         # Continue generating random lines until one doesn't intersect with any existing lines
         while True:
-            start_point = _get_rand_point(bounding_box)
-            end_point = _get_rand_point(bounding_box)
+            start_point = _get_rand_point(bounding_box, rng)
+            end_point = _get_rand_point(bounding_box, rng)
             if start_point != end_point:
                 line = LineString([start_point, end_point])
                 if _is_invalid_line(line, lines):
                     continue
                 lines.append(line)
                 break
-    return list(map(lambda x: Wall(x, randint(min_height, max_height), WHITE, WHITE, _get_rand_color()), lines))
+    return list(map(lambda x: Wall(x, rng.randint(min_height, max_height), WHITE, WHITE, _get_rand_color(rng),
+                                   base_height=base_height), lines))
 
 
 def _is_invalid_line(new_line: LineString, lines: List[LineString]) -> bool:
@@ -51,19 +56,21 @@ def _is_invalid_line(new_line: LineString, lines: List[LineString]) -> bool:
     return False
 
 
-def _get_rand_point(bounding_box: box) -> Tuple[int, int]:
+def _get_rand_point(bounding_box: box, rng: random.Random) -> Tuple[int, int]:
     """
     Creates a random point contained within bounding_box.
 
     :param bounding_box: boundary for created point
+    :param rng: source of randomness
     :return: random point in bounding_box
     """
     minx, miny, maxx, maxy = bounding_box.bounds
-    return randint(minx, maxx), randint(miny, maxy)
+    return rng.randint(minx, maxx), rng.randint(miny, maxy)
 
 
-def _get_rand_color() -> Color:
+def _get_rand_color(rng: random.Random) -> Color:
     """
+    :param rng: source of randomness
     :return: random rgb color
     """
-    return randint(0, 255), randint(0, 255), randint(0, 255)
+    return rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)
@@ -0,0 +1,30 @@
+import os
+import random
+import sys
+
+import pytest
+from shapely.geometry import box
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from wall.wall import Wall  # noqa: E402
+from wall.wall_creator import create_walls  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def scene():
+    """
+    :return: 150 generated walls and their bounding box
+    """
+    bounding_box = box(0, 0, 1000, 1000)
+    return create_walls(bounding_box, 150, 10, 60, random.Random(1)), bounding_box
+
+
+@pytest.fixture(scope="session")
+def one_sided_scene(scene):
+    """
+    :return: the walls of scene, every other one made one-sided, and their bounding box
+    """
+    walls, bounding_box = scene
+    return [Wall(wall.get_base(), wall.get_height(), wall.node_color, wall.edge_color, wall.wall_color, i % 2 == 0)
+            for i, wall in enumerate(walls)], bounding_box
@@ -0,0 +1,42 @@
+import math
+import random
+from typing import List
+
+import numpy as np
+
+from sptree.partitionable import Partitionable
+
+
+def count_order_violations(walls: List[Partitionable], x: float, y: float, rng: random.Random,
+                           num_rays: int = 100) -> int:
+    """
+    Casts rays from a camera location, and checks that the nearest wall each ray hits is drawn after every other wall
+    it hits, so it's the one left on screen.
+
+    :param walls: walls in the order they're drawn
+    :param x: x coordinate of the camera location
+    :param y: y coordinate of the camera location
+    :param rng: source of the rays' directions
+    :param num_rays: number of rays cast
+    :return: number of rays whose nearest wall is drawn before a further one
+    """
+    if len(walls) == 0:
+        return 0
+    sx, sy, ex, ey = np.array([wall.get_base().coords[:] for wall in walls], dtype=np.float64).reshape(-1, 4).T
+    ux, uy = ex - sx, ey - sy
+    violations = 0
+    for _ in range(num_rays):
+        angle = rng.uniform(0, 2 * math.pi)
+        dx, dy = math.cos(angle), math.sin(angle)
+        denominator = dx * uy - dy * ux
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = ((sx - x) * uy - (sy - y) * ux) / denominator
+            u = ((sx - x) * dy - (sy - y) * dx) / denominator
+        hit = np.flatnonzero((np.abs(denominator) > 1e-12) & (t > 1e-9) & (u > 1e-9) & (u < 1 - 1e-9))
+        if len(hit) < 2:
+            continue
+        nearest = hit[np.argmin(t[hit])]
+        last = hit.max()
+        if nearest != last and abs(t[nearest] - t[last]) > 1e-7:
+            violations += 1
+    return violations
@@ -0,0 +1,82 @@
+import multiprocessing
+import os
+import random
+import time
+
+import pytest
+from shapely.geometry import Point
+
+from engines import background_build_engine
+from engines.background_build_engine import BackgroundBuildEngine
+from engines.depth_sort_engine import DepthSortEngine
+from sptree.sp_tree import SPTree
+
+
+def _wait_for_build(engine):
+    deadline = time.monotonic() + 60
+    while engine.is_building():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def _draw_order(engine, x, y):
+    """
+    :return: coordinates of the walls in the order they're drawn, as the tree's walls are copies sent between
+        processes
+    """
+    return [line.get_base().coords[:] for lines in engine.painters_alg(Point(x, y)) for line in lines]
+
+
+def _camera_locations():
+    rng = random.Random(4)
+    return [(rng.uniform(0, 1000), rng.uniform(0, 1000)) for _ in range(10)]
+
+
+def test_depth_sorting_switches_to_the_built_tree(one_sided_scene):
+    walls, bounding_box = one_sided_scene
+    engine = BackgroundBuildEngine(walls, bounding_box, random.Random(3))
+    try:
+        assert engine.is_building()
+        assert engine.get_status().startswith("Building tree")
+        depth_sorted = DepthSortEngine(walls, bounding_box)
+        assert _draw_order(engine, 500, 500) == _draw_order(depth_sorted, 500, 500)
+
+        _wait_for_build(engine)
+        assert engine.get_status().startswith("Built tree")
+        assert engine.has_new_walls()
+        assert not engine.has_new_walls()
+        sptree = SPTree(walls, bounding_box, lazy=True, rng=random.Random(3))
+        sptree.build_remaining()
+        for x, y in _camera_locations():
+            assert _draw_order(engine, x, y) == [line.get_base().coords[:] for lines in sptree.painters_alg(Point(x, y))
+                                                 for line in lines]
+    finally:
+        engine.close()
+
+
+def _fail(*args, **kwargs):
+    raise ValueError("no room")
+
+
+def _exit(*args, **kwargs):
+    os._exit(1)
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                    reason="the build process only builds with the replacement when it's forked")
+@pytest.mark.parametrize("build, status", [(_fail, "Tree build failed: no room, depth sorting"),
+                                           (_exit, "Tree build failed: build process exited, depth sorting")],
+                         ids=["error", "exit"])
+def test_failed_builds_keep_depth_sorting(monkeypatch, one_sided_scene, build, status):
+    walls, bounding_box = one_sided_scene
+    monkeypatch.setattr(background_build_engine, "SPTree", build)
+    engine = BackgroundBuildEngine(walls, bounding_box, random.Random(3))
+    try:
+        _wait_for_build(engine)
+        assert engine.get_status() == status
+        assert not engine.has_new_walls()
+        depth_sorted = DepthSortEngine(walls, bounding_box)
+        for x, y in _camera_locations():
+            assert _draw_order(engine, x, y) == _draw_order(depth_sorted, x, y)
+    finally:
+        engine.close()
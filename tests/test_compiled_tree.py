@@ -0,0 +1,84 @@
+import random
+
+import numpy as np
+import pytest
+from shapely.geometry import Point
+
+from sptree.compiled_tree import CompiledTree
+from sptree.sp_tree import SPTree
+
+
+@pytest.fixture(scope="module")
+def sptree(one_sided_scene):
+    walls, bounding_box = one_sided_scene
+    return SPTree(walls, bounding_box, lazy=True, rng=random.Random(2))
+
+
+@pytest.fixture(scope="module")
+def compiled_tree(sptree):
+    return CompiledTree.compile(sptree)
+
+
+def _camera_locations(compiled_tree):
+    """
+    :return: random camera locations, and locations on splitting lines, where nodes aren't drawn
+    """
+    rng = random.Random(3)
+    return [(rng.uniform(0, 1000), rng.uniform(0, 1000)) for _ in range(50)] + \
+        [(ax, ay) for ax, ay, _, _ in compiled_tree.planes[:10].tolist()]
+
+
+def _compiled_order(compiled_tree, x, y):
+    return [tuple(base) for base in compiled_tree.wall_bases[compiled_tree.painters_order(x, y)].tolist()]
+
+
+def test_painters_order_matches_painters_alg(sptree, compiled_tree):
+    for x, y in _camera_locations(compiled_tree):
+        expected = [sum(line.get_base().coords[:], ()) for lines in sptree.painters_alg(Point(x, y)) for line in lines]
+        assert _compiled_order(compiled_tree, x, y) == expected
+
+
+def test_compiled_walls_keep_their_looks(one_sided_scene, compiled_tree):
+    walls, _ = one_sided_scene
+    looks = {(wall.get_height(), wall.node_color, wall.edge_color, wall.wall_color) for wall in walls}
+    for height, colors in zip(compiled_tree.wall_heights.tolist(), compiled_tree.wall_colors.tolist()):
+        assert (height, *map(tuple, colors)) in looks
+    assert {-1, 0} <= set(compiled_tree.wall_facings.tolist())
+    assert not compiled_tree.wall_base_heights.any()
+
+
+def _assert_same_tree(tree, other):
+    for name in ("planes", "children", "line_offsets", "wall_bases", "wall_heights", "wall_colors", "wall_facings",
+                 "wall_base_heights"):
+        assert np.array_equal(getattr(tree, name), getattr(other, name))
+        assert getattr(tree, name).dtype == getattr(other, name).dtype
+    for x, y in _camera_locations(tree):
+        assert np.array_equal(tree.painters_order(x, y), other.painters_order(x, y))
+
+
+def test_trees_survive_shared_memory(compiled_tree):
+    handle, blocks = compiled_tree.to_shared_memory()
+    try:
+        attached, attached_blocks = CompiledTree.from_shared_memory(handle)
+        try:
+            _assert_same_tree(compiled_tree, attached)
+            del attached
+        finally:
+            for block in attached_blocks:
+                block.close()
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def test_trees_survive_saving(compiled_tree, tmp_path):
+    path = str(tmp_path / "tree.npz")
+    compiled_tree.save(path)
+    _assert_same_tree(compiled_tree, CompiledTree.load(path))
+
+
+def test_empty_trees_draw_nothing(scene):
+    _, bounding_box = scene
+    compiled_tree = CompiledTree.compile(SPTree([], bounding_box))
+    assert len(compiled_tree.painters_order(500, 500)) == 0
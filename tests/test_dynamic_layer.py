@@ -0,0 +1,90 @@
+import math
+import random
+
+import pytest
+from shapely.geometry import LineString, Point
+
+from order_check import count_order_violations
+from sptree.dynamic_layer import DynamicLayer
+from sptree.sp_tree import SPTree
+from wall.wall import Wall
+
+
+def _create_mover(rng: random.Random, double_sided: bool) -> Wall:
+    x, y, angle = rng.uniform(100, 900), rng.uniform(100, 900), rng.uniform(0, 2 * math.pi)
+    return Wall(LineString([(x, y), (x + 40 * math.cos(angle), y + 40 * math.sin(angle))]), 50,
+                (255, 255, 255), (255, 255, 255), (200, 0, 0), double_sided)
+
+
+def _shift(wall: Wall, dx: float, dy: float) -> Wall:
+    (sx, sy), (ex, ey) = wall.get_base().coords
+    return Wall(LineString([(sx + dx, sy + dy), (ex + dx, ey + dy)]), wall.get_height(), wall.node_color,
+                wall.edge_color, wall.wall_color, wall.is_double_sided())
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_orders_stay_valid_while_lines_move(scene, lazy):
+    walls, bounding_box = scene
+    sptree = SPTree(walls, bounding_box, lazy, random.Random(2))
+    layer = DynamicLayer(sptree)
+    rng = random.Random(3)
+    movers = [_create_mover(rng, True) for _ in range(60)]
+    handles = [layer.add(mover) for mover in movers]
+
+    for _ in range(10):
+        # Small steps keep most lines in the cells they were in, and move the rest into new ones. Only some lines
+        # move at a time, so cells whose other lines stay put keep their trees
+        for i in rng.sample(range(len(movers)), len(movers) // 3):
+            movers[i] = _shift(movers[i], rng.uniform(-3, 3), rng.uniform(-3, 3))
+            layer.move(handles[i], movers[i])
+        for _ in range(5):
+            x, y = rng.uniform(0, 1000), rng.uniform(0, 1000)
+            order = [line for lines in sptree.painters_alg(Point(x, y), layer) for line in lines]
+            assert count_order_violations(order, x, y, rng) == 0
+
+            # Every moving line is drawn in full, split into pieces wherever the tree's lines cross it
+            drawn_lengths = {}
+            for line in order:
+                drawn_lengths[line.get_source()] = drawn_lengths.get(line.get_source(), 0) + line.get_base().length
+            for mover in movers:
+                assert drawn_lengths[mover] == pytest.approx(mover.get_base().length)
+
+
+def test_one_sided_lines_are_culled_and_removed_lines_are_not_drawn(scene):
+    walls, bounding_box = scene
+    sptree = SPTree(walls, bounding_box, rng=random.Random(2))
+    layer = DynamicLayer(sptree)
+    rng = random.Random(4)
+    movers = [_create_mover(rng, False) for _ in range(40)]
+    handles = [layer.add(mover) for mover in movers]
+    for handle in handles[::2]:
+        layer.remove(handle)
+
+    for _ in range(20):
+        x, y = rng.uniform(0, 1000), rng.uniform(0, 1000)
+        for lines in sptree.painters_alg(Point(x, y), layer):
+            for line in lines:
+                if line.get_source() in movers:
+                    assert movers.index(line.get_source()) % 2 == 1
+                    (sx, sy), (ex, ey) = line.get_base().coords
+                    assert (ex - sx) * (y - sy) - (ey - sy) * (x - sx) <= 0
+
+
+def test_lines_moving_within_a_cell_are_reordered(scene):
+    _, bounding_box = scene
+    layer = DynamicLayer(SPTree([], bounding_box))
+    front = Wall(LineString([(400, 500), (600, 500)]), 50, (255, 255, 255), (255, 255, 255), (200, 0, 0))
+    layer.add(front)
+    mover = _shift(front, 0, 20)
+    handle = layer.add(mover)
+    camera = Point(500, 900)
+
+    def draw_order():
+        return [line.get_source() for lines in layer.cell_painters_alg(None, 0, camera.x, camera.y) for line in lines]
+
+    assert draw_order() == [front, mover]
+    # Moving without crossing the other line keeps the order, and crossing it swaps them
+    for dy, mover_is_nearer in ((10, True), (-40, False), (-10, False), (60, True)):
+        mover = _shift(mover, 0, dy)
+        layer.move(handle, mover)
+        assert draw_order() == ([front, mover] if mover_is_nearer else [mover, front])
@@ -0,0 +1,120 @@
+import random
+
+import numpy as np
+import pytest
+from shapely.geometry import box, LineString, Point
+
+from engines import engine_selection
+from engines.bsp_engine import BSPEngine
+from engines.depth_sort_engine import DepthSortEngine
+from engines.engine_selection import DEPTH_SORT_MAX_WALLS, EngineCosts, measure_costs, select_engine
+from sptree.sp_tree import Perspective, SPTree
+
+
+@pytest.fixture
+def created_trees(monkeypatch):
+    """
+    Records whether each tree select_engine builds is lazy, and stands in for building trees in another process.
+
+    :return: laziness of every tree built, in order
+    """
+    created = []
+
+    def create_sptree(walls, bounding_box, lazy, rng):
+        created.append(lazy)
+        return SPTree(walls, bounding_box, lazy, rng)
+
+    monkeypatch.setattr(engine_selection, "SPTree", create_sptree)
+    monkeypatch.setattr(engine_selection, "BackgroundBuildEngine", lambda walls, bounding_box, rng: "background")
+    return created
+
+
+def _select_engine(monkeypatch, scene, costs, lazy=False):
+    walls, bounding_box = scene
+    monkeypatch.setattr(engine_selection, "measure_costs", lambda *args: costs)
+    return select_engine(walls, bounding_box, lazy, random.Random(1))
+
+
+def test_tiny_scenes_are_depth_sorted_without_measuring(monkeypatch, scene, created_trees):
+    walls, bounding_box = scene
+    monkeypatch.setattr(engine_selection, "measure_costs", None)
+    engine = select_engine(walls[:DEPTH_SORT_MAX_WALLS], bounding_box, rng=random.Random(1))
+    assert isinstance(engine, DepthSortEngine)
+    assert created_trees == []
+
+
+@pytest.mark.parametrize("costs, lazy, expected", [
+    # Quick builds are done right away, unless lazy building is asked for
+    (EngineCosts(0.1, 0.001), False, False),
+    (EngineCosts(0.1, 0.001), True, True),
+    # Slow builds are done in another process while depth sorting stands in, if it's quick enough
+    (EngineCosts(5, 0.001), False, "background"),
+    (EngineCosts(5, 0.1), False, True),
+    (EngineCosts(5, 0.001), True, True),
+])
+def test_larger_scenes_pick_an_engine_from_their_costs(monkeypatch, scene, created_trees, costs, lazy, expected):
+    engine = _select_engine(monkeypatch, scene, costs, lazy)
+    if expected == "background":
+        assert engine == "background"
+        assert created_trees == []
+    else:
+        assert isinstance(engine, BSPEngine)
+        assert created_trees == [expected]
+        engine.sptree.build_remaining()
+
+
+def test_costs_are_measured(scene):
+    walls, bounding_box = scene
+    costs = measure_costs(walls, bounding_box, random.Random(1))
+    assert costs.bsp_build > 0 and costs.depth_sort_query > 0
+
+
+def test_depth_sorting_culls_one_sided_walls_facing_away(one_sided_scene):
+    walls, bounding_box = one_sided_scene
+    engine = DepthSortEngine(walls, bounding_box)
+    rng = random.Random(2)
+    for _ in range(20):
+        point = Point(rng.uniform(0, 1000), rng.uniform(0, 1000))
+        order = [wall for walls_at_depth in engine.painters_alg(point) for wall in walls_at_depth]
+        assert set(order) == {wall for wall in walls
+                              if wall.is_double_sided() or Perspective.classify(point, wall) == Perspective.FRONT}
+        distances = [wall.get_base().centroid.distance(point) for wall in order]
+        assert distances == sorted(distances, reverse=True)
+
+
+def test_depth_sorting_finds_walls_in_a_rect(scene):
+    walls, bounding_box = scene
+    engine = DepthSortEngine(walls, bounding_box)
+    rng = random.Random(3)
+    for _ in range(50):
+        minx, miny = rng.uniform(0, 900), rng.uniform(0, 900)
+        rect = (minx, miny, minx + rng.uniform(0, 200), miny + rng.uniform(0, 200))
+        expected = [wall for wall in walls if box(*wall.get_base().bounds).intersects(box(*rect))]
+        assert engine.lines_in_rect(*rect) == expected
+
+
+def test_depth_sorting_within_a_rect_leaves_out_walls_outside_it(one_sided_scene):
+    walls, bounding_box = one_sided_scene
+    engine = DepthSortEngine(walls, bounding_box)
+    rng = random.Random(5)
+    for _ in range(20):
+        point = Point(rng.uniform(0, 1000), rng.uniform(0, 1000))
+        minx, miny = rng.uniform(0, 900), rng.uniform(0, 900)
+        rect = (minx, miny, minx + rng.uniform(0, 200), miny + rng.uniform(0, 200))
+        full_order = [wall for walls_at_depth in engine.painters_alg(point) for wall in walls_at_depth]
+        order = [wall for walls_at_depth in engine.painters_alg(point, rect) for wall in walls_at_depth]
+        assert order == [wall for wall in full_order if box(*wall.get_base().bounds).intersects(box(*rect))]
+
+
+def test_depth_sorting_blocks_segments_like_brute_force(scene):
+    walls, bounding_box = scene
+    engine = DepthSortEngine(walls, bounding_box)
+    rng = random.Random(4)
+    num_blocked = 0
+    for _ in range(300):
+        start = (rng.uniform(0, 1000), rng.uniform(0, 1000))
+        end = tuple(np.add(start, (rng.uniform(-150, 150), rng.uniform(-150, 150))))
+        blocked = any(LineString([start, end]).intersects(wall.get_base()) for wall in walls)
+        assert engine.segment_blocked(Point(start), Point(end)) == blocked
+        num_blocked += blocked
+    assert 0 < num_blocked < 300
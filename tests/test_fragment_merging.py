@@ -0,0 +1,51 @@
+import random
+
+from shapely.geometry import LineString, Point
+
+from order_check import count_order_violations
+from sptree.sp_tree import SPTree
+from wall.wall import Wall
+
+
+def _draw_order(sptree, x, y):
+    return [line for lines in sptree.painters_alg(Point(x, y)) for line in lines]
+
+
+def test_fresh_trees_have_nothing_to_join(scene):
+    walls, bounding_box = scene
+    sptree = SPTree(walls, bounding_box, rng=random.Random(2))
+    root = sptree.root
+    assert len(_draw_order(sptree, 500, 500)) > len(walls)
+    assert sptree.merge_fragments() == 0
+    assert sptree.root is root
+
+
+def test_pieces_split_by_a_removed_line_are_joined():
+    wall = Wall(LineString([(100, 500), (900, 500)]), 50, (255, 255, 255), (255, 255, 255), (200, 0, 0))
+    splitter = Wall(LineString([(500, 600), (500, 700)]), 50, (255, 255, 255), (255, 255, 255), (0, 0, 200))
+    # Walls added to an existing tree are split by its splitting lines
+    sptree = SPTree([splitter], wall.get_base().envelope.union(splitter.get_base().envelope).envelope,
+                    rng=random.Random(1)).with_lines([wall])
+    assert len(_draw_order(sptree, 300, 100)) == 3
+
+    sptree = sptree.without_lines([splitter])
+    assert sptree.merge_fragments() == 1
+    assert _draw_order(sptree, 300, 100) == [wall]
+
+
+def test_joining_after_removals_keeps_orders_valid(scene):
+    walls, bounding_box = scene
+    rng = random.Random(5)
+    removed = rng.sample(walls, 100)
+    sptree = SPTree(walls, bounding_box, rng=random.Random(2)).without_lines(removed)
+    num_pieces = len(_draw_order(sptree, 500, 500))
+
+    num_merged = sptree.merge_fragments()
+    assert num_merged > 0
+    assert len(_draw_order(sptree, 500, 500)) == num_pieces - num_merged
+    kept = set(walls) - set(removed)
+    for _ in range(25):
+        x, y = rng.uniform(0, 1000), rng.uniform(0, 1000)
+        order = _draw_order(sptree, x, y)
+        assert count_order_violations(order, x, y, rng) == 0
+        assert {line.get_source() for line in order} == kept
@@ -0,0 +1,77 @@
+import math
+import random
+
+import pytest
+from shapely.geometry import box, LineString, Point
+
+from levels.level_stack import Level, LevelStack, VerticalView
+from sptree.sp_tree import SPTree
+from wall.wall import Wall
+from wall.wall_creator import create_walls
+
+BOUNDING_BOX = box(0, 0, 1000, 1000)
+
+
+@pytest.fixture(scope="module")
+def level_walls():
+    """
+    :return: walls of 3 levels, 60 high each, stacked from the ground up
+    """
+    rng = random.Random(1)
+    return [create_walls(BOUNDING_BOX, 30, 60, 60, rng, base_height) for base_height in (0, 60, 120)]
+
+
+@pytest.fixture(scope="module")
+def level_stack(level_walls):
+    # Levels are given out of order
+    walls = level_walls[2] + level_walls[0] + level_walls[1]
+    return LevelStack.from_walls(walls, BOUNDING_BOX, rng=random.Random(2))
+
+
+def test_overlapping_levels_are_rejected():
+    sptree = SPTree([], BOUNDING_BOX)
+    with pytest.raises(ValueError):
+        LevelStack([Level(50, 100, sptree), Level(0, 60, sptree)], BOUNDING_BOX)
+    # Levels may touch
+    stack = LevelStack([Level(60, 120, sptree), Level(0, 60, sptree)], BOUNDING_BOX)
+    assert [level.base_height for level in stack.levels] == [0, 60]
+
+
+def test_levels_out_of_view_are_culled(level_stack):
+    point = Point(500, 500)
+
+    def visible_bases(view):
+        return [level.base_height for level in level_stack.get_visible_levels(point, view)]
+
+    # Looking level from the middle level, rays can't climb or fall 30 units within the scene
+    assert visible_bases(VerticalView(90, -0.01, 0.01)) == [60]
+    # Looking up only
+    assert visible_bases(VerticalView(90, 0.1, 0.5)) == [120, 60]
+    # Looking straight down sees every level below
+    assert visible_bases(VerticalView(150, -math.pi / 2, -0.1)) == [0, 60, 120]
+    assert visible_bases(None) == [120, 60, 0]
+
+
+@pytest.mark.parametrize("height, expected_bases", [(150, [0, 60, 120]), (30, [120, 60, 0]), (100, [0, 120, 60])])
+def test_levels_are_drawn_from_furthest_to_nearest(level_stack, height, expected_bases):
+    view = VerticalView(height, -math.pi / 2, math.pi / 2)
+    assert [level.base_height for level in level_stack.get_visible_levels(Point(500, 500), view)] == expected_bases
+    drawn_bases = [line.get_base_height() for lines in level_stack.painters_alg(Point(500, 500), view)
+                   for line in lines]
+    assert drawn_bases == sorted(drawn_bases, key=expected_bases.index)
+    assert set(drawn_bases) == set(expected_bases)
+
+
+def test_segments_are_only_blocked_by_walls_of_their_own_level():
+    walls = [Wall(LineString([(500, 400), (500, 600)]), 60, (255, 255, 255), (255, 255, 255), (200, 0, 0)),
+             Wall(LineString([(100, 200), (300, 200)]), 60, (255, 255, 255), (255, 255, 255), (200, 0, 0),
+                  base_height=60)]
+    level_stack = LevelStack.from_walls(walls, BOUNDING_BOX, rng=random.Random(3))
+    start, end = Point(400, 500), Point(600, 500)
+    assert level_stack.segment_blocked(start, end, 30)
+    assert not level_stack.segment_blocked(start, end, 90)
+    # Above every level
+    assert not level_stack.segment_blocked(start, end, 200)
+    assert level_stack.segment_blocked(start, end)
+    assert level_stack.segment_blocked(Point(200, 100), Point(200, 300), 60)
+    assert not level_stack.segment_blocked(Point(200, 100), Point(200, 300), 59)
@@ -0,0 +1,64 @@
+import math
+import random
+
+import pytest
+from shapely.geometry import LineString
+
+from sptree.line_groups import group_coincident_lines
+from sptree.line_wrapper import LineWrapper
+
+TOLERANCE = 0.01
+
+
+def _pieces(rng, angle, offset, count, starts=(-500, 400)):
+    """
+    :param rng: source of the pieces' positions
+    :param angle: direction of the infinite line the pieces lie along
+    :param offset: signed distance of the infinite line from the origin
+    :param count: number of pieces
+    :param starts: range the pieces start in, measured along the line
+    :return: pieces of the line, each moved sideways by less than half the tolerance, some of them reversed
+    """
+    dx, dy = math.cos(angle), math.sin(angle)
+    pieces = []
+    for _ in range(count):
+        shift = offset + rng.uniform(-0.45, 0.45) * TOLERANCE
+        start, length = rng.uniform(*starts), rng.uniform(1, 100)
+        coords = [(-dy * shift + dx * t, dx * shift + dy * t) for t in (start, start + length)]
+        pieces.append(LineWrapper(LineString(coords if rng.random() < 0.5 else coords[::-1])))
+    return pieces
+
+
+@pytest.mark.parametrize("angle", [0.3, 1.2, 2.5])
+def test_lines_within_the_tolerance_are_grouped(angle):
+    rng = random.Random(1)
+    on_line = _pieces(rng, angle, 100, 20)
+    # Parallel lines further away than the tolerance, and lines turned far enough for their ends to leave it
+    parallel = _pieces(rng, angle, 100 + 3 * TOLERANCE, 5)
+    turned = _pieces(rng, angle + 4 * TOLERANCE / 100, 100, 5, (100, 400))
+    lines = on_line + parallel + turned
+    rng.shuffle(lines)
+
+    groups = group_coincident_lines(lines, TOLERANCE)
+    assert sorted(id(line) for group in groups for line in group) == sorted(map(id, lines))
+    assert sorted(map(id, on_line)) in [sorted(map(id, group)) for group in groups]
+    for group in groups:
+        assert set(group) <= set(on_line) or set(group).isdisjoint(on_line)
+    # Groups keep the order their first line appears in
+    assert [group[0] for group in groups] == sorted((group[0] for group in groups), key=lines.index)
+
+
+@pytest.mark.parametrize("offset", [0, 250])
+def test_lines_either_side_of_the_angle_wrap_around_are_grouped(offset):
+    rng = random.Random(2)
+    # Directions just above 0 and just below pi are hashed into the first and last angle buckets
+    nearly_horizontal = _pieces(rng, 1e-7, offset, 10) + _pieces(rng, math.pi - 1e-7, -offset, 10)
+    nearly_horizontal += _pieces(rng, -1e-7, offset, 10)
+    apart = _pieces(rng, math.pi - 1e-7, -offset - 3 * TOLERANCE, 5)
+    lines = nearly_horizontal + apart
+    rng.shuffle(lines)
+
+    groups = group_coincident_lines(lines, TOLERANCE)
+    assert sorted(map(id, nearly_horizontal)) in [sorted(map(id, group)) for group in groups]
+    for group in groups:
+        assert set(group) <= set(nearly_horizontal) or set(group).isdisjoint(nearly_horizontal)
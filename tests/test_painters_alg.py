@@ -0,0 +1,106 @@
+import random
+
+import numpy as np
+import pytest
+from shapely.geometry import box, Point
+
+from order_check import count_order_violations
+from sptree.sp_tree import Perspective, SPTree
+
+
+def _camera_locations(bounding_box, count, seed):
+    rng = random.Random(seed)
+    minx, miny, maxx, maxy = bounding_box.bounds
+    return [(rng.uniform(minx, maxx), rng.uniform(miny, maxy)) for _ in range(count)]
+
+
+def _draw_order(sptree, x, y):
+    return [line for coincident_lines in sptree.painters_alg(Point(x, y)) for line in coincident_lines]
+
+
+def _assert_valid_orders(sptree, walls, bounding_box):
+    rng = random.Random(0)
+    for x, y in _camera_locations(bounding_box, 25, 1):
+        order = _draw_order(sptree, x, y)
+        assert count_order_violations(order, x, y, rng) == 0
+        assert {line.get_source() for line in order} <= set(walls)
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_orders_are_valid(scene, lazy):
+    walls, bounding_box = scene
+    sptree = SPTree(walls, bounding_box, lazy, random.Random(2))
+    _assert_valid_orders(sptree, walls, bounding_box)
+    # Double-sided walls are all drawn from everywhere
+    assert {line.get_source() for line in _draw_order(sptree, 500, 500)} == set(walls)
+
+
+def test_one_sided_walls_facing_away_are_culled(one_sided_scene):
+    walls, bounding_box = one_sided_scene
+    sptree = SPTree(walls, bounding_box, rng=random.Random(2))
+    _assert_valid_orders(sptree, walls, bounding_box)
+    for x, y in _camera_locations(bounding_box, 10, 3):
+        for line in _draw_order(sptree, x, y):
+            if not line.is_double_sided():
+                assert Perspective.classify(Point(x, y), line) != Perspective.BACK
+
+
+def test_lazy_trees_are_the_same_whatever_order_nodes_are_built_in(scene):
+    walls, bounding_box = scene
+
+    def shape(node):
+        return None if node is None else (node.plane, shape(node.left), shape(node.right))
+
+    built = SPTree(walls, bounding_box, lazy=True, rng=random.Random(4))
+    built.build_remaining()
+    traversed = SPTree(walls, bounding_box, lazy=True, rng=random.Random(4))
+    for x, y in _camera_locations(bounding_box, 5, 5):
+        _draw_order(traversed, x, y)
+    traversed.build_remaining_in_background().join()
+    assert shape(traversed.root) == shape(built.root)
+
+
+def test_batch_orders_match_sequential_orders(one_sided_scene):
+    walls, bounding_box = one_sided_scene
+    sptree = SPTree(walls, bounding_box, rng=random.Random(2))
+    points = np.array(_camera_locations(bounding_box, 50, 6))
+    lines, orders = sptree.painters_alg_batch(points)
+    for (x, y), order in zip(points, orders):
+        assert [lines[i] for i in order if i >= 0] == _draw_order(sptree, x, y)
+
+
+def test_optimized_trees_stay_valid_everywhere(scene):
+    walls, bounding_box = scene
+    camera_samples = np.random.default_rng(7).uniform(0, 200, (500, 2))
+    sptree = SPTree(walls, bounding_box, rng=random.Random(2)).optimized_for(camera_samples)
+    _assert_valid_orders(sptree, walls, bounding_box)
+
+
+def test_added_and_removed_lines_are_ordered(scene):
+    walls, bounding_box = scene
+    sptree = SPTree(walls[:100], bounding_box, rng=random.Random(2))
+    added = sptree.with_lines(walls[100:])
+    _assert_valid_orders(added, walls, bounding_box)
+    removed = added.without_lines(walls[:50])
+    _assert_valid_orders(removed, walls[50:], bounding_box)
+    assert {line.get_source() for line in _draw_order(removed, 500, 500)} == set(walls[50:])
+    # The trees they were copied from are unchanged
+    assert {line.get_source() for line in _draw_order(sptree, 500, 500)} == set(walls[:100])
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_orders_within_a_rect_keep_every_line_overlapping_it(scene, lazy):
+    walls, bounding_box = scene
+    sptree = SPTree(walls, bounding_box, lazy, random.Random(2))
+    rng = random.Random(8)
+    for x, y in _camera_locations(bounding_box, 10, 9):
+        minx, miny = rng.uniform(0, 800), rng.uniform(0, 800)
+        rect = (minx, miny, minx + rng.uniform(10, 200), miny + rng.uniform(10, 200))
+        order = [line for lines in sptree.painters_alg(Point(x, y), rect=rect) for line in lines]
+        full_order = _draw_order(sptree, x, y)
+        # Lines are left out, never reordered
+        positions = [full_order.index(line) for line in order]
+        assert positions == sorted(positions)
+        overlapping = [line for line in full_order if line.get_base().intersects(box(*rect))]
+        assert set(overlapping) <= set(order)
+        assert len(order) < len(full_order)
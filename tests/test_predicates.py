@@ -0,0 +1,80 @@
+import math
+import random
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+from sptree.predicates import line_intersection, orient, orient_array, orient_lines
+
+
+def _reference_orient(ax, ay, bx, by, cx, cy):
+    det = (Fraction(bx) - Fraction(ax)) * (Fraction(cy) - Fraction(ay)) \
+        - (Fraction(by) - Fraction(ay)) * (Fraction(cx) - Fraction(ax))
+    return (det > 0) - (det < 0)
+
+
+def _float_orient(ax, ay, bx, by, cx, cy):
+    det = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+    return (det > 0) - (det < 0)
+
+
+def _nearly_collinear_cases(scale):
+    """
+    :param scale: size of the lines' coordinates
+    :return: lines and points a few units in the last place away from lying on them, where a float determinant is
+        too small to be trusted
+    """
+    cases = []
+    for ax, ay, bx, by in ((12, 12, 24, 24), (-3, 7, 5, -1), (1, 2, 7, 5), (0.1, 0.3, 0.7, 0.2)):
+        ax, ay, bx, by = ax * scale, ay * scale, bx * scale, by * scale
+        # Points on a grid of the smallest steps around a rounded point on the line
+        px, py = ax - 0.37 * (bx - ax), ay - 0.37 * (by - ay)
+        for i in range(-16, 16):
+            for j in range(-16, 16):
+                cases.append((ax, ay, bx, by, px + i * math.ulp(px), py + j * math.ulp(py)))
+    return cases
+
+
+@pytest.mark.parametrize("scale", [1.0, 1e15])
+def test_orient_matches_exact_arithmetic(scale):
+    cases = _nearly_collinear_cases(scale)
+    expected = [_reference_orient(*args) for args in cases]
+    assert [orient(*args) for args in cases] == expected
+    # The cases are only worth checking if plain floating point gets some of them wrong
+    assert [_float_orient(*args) for args in cases] != expected
+    assert {-1, 0, 1} <= set(expected)
+
+
+@pytest.mark.parametrize("scale", [1.0, 1e15])
+def test_orient_array_matches_orient(scale):
+    cases = _nearly_collinear_cases(scale)
+    lines = {args[:4] for args in cases}
+    for line in lines:
+        points = np.array([args[4:] for args in cases if args[:4] == line])
+        sides = orient_array(*line, points[:, 0], points[:, 1])
+        assert sides.tolist() == [orient(*line, cx, cy) for cx, cy in points]
+
+
+@pytest.mark.parametrize("scale", [1.0, 1e15])
+def test_orient_lines_matches_orient(scale):
+    cases = _nearly_collinear_cases(scale)
+    lines = np.array(sorted({args[:4] for args in cases}))
+    for cx, cy in [args[4:] for args in cases[::7]]:
+        assert orient_lines(lines, cx, cy).tolist() == [orient(*line, cx, cy) for line in lines.tolist()]
+
+
+@pytest.mark.parametrize("scale", [1.0, 1e15])
+def test_line_intersection_lies_on_both_lines(scale):
+    rng = random.Random(2)
+    for ax, ay, bx, by, sx, sy in _nearly_collinear_cases(scale):
+        side = orient(ax, ay, bx, by, sx, sy)
+        if side == 0:
+            continue
+        # Segments from a point barely on one side of the line, to one clearly on the other side
+        distance = rng.uniform(0.1, 10) * side
+        ex, ey = sx + (by - ay) * distance, sy - (bx - ax) * distance
+        assert orient(ax, ay, bx, by, ex, ey) == -side
+        x, y = line_intersection(sx, sy, ex, ey, ax, ay, bx, by)
+        assert min(sx, ex) <= x <= max(sx, ex) and min(sy, ey) <= y <= max(sy, ey)
+        assert x == pytest.approx(sx, rel=1e-13) and y == pytest.approx(sy, rel=1e-13)
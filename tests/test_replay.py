@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from graphics3D.camera.groundcamera import GroundCamera  # noqa: E402
+from graphics3D.renderer import get_camera_location  # noqa: E402
+from replay.camera_trace import EVENT_KEY, EVENT_MOUSE_MOTION, TraceEvent, TraceReader, TraceWriter  # noqa: E402
+from replay.replayer import replay_trace  # noqa: E402
+
+HEADER = {"scene": {"width": 1000, "height": 1000, "num_walls": 100, "min_wall_height": 10, "max_wall_height": 50,
+                    "seed": 5},
+          "screen": [160, 100],
+          "camera": {"focal_length": 1, "canvas_width": 1, "canvas_height": 1}}
+
+
+def _record_walk(path, num_frames):
+    """
+    Records a trace of the camera walking into the scene while turning.
+
+    :param path: trace file being written
+    :param num_frames: number of frames recorded
+    :return: times, camera locations and events of the recorded frames
+    """
+    camera = GroundCamera()
+    camera.coords.translate(-300, -20, 400)
+    writer = TraceWriter(path, HEADER)
+    frames = []
+    for i in range(num_frames):
+        if i % 2 == 0:
+            camera.dolly_forward()
+            events = [TraceEvent(EVENT_KEY, ord("w"), 0, 0)]
+        else:
+            camera.mouse_pan(7)
+            events = [TraceEvent(EVENT_MOUSE_MOTION, 0, 7, -3), TraceEvent(EVENT_KEY, ord("a"), 0, 0)]
+        # Far enough into a session that single precision can't tell frames apart
+        time = 100000 + i / 144
+        writer.write_frame(time, camera.coords.get_basis(), events)
+        location = get_camera_location(camera)
+        frames.append((time, (location.x, location.y), events))
+    writer.close()
+    return frames
+
+
+def test_traces_survive_a_round_trip(tmp_path):
+    path = str(tmp_path / "walk.trace")
+    recorded = _record_walk(path, 20)
+    reader = TraceReader(path)
+    assert reader.header == HEADER
+    frames = list(reader.frames())
+    assert [frame.time for frame in frames] == [time for time, _, _ in recorded]
+    assert len({frame.time for frame in frames}) == len(frames)
+    assert [frame.events for frame in frames] == [events for _, _, events in recorded]
+    # Poses are stored in single precision
+    locations = np.array([location for _, location, _ in recorded])
+    assert reader.camera_locations() == pytest.approx(locations, abs=1e-3)
+
+
+def test_traces_of_other_files_are_rejected(tmp_path):
+    path = tmp_path / "other.trace"
+    path.write_bytes(b"NOTTRACE" + bytes(16))
+    with pytest.raises(ValueError):
+        TraceReader(str(path))
+
+
+def test_replays_draw_the_same_orders(tmp_path):
+    path = str(tmp_path / "walk.trace")
+    _record_walk(path, 12)
+    first = replay_trace(path)
+    second = replay_trace(path)
+    assert len(first) == 12
+    assert all(result.num_walls > 0 for result in first)
+    assert [(result.checksum, result.num_walls) for result in first] == \
+        [(result.checksum, result.num_walls) for result in second]
+    # The camera moves between frames, so the orders aren't all the same
+    assert len({result.checksum for result in first}) > 1
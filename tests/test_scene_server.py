@@ -0,0 +1,103 @@
+import math
+import random
+
+import numpy as np
+import pytest
+from shapely.geometry import LineString, Point
+
+from order_check import count_order_violations
+from service.scene_client import SceneClient, ServiceError
+from service import scene_server as scene_server_module
+from service.scene_server import SceneServer, SceneSnapshot
+from sptree.sp_tree import SPTree
+from wall.wall import Wall
+
+
+@pytest.fixture
+def server():
+    scene_server = SceneServer(port=0)
+    scene_server.start()
+    yield scene_server
+    scene_server.shutdown()
+
+
+@pytest.fixture
+def client(server):
+    scene_client = SceneClient(*server.get_address(), timeout=30)
+    yield scene_client
+    scene_client.close()
+
+
+def _wall(ax, ay, bx, by):
+    return Wall(LineString([(ax, ay), (bx, by)]), 20, (0, 0, 0), (0, 0, 0), (0, 0, 0))
+
+
+def _points(count, seed):
+    return np.random.default_rng(seed).uniform(1, 999, (count, 2))
+
+
+def _coords(walls):
+    return np.array([wall.get_base().coords[:] for wall in walls], dtype=np.float64).reshape(-1, 4)
+
+
+@pytest.mark.parametrize("num_points", [4, 40], ids=["one at a time", "batched"])
+def test_queries_match_the_tree(scene, client, num_points):
+    walls, bounding_box = scene
+    ids = client.set_scene("a", walls, bounding_box, seed=5)
+    assert ids == list(range(len(walls)))
+    sptree = SPTree(walls, bounding_box, rng=random.Random(5))
+    points = _points(num_points, 1)
+
+    for (x, y), order in zip(points, client.painters_alg("a", points)):
+        expected = [line for lines in sptree.painters_alg(Point(x, y)) for line in lines]
+        assert order["wall"].tolist() == [walls.index(line.get_source()) for line in expected]
+        assert np.array_equal(order["coords"], _coords(expected))
+
+    for (x, y), polygon in zip(points, client.visibility_polygons("a", points)):
+        assert np.allclose(polygon, sptree.visibility_polygon(Point(x, y)))
+
+    angles = np.random.default_rng(2).uniform(0, 2 * math.pi, num_points)
+    directions = np.column_stack((np.cos(angles), np.sin(angles)))
+    hits = client.raycast("a", points, directions)
+    for (x, y), direction, (distance, wall_id) in zip(points, directions, hits.tolist()):
+        hit = sptree.raycast(Point(x, y), tuple(direction))
+        assert (wall_id, distance) == ((-1, math.inf) if hit is None else (walls.index(hit.line.get_source()),
+                                                                             pytest.approx(hit.distance)))
+
+
+def test_added_and_removed_walls_are_drawn(scene, client):
+    walls, bounding_box = scene
+    client.set_scene("a", walls, bounding_box, seed=5)
+    # Crosses the whole scene, so it's split by many splitting lines
+    added = client.add_walls("a", [_wall(0.5, 0.5, 999.5, 998.5), _wall(10, 990, 300, 700)])
+    assert added == [len(walls), len(walls) + 1]
+    assert client.get_scenes() == {"a": {"version": 1, "walls": len(walls) + 2}}
+    client.remove_walls("a", [0, 1, added[1]])
+    assert client.version == 2
+
+    rng = random.Random(3)
+    remaining = set(range(2, len(walls) + 1))
+    for (x, y), order in zip(_points(20, 4), client.painters_alg("a", _points(20, 4))):
+        assert set(order["wall"].tolist()) == remaining
+        pieces = [_wall(*coords) for coords in order["coords"].tolist()]
+        assert count_order_violations(pieces, x, y, rng) == 0
+
+    with pytest.raises(ServiceError) as error:
+        client.remove_walls("a", [0])
+    assert error.value.status == 400
+
+
+@pytest.mark.parametrize("table_slack", [1024, 0], ids=["appended rows", "rebuilt tables"])
+def test_updated_snapshots_answer_like_new_ones(scene, monkeypatch, table_slack):
+    monkeypatch.setattr(scene_server_module, "_min_table_slack", table_slack)
+    walls, bounding_box = scene
+    snapshot = SceneSnapshot.build(walls[:100], bounding_box, random.Random(5))
+    rng = random.Random(6)
+    points = _points(20, 7)
+    for i in range(100, len(walls)):
+        snapshot, _ = snapshot.with_walls([walls[i]])
+        if i % 3 == 0:
+            snapshot = snapshot.without_walls([rng.choice(list(snapshot.walls))])
+    rebuilt = SceneSnapshot(snapshot.version, snapshot.sptree, snapshot.walls, len(walls))
+    for order, expected in zip(snapshot.painters_alg(points), rebuilt.painters_alg(points)):
+        assert np.array_equal(order, expected)
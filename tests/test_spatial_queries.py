@@ -0,0 +1,91 @@
+import math
+import random
+
+import numpy as np
+import pytest
+from shapely.geometry import LineString, Point, Polygon
+
+from sptree.sp_tree import SPTree
+
+
+@pytest.fixture(scope="module")
+def sptree(scene):
+    walls, bounding_box = scene
+    return SPTree(walls, bounding_box, rng=random.Random(2))
+
+
+def _brute_force_raycast(walls, x, y, dx, dy):
+    """
+    :return: distance along the ray to the nearest wall it hits, in multiples of (dx, dy), inf if it hits none
+    """
+    nearest = math.inf
+    for wall in walls:
+        (sx, sy), (ex, ey) = wall.get_base().coords
+        ux, uy = ex - sx, ey - sy
+        denominator = dx * uy - dy * ux
+        if denominator == 0:
+            continue
+        t = ((sx - x) * uy - (sy - y) * ux) / denominator
+        u = ((sx - x) * dy - (sy - y) * dx) / denominator
+        if t > 0 and 0 <= u <= 1:
+            nearest = min(nearest, t)
+    return nearest
+
+
+def _rays(count, seed):
+    rng = random.Random(seed)
+    for _ in range(count):
+        angle = rng.uniform(0, 2 * math.pi)
+        yield rng.uniform(1, 999), rng.uniform(1, 999), math.cos(angle), math.sin(angle)
+
+
+def test_raycast_finds_the_nearest_wall(scene, sptree):
+    walls, _ = scene
+    for x, y, dx, dy in _rays(300, 1):
+        expected = _brute_force_raycast(walls, x, y, dx, dy)
+        hit = sptree.raycast(Point(x, y), (dx, dy))
+        if math.isinf(expected):
+            assert hit is None
+        else:
+            assert hit.distance == pytest.approx(expected, rel=1e-9, abs=1e-9)
+
+
+def test_raycast_batch_matches_raycast(sptree):
+    rays = np.array(list(_rays(300, 2)))
+    distances, lines = sptree.raycast_batch(rays[:, :2], rays[:, 2:])
+    for (x, y, dx, dy), distance, line in zip(rays, distances, lines):
+        hit = sptree.raycast(Point(x, y), (dx, dy))
+        assert (hit is None and math.isinf(distance)) or (hit.distance == pytest.approx(distance) and hit.line is line)
+
+
+def test_segment_blocked_matches_brute_force(scene, sptree):
+    walls, _ = scene
+    starts, ends = [], []
+    for x, y, dx, dy in _rays(300, 3):
+        length = random.Random(x).uniform(1, 200)
+        expected = _brute_force_raycast(walls, x, y, dx, dy) <= length
+        end = (x + dx * length, y + dy * length)
+        assert sptree.segment_blocked(Point(x, y), Point(end)) == expected
+        starts.append((x, y))
+        ends.append(end)
+    single = [sptree.segment_blocked(Point(start), Point(end)) for start, end in zip(starts, ends)]
+    assert sptree.segment_blocked_batch(np.array(starts), np.array(ends)).tolist() == single
+
+
+def test_visibility_polygon_reaches_the_nearest_wall(scene, sptree):
+    walls, bounding_box = scene
+    rng = random.Random(4)
+    for _ in range(10):
+        x, y = rng.uniform(1, 999), rng.uniform(1, 999)
+        polygon = Polygon(sptree.visibility_polygon(Point(x, y)))
+        assert polygon.is_valid
+        for _ in range(50):
+            angle = rng.uniform(0, 2 * math.pi)
+            dx, dy = math.cos(angle), math.sin(angle)
+            ray = LineString([(x, y), (x + 3000 * dx, y + 3000 * dy)])
+            crossing = ray.intersection(bounding_box.exterior)
+            to_border = min(Point(x, y).distance(part) for part in getattr(crossing, "geoms", [crossing]))
+            expected = min(_brute_force_raycast(walls, x, y, dx, dy), to_border)
+            boundary = ray.intersection(polygon.exterior)
+            distance = min(Point(x, y).distance(part) for part in getattr(boundary, "geoms", [boundary]))
+            assert distance == pytest.approx(expected, rel=1e-6)
@@ -0,0 +1,95 @@
+import json
+import os
+import random
+import time
+
+import pytest
+from shapely.geometry import box, Point
+
+from order_check import count_order_violations
+from sptree.sp_tree import SPTree
+from tiling.tile_builder import INDEX_FILE, build_tiles, get_tile_file_name
+from tiling.tiled_scene import TiledScene
+
+
+@pytest.fixture(scope="module")
+def tile_directory(scene, tmp_path_factory):
+    walls, bounding_box = scene
+    directory = str(tmp_path_factory.mktemp("tiles"))
+    build_tiles(walls, bounding_box, 250, directory)
+    return directory
+
+
+def _wait_for_tiles(tiled_scene, expected_tiles):
+    deadline = time.monotonic() + 30
+    while set(tiled_scene._loaded_tiles) != expected_tiles:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def _get_source_coords(line):
+    """
+    Tiles are loaded from disk, so the walls their lines were cut from are copies, and are told apart by coordinates.
+
+    :param line: line being drawn
+    :return: coordinates of the wall the line was cut from
+    """
+    return tuple(line.get_source().get_base().coords)
+
+
+def test_walls_are_cut_into_the_tiles_they_cross(scene, tile_directory):
+    walls, _ = scene
+    with open(os.path.join(tile_directory, INDEX_FILE)) as file:
+        index = json.load(file)
+    assert (index["columns"], index["rows"]) == (4, 4)
+    assert sorted(os.listdir(tile_directory)) == sorted([INDEX_FILE] + [get_tile_file_name(tuple(key))
+                                                                        for key in index["tiles"]])
+
+    drawn_lengths = {}
+    for column, row in index["tiles"]:
+        tile_box = box(column * 250, row * 250, (column + 1) * 250, (row + 1) * 250)
+        sptree = SPTree.load(os.path.join(tile_directory, get_tile_file_name((column, row))))
+        for lines in sptree.painters_alg(Point(column * 250 + 125, row * 250 + 125)):
+            for line in lines:
+                assert tile_box.buffer(1e-9).contains(line.get_base())
+                source = _get_source_coords(line)
+                drawn_lengths[source] = drawn_lengths.get(source, 0) + line.get_base().length
+    assert drawn_lengths.keys() == {_get_source_coords(wall) for wall in walls}
+    for wall in walls:
+        assert drawn_lengths[_get_source_coords(wall)] == pytest.approx(wall.get_base().length)
+
+
+def test_tiles_around_the_camera_are_loaded_and_far_ones_evicted(tile_directory):
+    tiled_scene = TiledScene(tile_directory, load_radius=1)
+    try:
+        tiled_scene.update_camera_location(Point(100, 100))
+        _wait_for_tiles(tiled_scene, {(0, 0), (0, 1), (1, 0), (1, 1)})
+        assert tiled_scene.has_new_tiles()
+        assert not tiled_scene.has_new_tiles()
+
+        # Tiles one beyond the load radius are kept, so the first column is only evicted once the camera is 3 tiles
+        # away from it
+        tiled_scene.update_camera_location(Point(600, 100))
+        _wait_for_tiles(tiled_scene, {(column, row) for column in (0, 1, 2, 3) for row in (0, 1)})
+        assert tiled_scene.has_new_tiles()
+        tiled_scene.update_camera_location(Point(900, 100))
+        _wait_for_tiles(tiled_scene, {(column, row) for column in (1, 2, 3) for row in (0, 1)})
+        assert tiled_scene.has_new_tiles()
+    finally:
+        tiled_scene.close()
+
+
+def test_tiles_are_drawn_back_to_front(scene, tile_directory):
+    walls, _ = scene
+    tiled_scene = TiledScene(tile_directory, load_radius=3)
+    try:
+        rng = random.Random(1)
+        tiled_scene.update_camera_location(Point(500, 500))
+        _wait_for_tiles(tiled_scene, {(column, row) for column in range(4) for row in range(4)})
+        for _ in range(25):
+            x, y = rng.uniform(0, 1000), rng.uniform(0, 1000)
+            order = [line for lines in tiled_scene.painters_alg(Point(x, y)) for line in lines]
+            assert count_order_violations(order, x, y, rng) == 0
+            assert {_get_source_coords(line) for line in order} == {_get_source_coords(wall) for wall in walls}
+    finally:
+        tiled_scene.close()
@@ -0,0 +1,42 @@
+import random
+
+import numpy as np
+import pytest
+from shapely.geometry import Point
+
+from sptree.sp_tree import SPTree
+from sptree import traversal_heatmap
+from sptree.traversal_heatmap import compute_traversal_heatmap
+from sptree.tree_stats import compute_locate_depths
+
+
+@pytest.fixture(scope="module")
+def sptree(one_sided_scene):
+    walls, bounding_box = one_sided_scene
+    return SPTree(walls, bounding_box, rng=random.Random(2))
+
+
+def test_heatmap_matches_painters_alg_at_cell_centres(sptree):
+    heatmap = compute_traversal_heatmap(sptree, (7, 5))
+    assert heatmap.fragments.shape == heatmap.nodes_drawn.shape == heatmap.depths.shape == (5, 7)
+    assert heatmap.overdraw is None
+    assert heatmap.node_count == sptree.stats().node_count
+    for row, column in ((0, 0), (2, 3), (4, 6), (1, 5)):
+        x, y = heatmap.xs[column], heatmap.ys[row]
+        drawn = [lines for lines in sptree.painters_alg(Point(x, y)) if len(lines) > 0]
+        assert heatmap.fragments[row, column] == sum(len(lines) for lines in drawn)
+        assert heatmap.nodes_drawn[row, column] == len(drawn)
+        assert heatmap.depths[row, column] == compute_locate_depths(sptree.root, np.array([(x, y)]))[0]
+    # One-sided walls facing away from some cells are left out
+    assert heatmap.fragments.min() < heatmap.fragments.max()
+
+
+def test_worker_processes_measure_the_same_maps(monkeypatch, sptree):
+    # Small chunks share the grid out between both workers
+    monkeypatch.setattr(traversal_heatmap, "_chunk_size", 8)
+    heatmap = compute_traversal_heatmap(sptree, (9, 6), measure_overdraw=True, processes=1)
+    in_workers = compute_traversal_heatmap(sptree, (9, 6), measure_overdraw=True, processes=2)
+    assert heatmap.node_count == in_workers.node_count
+    for name in ("xs", "ys", "nodes_drawn", "fragments", "depths", "overdraw"):
+        assert np.array_equal(getattr(heatmap, name), getattr(in_workers, name))
+    assert (heatmap.overdraw > 0).all()
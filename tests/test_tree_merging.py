@@ -0,0 +1,31 @@
+import random
+
+import pytest
+from shapely.geometry import box, Point
+
+from order_check import count_order_violations
+from sptree.sp_tree import SPTree
+from wall.wall_creator import create_walls
+
+
+@pytest.mark.parametrize("other_box", [box(1000, 0, 2000, 1000), box(500, 0, 1500, 1000), box(0, 0, 1000, 1000)],
+                         ids=["adjacent", "half-overlap", "overlay"])
+def test_merged_tree_orders_are_valid(other_box):
+    rng = random.Random(3)
+    this_box = box(0, 0, 1000, 1000)
+    walls = create_walls(this_box, 80, 10, 100, rng)
+    other_walls = create_walls(other_box, 80, 10, 100, rng)
+    this = SPTree(walls, this_box, rng=random.Random(1))
+    other = SPTree(other_walls, other_box, rng=random.Random(2))
+    merged = this.merge(other)
+
+    minx, miny, maxx, maxy = merged.bounding_box.bounds
+    assert (minx, miny, maxx, maxy) == (0, 0, max(1000, other_box.bounds[2]), 1000)
+    for _ in range(25):
+        x, y = rng.uniform(minx, maxx), rng.uniform(miny, maxy)
+        order = [line for lines in merged.painters_alg(Point(x, y)) for line in lines]
+        assert count_order_violations(order, x, y, rng) == 0
+        assert {line.get_source() for line in order} == set(walls + other_walls)
+    # Both trees are left unchanged
+    assert {line.get_source() for lines in this.painters_alg(Point(500, 500)) for line in lines} == set(walls)
+    assert {line.get_source() for lines in other.painters_alg(Point(500, 500)) for line in lines} == set(other_walls)
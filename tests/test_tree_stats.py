@@ -0,0 +1,73 @@
+import io
+import random
+
+import numpy as np
+import pytest
+from shapely.geometry import LineString, Point
+
+from sptree.line_wrapper import LineWrapper
+from sptree.node import Node
+from sptree.sp_tree import SPTree
+from sptree.tree_stats import compute_level_histogram, compute_locate_depths, compute_stats, \
+    compute_traversal_cost, dump_level_histogram
+
+
+def _line(sx, sy, ex, ey):
+    return LineWrapper(LineString([(sx, sy), (ex, ey)]))
+
+
+@pytest.fixture
+def root():
+    """
+    :return: root of a tree with two lines on y = 0, a line in front of them with a line in front of that, and a line
+        behind them
+    """
+    in_front = Node([_line(2, -10, 2, -1)], left=Node([_line(0, -20, 10, -20)]))
+    behind = Node([_line(0, 5, 10, 5)])
+    return Node([_line(0, 0, 4, 0), _line(6, 0, 10, 0)], left=in_front, right=behind)
+
+
+def test_stats_of_a_hand_built_tree(root):
+    stats = compute_stats(root, 4)
+    assert (stats.node_count, stats.leaf_count, stats.max_depth) == (4, 2, 3)
+    assert stats.average_depth == 2.5
+    # 4 nodes can't fit in fewer than 3 levels
+    assert stats.balance_factor == 1.0
+    assert (stats.input_count, stats.fragment_count, stats.fragment_ratio) == (4, 5, 0.8)
+    assert stats.memory_bytes > 0
+    assert compute_stats(None, 0) == (0, 0, 0, 0.0, 1.0, 0, 0, 1.0, 0)
+
+
+def test_level_histogram_of_a_hand_built_tree(root):
+    assert compute_level_histogram(root) == [(1, 2), (2, 2), (1, 1)]
+    assert compute_level_histogram(None) == []
+    table = io.StringIO()
+    dump_level_histogram(root, table)
+    assert [line.split()[:3] for line in table.getvalue().splitlines()[1:]] == [["0", "1", "2"], ["1", "2", "2"],
+                                                                               ["2", "1", "1"]]
+
+
+def test_locate_depths_of_a_hand_built_tree(root):
+    # Behind the root, in front of the line in front of it, and on the root's line, which counts as in front
+    points = np.array([(5, 10), (5, -5), (5, 0)])
+    assert compute_locate_depths(root, points).tolist() == [2, 3, 3]
+    cost = compute_traversal_cost(root, points)
+    assert (cost.mean_depth, cost.max_depth, cost.node_count, cost.fragment_count) == (8 / 3, 3, 4, 5)
+
+
+def test_stats_of_a_built_tree_match_its_traversal(scene):
+    walls, bounding_box = scene
+    sptree = SPTree(walls, bounding_box, rng=random.Random(2))
+    stats = sptree.stats()
+    assert stats.input_count == len(walls)
+    # Double-sided walls are all drawn from everywhere
+    assert stats.fragment_count == sum(len(lines) for lines in sptree.painters_alg(Point(500, 500)))
+    histogram = sptree.level_histogram()
+    assert len(histogram) == stats.max_depth
+    assert sum(num_nodes for num_nodes, _ in histogram) == stats.node_count
+    assert sum(num_lines for _, num_lines in histogram) == stats.fragment_count
+
+    points = np.random.default_rng(3).uniform(0, 1000, (200, 2))
+    depths = compute_locate_depths(sptree.root, points)
+    assert depths.max() <= stats.max_depth
+    assert sptree.traversal_cost(points).mean_depth == pytest.approx(depths.mean())